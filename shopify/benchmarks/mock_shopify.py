@@ -0,0 +1,174 @@
+# benchmarks/mock_shopify.py
+
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from processors import json_codec
+
+_FILTER_ARGUMENT = re.compile(r'\(\s*query:\s*"(?:[^"\\]|\\.)*"\s*\)')
+
+class MockShopify:
+    """
+    Local stand-in for the parts of the Admin GraphQL API a sync uses.
+
+    Answers bulkOperationRunQuery, currentBulkOperation, node(id:) and shop, and
+    serves result files over HTTP with Range support. Results are registered per
+    bulk query; an operation stays CREATED for queue_seconds and RUNNING for
+    run_seconds, counting objects up as it goes, before completing.
+    """
+
+    def __init__(self, queue_seconds: float = 0.0, run_seconds: float = 0.0, host: str = '127.0.0.1'):
+        self.queue_seconds = queue_seconds
+        self.run_seconds = run_seconds
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._operations: Dict[str, Dict[str, Any]] = {}
+        self._current: Optional[str] = None
+        self._ids = itertools.count(1)
+        self._result_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, 0), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.base_url}/admin/api/graphql.json"
+
+    @property
+    def started_operations(self) -> int:
+        """Bulk operations started so far"""
+        return len(self._operations)
+
+    def add_result(self, query: str, file_path: str, object_count: Optional[int] = None) -> None:
+        """Serve file_path as the result of bulk operations running query, whatever its filters"""
+        if object_count is None:
+            object_count = _count_lines(file_path)
+        with self._lock:
+            name = f"result{next(self._result_ids)}.jsonl"
+            self._results[_fingerprint(query)] = {
+                'name': name, 'path': file_path,
+                'size': os.path.getsize(file_path), 'objects': object_count
+            }
+
+    def start(self) -> 'MockShopify':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockShopify':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        if 'bulkOperationRunQuery' in query:
+            data = {'bulkOperationRunQuery': self._run_query(variables['query'])}
+        elif 'currentBulkOperation' in query:
+            data = {'currentBulkOperation': self._status(self._current)}
+        elif 'node(' in query:
+            data = {'node': self._status(variables.get('id'))}
+        elif 'shop' in query:
+            data = {'shop': {'id': 'gid://shopify/Shop/1', 'name': 'Benchmark shop', 'currencyCode': 'USD'}}
+        else:
+            return {'errors': [{'message': 'Unsupported query'}]}
+        return {'data': data, 'extensions': {'cost': {
+            'requestedQueryCost': 1, 'actualQueryCost': 1,
+            'throttleStatus': {'maximumAvailable': 2000.0, 'currentlyAvailable': 1999.0, 'restoreRate': 100.0}
+        }}}
+
+    def result_file(self, name: str) -> Optional[Dict[str, Any]]:
+        return next((result for result in self._results.values() if result['name'] == name), None)
+
+    def _run_query(self, bulk_query: str) -> Dict[str, Any]:
+        result = self._results.get(_fingerprint(bulk_query))
+        if result is None:
+            return {'bulkOperation': None, 'userErrors': [{'field': ['query'], 'message': 'No result registered'}]}
+        with self._lock:
+            operation_id = f"gid://shopify/BulkOperation/{next(self._ids)}"
+            self._operations[operation_id] = {'result': result, 'started': time.monotonic(),
+                                              'createdAt': datetime.utcnow().isoformat() + 'Z'}
+            self._current = operation_id
+        return {'bulkOperation': {'id': operation_id, 'status': 'CREATED'}, 'userErrors': []}
+
+    def _status(self, operation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        operation = self._operations.get(operation_id)
+        if operation is None:
+            return None
+        result = operation['result']
+        running = time.monotonic() - operation['started'] - self.queue_seconds
+        status = {'id': operation_id, 'createdAt': operation['createdAt'], 'errorCode': None,
+                  'completedAt': None, 'fileSize': None, 'url': None, 'partialDataUrl': None}
+        if running < 0:
+            return {**status, 'status': 'CREATED', 'objectCount': '0'}
+        if running < self.run_seconds:
+            done = int(result['objects'] * running / self.run_seconds)
+            return {**status, 'status': 'RUNNING', 'objectCount': str(done)}
+        return {**status, 'status': 'COMPLETED', 'objectCount': str(result['objects']),
+                'completedAt': datetime.utcnow().isoformat() + 'Z', 'fileSize': str(result['size']),
+                'url': f"{self.base_url}/results/{result['name']}"}
+
+def _fingerprint(query: str) -> str:
+    """Query text without incremental or shard filters and whitespace"""
+    return ''.join(_FILTER_ARGUMENT.sub('', query.replace('{INCREMENTAL_FILTER}', '')).split())
+
+def _count_lines(file_path: str) -> int:
+    count = 0
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            count += chunk.count(b'\n')
+    return count
+
+def _handler(mock: MockShopify):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json_codec.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            self._send_json(mock.graphql(body['query'], body.get('variables') or {}))
+
+        def do_GET(self):
+            result = mock.result_file(self.path.rsplit('/', 1)[-1])
+            if result is None:
+                self.send_error(404)
+                return
+            start = 0
+            range_header = self.headers.get('Range')
+            if range_header:
+                start = int(range_header.split('=', 1)[1].split('-', 1)[0])
+            self.send_response(206 if range_header else 200)
+            self.send_header('Content-Length', str(result['size'] - start))
+            if range_header:
+                self.send_header('Content-Range', f"bytes {start}-{result['size'] - 1}/{result['size']}")
+            self.end_headers()
+            with open(result['path'], 'rb') as f:
+                f.seek(start)
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+        def _send_json(self, obj: Dict[str, Any]) -> None:
+            body = json_codec.dumps(obj)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,157 @@
+# benchmarks/run_benchmarks.py
+"""
+Throughput and memory benchmarks of the extract -> download -> process path.
+
+For each size, synthetic bulk results are generated per entity and served by a
+local Shopify stand-in; the extractor then runs and downloads each bulk
+operation, and DataProcessor processes the download. Every case runs in a fresh
+process so its peak RSS is its own.
+
+    python benchmarks/run_benchmarks.py --rows 10000 1000000 --entities orders products
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from processors import json_codec
+from processors.compression import extension
+from queries.entities import ENTITIES
+from mock_shopify import MockShopify
+from synthetic import generate
+
+DEFAULT_ROWS = [10000, 1000000, 10000000]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='JSONL lines per entity')
+    parser.add_argument('--entities', nargs='+', default=list(ENTITIES), choices=list(ENTITIES))
+    parser.add_argument('--skew', type=float, default=0.5, help='spread of child counts (0 = uniform)')
+    parser.add_argument('--format', default=os.getenv('OUTPUT_FORMAT', 'jsonl'), choices=['jsonl', 'parquet'])
+    parser.add_argument('--compression', default=os.getenv('COMPRESSION', 'none'), choices=['none', 'gzip', 'zstd'],
+                        help='compression of raw and JSONL files (level from COMPRESSION_LEVEL)')
+    parser.add_argument('--queue-seconds', type=float, default=0.0, help='simulated time a bulk operation is queued')
+    parser.add_argument('--run-seconds', type=float, default=0.0, help='simulated time a bulk operation runs')
+    parser.add_argument('--workdir', help='where to put generated files (default: a temp dir)')
+    parser.add_argument('--keep', action='store_true', help='keep generated files')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    args = parser.parse_args()
+    # Inherited by the spawned case processes
+    os.environ['COMPRESSION'] = args.compression
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workdir = args.workdir or tempfile.mkdtemp(prefix='shopify-bench-')
+    results = []
+
+    with MockShopify(args.queue_seconds, args.run_seconds) as mock:
+        for rows in args.rows:
+            size_dir = os.path.join(workdir, str(rows))
+            try:
+                for entity in args.entities:
+                    results.extend(_bench_entity(mock, entity, rows, size_dir, args))
+            finally:
+                if not args.keep:
+                    shutil.rmtree(size_dir, ignore_errors=True)
+
+    _print_table(results)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(json_codec.dumps_pretty(results))
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _bench_entity(mock: MockShopify, entity: str, rows: int, size_dir: str, args) -> List[Dict[str, Any]]:
+    source = os.path.join(size_dir, 'source', f"{entity}.jsonl")
+    suffix = extension(None if args.compression == 'none' else args.compression)
+    raw = os.path.join(size_dir, 'raw', f"{entity}.jsonl{suffix}")
+    processed = os.path.join(size_dir, 'processed', f"{entity}.{args.format}{suffix if args.format == 'jsonl' else ''}")
+    for path in (source, raw, processed):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    started = time.perf_counter()
+    generated = generate(entity, source, rows, skew=args.skew)
+    print(f"Generated {generated['lines']} {entity} lines ({generated['bytes'] / 2 ** 20:.0f} MB) "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    mock.add_result(ENTITIES[entity]['query'], source, object_count=generated['lines'])
+
+    results = []
+    for case, arguments, output in (
+        ('extract', (entity, mock.endpoint, raw), raw),
+        ('process', (entity, raw, processed, args.format), processed)
+    ):
+        measured = _run_isolated(case, arguments)
+        results.append({
+            'case': case, 'entity': entity, 'rows': generated['lines'], 'bytes': generated['bytes'],
+            **measured, 'records_per_second': measured['records'] / max(measured['seconds'], 1e-9),
+            'output_bytes': _output_bytes(output)
+        })
+    return results
+
+def _run_isolated(case: str, arguments: tuple) -> Dict[str, Any]:
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_measure, case, arguments).result()
+
+def _measure(case: str, arguments: tuple) -> Dict[str, Any]:
+    """Run one case in this (fresh) process; returns records handled, wall time and peak RSS"""
+    logging.basicConfig(level=logging.WARNING)
+    started = time.perf_counter()
+    records = _extract(*arguments) if case == 'extract' else _process(*arguments)
+    seconds = time.perf_counter() - started
+    return {'records': records, 'seconds': seconds, 'peak_rss_mb': _peak_rss_mb()}
+
+def _extract(entity: str, endpoint: str, raw: str) -> int:
+    from client.shopify_client import ShopifyClient
+    from extractors.bulk_operations import BulkOperationsExtractor
+
+    client = ShopifyClient('benchmark.local', 'benchmark')
+    client.endpoint = endpoint
+    extractor = BulkOperationsExtractor(client)
+    extractor.POLL_MIN_INTERVAL = 0.1
+    status = extractor.run_operation(ENTITIES[entity]['query'])
+    result = extractor.download_result(status, raw)
+    if not result['success']:
+        raise RuntimeError(f"Extraction of {entity} failed: {result}")
+    return int(result['records_count'])
+
+def _process(entity: str, raw: str, processed: str, output_format: str) -> int:
+    from processors.data_processor import DataProcessor
+
+    return DataProcessor(output_format).process_jsonl_file(raw, processed, entity)
+
+def _output_bytes(path: str) -> int:
+    """Size of a case's output; a normalized layout writes one directory per table next to it"""
+    if os.path.exists(path):
+        return os.path.getsize(path)
+    directory, name = os.path.split(path)
+    return sum(os.path.getsize(os.path.join(directory, table, name)) for table in os.listdir(directory)
+               if os.path.exists(os.path.join(directory, table, name)))
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process and any workers it waited for"""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = (f"{'case':<8} {'entity':<20} {'rows':>10} {'records':>10} {'wall s':>8} {'records/s':>11} "
+              f"{'peak MB':>8} {'out MB':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['case']:<8} {r['entity']:<20} {r['rows']:>10} {r['records']:>10} {r['seconds']:>8.2f} "
+              f"{r['records_per_second']:>11.0f} {r['peak_rss_mb']:>8.0f} {r['output_bytes'] / 2 ** 20:>8.1f}")
+
+if __name__ == '__main__':
+    main()
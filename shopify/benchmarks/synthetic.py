@@ -0,0 +1,176 @@
+# benchmarks/synthetic.py
+
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+from processors import json_codec
+from processors.parquet_writer import connection_node, parse_selection
+from queries.entities import ENTITIES
+
+# Average children per parent; skew spreads the counts around these means
+DEFAULT_SHAPE = {
+    'line_items': 4,
+    'refund_rate': 0.05,
+    'refund_line_items': 1.5,
+    'refund_transactions': 1,
+    'order_transactions': 1.2,
+    'variants': 3,
+    'inventory_levels': 2,
+    'metafields': 5
+}
+
+_START = datetime(2020, 1, 1)
+
+def _selects(query: str, *path: str) -> bool:
+    """Whether a bulk query selects the connection at path below its top-level node"""
+    (root,) = parse_selection(query).values()
+    node = connection_node(root)
+    for field in path:
+        node = connection_node((node or {}).get(field) or {})
+    return node is not None
+
+def generate(entity: str, file_path: str, rows: int, skew: float = 0.5, seed: int = 0,
+             shape: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """
+    Write a bulk operation result for entity with about `rows` JSONL lines.
+
+    Child counts are log-normal around the means in `shape`; skew is the sigma,
+    so 0 gives every parent the mean and 1 or more a long tail of large parents.
+    Only connections the entity's bulk query selects are generated (refunds and
+    inventory levels only once the queries ask for them), so results have the
+    shape of real exports. Returns the number of lines, top-level records and
+    bytes written.
+    """
+    generator = _Generator(skew, seed, {**DEFAULT_SHAPE, **(shape or {})})
+    records = getattr(generator, entity)
+
+    lines = roots = size = 0
+    with open(file_path, 'wb') as f:
+        while lines < rows:
+            roots += 1
+            for record in records(roots):
+                line = json_codec.dumps(record) + b'\n'
+                f.write(line)
+                size += len(line)
+                lines += 1
+    return {'lines': lines, 'records': roots, 'bytes': size}
+
+class _Generator:
+    def __init__(self, skew: float, seed: int, shape: Dict[str, float]):
+        self.random = random.Random(seed)
+        self.skew = skew
+        self.shape = shape
+        self._ids = 0
+        self.refunds = _selects(ENTITIES['orders']['query'], 'refunds')
+        self.inventory_levels = _selects(ENTITIES['products']['query'], 'variants', 'inventoryLevels')
+
+    def orders(self, n: int) -> Iterator[Dict[str, Any]]:
+        order_id = self._gid('Order')
+        created_at = self._timestamp(n)
+        total = self._money(20, 500)
+        yield {
+            'id': order_id, 'name': f"#{1000 + n}", 'createdAt': created_at, 'updatedAt': created_at,
+            'processedAt': created_at, 'currencyCode': 'USD', 'email': f"customer{n % 5000}@example.com",
+            'displayFinancialStatus': 'PAID', 'displayFulfillmentStatus': 'FULFILLED',
+            'cancelledAt': None, 'closedAt': None,
+            'totalPriceSet': {'shopMoney': total}, 'currentTotalPriceSet': {'shopMoney': total},
+            'subtotalPriceSet': {'shopMoney': total}, 'totalShippingPriceSet': {'shopMoney': self._money(0, 20)},
+            'totalDiscountsSet': {'shopMoney': self._money(0, 10)}, 'totalTaxSet': {'shopMoney': self._money(0, 40)},
+            'customer': {
+                'id': self._gid('Customer'), 'email': f"customer{n % 5000}@example.com",
+                'firstName': 'Ada', 'lastName': 'Lovelace', 'numberOfOrders': str(n % 20),
+                'defaultAddress': {'address1': '1 Main St', 'city': 'Springfield', 'province': 'IL', 'country': 'US'}
+            },
+            'transactions': [self._transaction(created_at) for _ in range(self._count('order_transactions'))]
+        }
+        for _ in range(max(1, self._count('line_items'))):
+            yield {
+                'id': self._gid('LineItem'), 'name': 'Widget - Large', 'quantity': 2, 'sku': f"SKU-{n % 997}",
+                'refundableQuantity': 2, 'currentQuantity': 2,
+                'variant': {'id': self._gid('ProductVariant'), 'title': 'Large', 'sku': f"SKU-{n % 997}",
+                            'inventoryQuantity': 10, 'price': '19.99'},
+                '__parentId': order_id
+            }
+        if self.refunds and self.random.random() < self.shape['refund_rate']:
+            refund_id = self._gid('Refund')
+            yield {'id': refund_id, 'createdAt': created_at, '__parentId': order_id}
+            for _ in range(max(1, self._count('refund_line_items'))):
+                yield {'id': self._gid('RefundLineItem'), 'quantity': 1,
+                       'lineItem': {'id': self._gid('LineItem')}, '__parentId': refund_id}
+            for _ in range(max(1, self._count('refund_transactions'))):
+                yield {**self._transaction(created_at), 'id': self._gid('OrderTransaction'), '__parentId': refund_id}
+
+    def products(self, n: int) -> Iterator[Dict[str, Any]]:
+        product_id = self._gid('Product')
+        created_at = self._timestamp(n)
+        yield {
+            'id': product_id, 'title': f"Product {n}", 'handle': f"product-{n}", 'productType': 'Widgets',
+            'vendor': 'Acme', 'createdAt': created_at, 'updatedAt': created_at, 'publishedAt': created_at,
+            'status': 'ACTIVE', 'totalInventory': 100, 'tracksInventory': True,
+            'options': [{'id': self._gid('ProductOption'), 'name': 'Size', 'position': 1, 'values': ['S', 'M', 'L']}]
+        }
+        for _ in range(max(1, self._count('variants'))):
+            variant_id = self._gid('ProductVariant')
+            yield {
+                'id': variant_id, 'title': 'Large', 'sku': f"SKU-{self._ids}", 'price': '19.99',
+                'compareAtPrice': None, 'inventoryQuantity': 10, 'sellableOnlineQuantity': 10,
+                'inventoryItem': {'id': self._gid('InventoryItem'), 'tracked': True,
+                                  'unitCost': {'amount': '7.5', 'currencyCode': 'USD'}},
+                'selectedOptions': [{'name': 'Size', 'value': 'L'}],
+                '__parentId': product_id
+            }
+            for _ in range(self._count('inventory_levels') if self.inventory_levels else 0):
+                yield {'id': f"{self._gid('InventoryLevel')}?inventory_item_id={self._ids}",
+                       'available': 5, '__parentId': variant_id}
+
+    def product_metafields(self, n: int) -> Iterator[Dict[str, Any]]:
+        product_id = self._gid('Product')
+        yield {'id': product_id, 'title': f"Product {n}", 'updatedAt': self._timestamp(n)}
+        for index in range(self._count('metafields')):
+            # Metafields are exported without an id, like the real query
+            yield {'namespace': 'custom', 'key': f"field_{index}", 'value': 'lorem ipsum',
+                   'type': 'single_line_text_field', '__parentId': product_id}
+
+    def customers(self, n: int) -> Iterator[Dict[str, Any]]:
+        created_at = self._timestamp(n)
+        address = {'address1': '1 Main St', 'city': 'Springfield', 'province': 'IL', 'country': 'US',
+                   'phone': '+15555550100'}
+        yield {
+            'id': self._gid('Customer'), 'firstName': 'Ada', 'lastName': 'Lovelace',
+            'email': f"customer{n}@example.com", 'phone': None, 'createdAt': created_at,
+            'updatedAt': created_at, 'numberOfOrders': str(n % 20),
+            'amountSpent': self._money(0, 2000), 'addresses': [address], 'defaultAddress': address,
+            'emailMarketingConsent': {'marketingState': 'SUBSCRIBED', 'marketingOptInLevel': 'SINGLE_OPT_IN',
+                                      'consentUpdatedAt': created_at}
+        }
+
+    def collections(self, n: int) -> Iterator[Dict[str, Any]]:
+        yield {
+            'id': self._gid('Collection'), 'title': f"Collection {n}", 'handle': f"collection-{n}",
+            'updatedAt': self._timestamp(n), 'productsCount': n % 300, 'sortOrder': 'BEST_SELLING'
+        }
+
+    def _count(self, name: str) -> int:
+        mean = self.shape[name]
+        if mean <= 0:
+            return 0
+        if not self.skew:
+            return round(mean)
+        # Log-normal with the requested mean
+        mu = math.log(mean) - self.skew ** 2 / 2
+        return int(self.random.lognormvariate(mu, self.skew) + 0.5)
+
+    def _gid(self, gid_type: str) -> str:
+        self._ids += 1
+        return f"gid://shopify/{gid_type}/{self._ids}"
+
+    def _timestamp(self, n: int) -> str:
+        return (_START + timedelta(minutes=n)).isoformat() + 'Z'
+
+    def _money(self, low: float, high: float) -> Dict[str, str]:
+        return {'amount': f"{self.random.uniform(low, high):.2f}", 'currencyCode': 'USD'}
+
+    def _transaction(self, processed_at: str) -> Dict[str, Any]:
+        return {'id': self._gid('OrderTransaction'), 'processedAt': processed_at, 'status': 'SUCCESS',
+                'kind': 'SALE', 'gateway': 'shopify_payments', 'amountSet': {'shopMoney': self._money(5, 500)}}
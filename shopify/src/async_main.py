@@ -0,0 +1,177 @@
+# src/async_main.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from client.async_shopify_client import AsyncShopifyClient
+from extractors.async_bulk_operations import AsyncBulkOperationsExtractor
+from extractors.async_shop_operations import AsyncShopOperationsExtractor
+from extractors.webhooks import BulkCompletionReceiver
+from main import SyncManager
+from queries.entities import ENTITIES
+from shop_config import load_shop_configs
+
+class AsyncSyncManager(SyncManager):
+    """
+    asyncio variant of SyncManager.
+
+    Bulk operations, polling and downloads run on the event loop, so one process
+    can drive many shops at once. Processing is CPU bound and runs on the loop's
+    default executor so it never stalls other shops; so do reads and writes of
+    the state store and manifest, which block on disk.
+    """
+
+    @staticmethod
+    def _create_extractors(store_url: Optional[str], access_token: Optional[str]):
+        client = AsyncShopifyClient(store_url, access_token)
+        return AsyncBulkOperationsExtractor(client), AsyncShopOperationsExtractor(client)
+
+    async def sync_entity(self, entity: str, query: str, full_resync: bool = False) -> Dict[str, Any]:
+        """Sync a single entity"""
+        return await self._sync_entity(entity, query, full_resync)
+
+    async def sync_all(self, full_resync: bool = False) -> Dict[str, Any]:
+        """Synchronize all entities, incrementally where a watermark exists"""
+        results = {}
+        if self.webhook_url:
+            await self.extractor.enable_webhook(BulkCompletionReceiver.shared(), self.webhook_url)
+        if await asyncio.to_thread(self.manifest.begin, full_resync or self.full_resync):
+            self.logger.info("Resuming the interrupted sync run")
+        self.metrics.begin(api_cost=self.extractor.client.cost_consumed)
+        tasks = {asyncio.ensure_future(self._sync_shop_info()): 'shop_info'}
+
+        try:
+            # The extractor runs as many bulk operations at once as the API version
+            # allows; download and processing of finished ones overlap with the rest
+            for entity, query in self.entities.items():
+                if self.manifest.entity(entity).get('stage') == 'done':
+                    self.logger.info(f"{entity} was synced before the interruption")
+                    results[entity] = await asyncio.to_thread(self.state.get_entity_stats, entity)
+                    continue
+                tasks[asyncio.ensure_future(self._sync_entity(entity, query, full_resync))] = entity
+
+            for task, entity in tasks.items():
+                result = await task
+                results[entity] = result if entity == 'shop_info' else result['stats']
+        finally:
+            await self.extractor.close()
+
+        return await asyncio.to_thread(self._finish_sync, results)
+
+    async def _sync_entity(self, entity: str, query: str, full_resync: bool) -> Dict[str, Any]:
+        """Run an entity's bulk operation, or its shards, then download and process the result"""
+        incremental_date = await asyncio.to_thread(self._incremental_date, entity, full_resync)
+        try:
+            status = await self._run_async_operation(entity, query, incremental_date)
+        except Exception as e:
+            self.logger.error(f"Sync failed for {entity}", exc_info=True)
+            return await asyncio.to_thread(self._record_result, self._failed_result(entity, str(e)), incremental_date)
+        return await self._finish_entity(entity, status, incremental_date)
+
+    async def _run_async_operation(self, entity: str, query: str,
+                                   incremental_date: Optional[datetime]) -> Dict[str, Any]:
+        """Run the bulk operation, or its shards, resuming one started before an interruption"""
+        checkpoint = self.manifest.entity(entity)
+        if checkpoint.get('status'):
+            self.logger.info(f"Using bulk operation {checkpoint['status']['id']} finished before the interruption")
+            return checkpoint['status']
+
+        status = None
+        expected_count = await asyncio.to_thread(self._expected_count, entity, incremental_date)
+        if checkpoint.get('operation_id'):
+            try:
+                status = await self.extractor.resume_operation(checkpoint['operation_id'], expected_count)
+            except Exception as e:
+                self.logger.warning(f"Cannot resume bulk operation for {entity}, starting a new one: {str(e)}")
+
+        if status is None:
+            self.logger.info(f"Starting {'incremental' if incremental_date else 'full'} sync for {entity}")
+            with self.metrics.stage(entity, 'bulk_operation'):
+                shards = None
+                if self._is_sharded(entity, incremental_date):
+                    oldest = await self.extractor.oldest_created_at(query, ENTITIES[entity]['shard_sort_key'])
+                    shards = await asyncio.to_thread(self._plan_shards, entity, oldest)
+                if shards:
+                    status = await self.extractor.run_shards(query, shards)
+                else:
+                    status = await self.extractor.run_operation(query, incremental_date, expected_count,
+                                                                on_start=self._operation_started(entity))
+        self._record_operation_metrics(entity, status)
+        await asyncio.to_thread(self.manifest.update, entity, stage='completed', status=status)
+        return status
+
+    async def _finish_entity(self, entity: str, status: Dict[str, Any],
+                             incremental_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """Download, process and upload the result of a finished bulk operation"""
+        raw_file_path, processed_file_path = await asyncio.to_thread(self._entity_paths, entity)
+        checkpoint = self.manifest.entity(entity)
+        uploads = []
+
+        try:
+            if checkpoint.get('result') and os.path.exists(raw_file_path):
+                self.logger.info(f"Using {raw_file_path} downloaded before the interruption")
+                result = checkpoint['result']
+            else:
+                with self.metrics.stage(entity, 'download') as stage:
+                    result = await self.extractor.download_result(
+                        status, raw_file_path, resume_offset=checkpoint.get('download_offset', 0),
+                        on_progress=lambda offset: self.manifest.update(entity, download_offset=offset)
+                    )
+                    await asyncio.to_thread(self.manifest.update, entity, stage='downloaded', result=result)
+                    stage['bytes'] = self._downloaded_bytes(result, checkpoint)
+            if self.loader and not checkpoint.get('raw_uploaded'):
+                uploads.append(self._upload(entity, raw_file_path, 'raw_uploaded'))
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._complete_entity, entity, status, result,
+                raw_file_path, processed_file_path, incremental_date, uploads
+            )
+        except Exception as e:
+            self.logger.error(f"Sync failed for {entity}", exc_info=True)
+            return await asyncio.to_thread(
+                self._record_result, self._failed_result(entity, str(e), status.get('id')), incremental_date
+            )
+
+    async def _sync_shop_info(self) -> Dict[str, Any]:
+        """Sync shop info"""
+        self.logger.info("Starting sync for shop_info")
+        try:
+            result = await self.shop_extractor.extract(output_dir=self.data_dir)
+            return self._shop_info_stats(result)
+        except Exception as e:
+            return self._shop_info_stats(error=str(e))
+
+async def sync_shops(shops: List[Dict[str, str]], full_resync: bool = False) -> Dict[str, Any]:
+    """Sync every shop concurrently; one shop failing does not affect the others"""
+    async def sync_shop(shop):
+        # The same data/<shop> layout as the threaded orchestrator, so either can pick up the other's state
+        data_dir = os.path.join('data', shop['name'])
+        manager = AsyncSyncManager(shop['store_url'], shop['access_token'], data_dir=data_dir,
+                                   shop=shop['name'])
+        return await manager.sync_all(full_resync)
+
+    results = await asyncio.gather(*(sync_shop(shop) for shop in shops), return_exceptions=True)
+    stats = {}
+    for shop, result in zip(shops, results):
+        if isinstance(result, Exception):
+            logging.error(f"Sync failed for shop {shop['name']}: {result}")
+            stats[shop['name']] = {'error': str(result)}
+        else:
+            stats[shop['name']] = result
+    return stats
+
+def main():
+    """Async entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    full_resync = os.getenv('FULL_RESYNC', 'false').lower() == 'true'
+    asyncio.run(sync_shops(load_shop_configs(), full_resync))
+
+if __name__ == "__main__":
+    main()
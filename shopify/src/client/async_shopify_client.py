@@ -0,0 +1,87 @@
+# src/client/async_shopify_client.py
+
+import asyncio
+from typing import Dict, Any, Optional
+from client.shopify_client import ShopifyClient, SHOP_INFO_QUERY
+
+try:
+    import aiohttp
+except ImportError:  # async mode is optional
+    aiohttp = None
+
+class AsyncShopifyClient(ShopifyClient):
+    """asyncio variant of ShopifyClient with the same configuration, retry policy and cost throttle"""
+
+    def _create_session(self) -> None:
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the async client")
+        # aiohttp sessions must be created inside the running event loop
+        return None
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(sock_connect=self.TIMEOUT[0], sock_read=self.TIMEOUT[1]),
+                connector=aiohttp.TCPConnector(limit=self.POOL_SIZE)
+            )
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def execute(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a GraphQL query against Shopify's API"""
+        payload = {'query': query, 'variables': variables or {}}
+        # A mutation that reached Shopify may have run, so only retry it when it was throttled
+        is_mutation = query.lstrip().startswith('mutation')
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                waited = await self.throttle.acquire_async(self._query_costs.get(query, self.DEFAULT_QUERY_COST))
+                if waited:
+                    self.logger.debug(f"Waited {waited:.2f}s for query cost budget")
+
+                async with self._get_session().post(self.endpoint, json=payload) as response:
+                    if response.status == 429 or (response.status >= 500 and not is_mutation):
+                        if attempt < self.MAX_RETRIES:
+                            delay = self._retry_after(response, attempt)
+                            self.logger.warning(
+                                f"Shopify returned {response.status}, retrying in {delay:.1f}s "
+                                f"({attempt + 1}/{self.MAX_RETRIES})"
+                            )
+                            await asyncio.sleep(delay)
+                            continue
+                    response.raise_for_status()
+                    result = await response.json(content_type=None)
+
+                self._record_cost(query, result)
+                if 'errors' in result:
+                    if self._is_throttled(result) and attempt < self.MAX_RETRIES:
+                        delay = self._throttle_delay(result, attempt)
+                        self.logger.warning(f"Query throttled, retrying in {delay:.1f}s ({attempt + 1}/{self.MAX_RETRIES})")
+                        await asyncio.sleep(delay)
+                        continue
+                    raise Exception(f"GraphQL errors: {result['errors']}")
+
+                return result['data']
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if is_mutation or attempt == self.MAX_RETRIES:
+                    self.logger.error(f"API request failed: {str(e)}")
+                    raise
+                delay = self.RETRY_DELAY * 2 ** attempt
+                self.logger.warning(f"API request failed, retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+            except aiohttp.ClientError as e:
+                self.logger.error(f"API request failed: {str(e)}")
+                raise
+            except Exception as e:
+                self.logger.error(f"Error executing query: {str(e)}")
+                raise
+
+    async def get_shop_info(self) -> Dict[str, Any]:
+        """Get shop information using regular GraphQL query"""
+        result = await self.execute(SHOP_INFO_QUERY)
+        return result['shop']
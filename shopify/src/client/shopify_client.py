@@ -1,15 +1,38 @@
 # src/client/shopify_client.py
 
 import os
+import time
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from client.throttle import CostThrottle
 from typing import Dict, Any, Optional
 
+SHOP_INFO_QUERY = """
+{
+    shop {
+        id
+        name
+        email
+        primaryDomain {
+            url
+        }
+        currencyCode
+        timezoneAbbreviation
+        billingAddress {
+            city 
+            country
+            zip
+        }
+    }
+}
+"""
+
 class ShopifyClient:
-    def __init__(self):
-        self.store_url = os.getenv('SHOPIFY_STORE_URL')
-        self.access_token = os.getenv('SHOPIFY_ACCESS_TOKEN')
-        self.api_version = '2024-01'
+    def __init__(self, store_url: Optional[str] = None, access_token: Optional[str] = None):
+        self.store_url = store_url or os.getenv('SHOPIFY_STORE_URL')
+        self.access_token = access_token or os.getenv('SHOPIFY_ACCESS_TOKEN')
+        self.api_version = os.getenv('SHOPIFY_API_VERSION', '2024-01')
         self.logger = logging.getLogger(__name__)
 
         if not self.store_url or not self.access_token:
@@ -21,51 +44,123 @@ class ShopifyClient:
             'X-Shopify-Access-Token': self.access_token
         }
 
+        self.MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
+        self.RETRY_DELAY = float(os.getenv('RETRY_DELAY', 1))  # seconds, doubled on each retry
+        self.TIMEOUT = (
+            float(os.getenv('SHOPIFY_CONNECT_TIMEOUT', 10)),
+            float(os.getenv('SHOPIFY_READ_TIMEOUT', 60))
+        )
+
+        self.POOL_SIZE = int(os.getenv('SHOPIFY_POOL_SIZE', 10))
+        self.session = self._create_session()
+
+        # Query cost budget shared by every client of this shop
+        self.throttle = CostThrottle.for_shop(self.store_url)
+        self.DEFAULT_QUERY_COST = float(os.getenv('SHOPIFY_DEFAULT_QUERY_COST', 10))
+        self._query_costs = {}
+        self.cost_consumed = 0.0
+
+    def _create_session(self) -> requests.Session:
+        """Keep-alive connection pool; failed requests are retried by execute alone, not by urllib3"""
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
     def execute(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Execute a GraphQL query against Shopify's API"""
+        payload = {'query': query, 'variables': variables or {}}
+        # A mutation that reached Shopify may have run, so only retry it when it was throttled
+        is_mutation = query.lstrip().startswith('mutation')
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                waited = self.throttle.acquire(self._query_costs.get(query, self.DEFAULT_QUERY_COST))
+                if waited:
+                    self.logger.debug(f"Waited {waited:.2f}s for query cost budget")
+
+                response = self.session.post(self.endpoint, json=payload, timeout=self.TIMEOUT)
+
+                if response.status_code == 429 or (response.status_code >= 500 and not is_mutation):
+                    if attempt < self.MAX_RETRIES:
+                        delay = self._retry_after(response, attempt)
+                        self.logger.warning(
+                            f"Shopify returned {response.status_code}, retrying in {delay:.1f}s "
+                            f"({attempt + 1}/{self.MAX_RETRIES})"
+                        )
+                        time.sleep(delay)
+                        continue
+                response.raise_for_status()
+
+                result = response.json()
+                self._record_cost(query, result)
+                if 'errors' in result:
+                    if self._is_throttled(result) and attempt < self.MAX_RETRIES:
+                        delay = self._throttle_delay(result, attempt)
+                        self.logger.warning(f"Query throttled, retrying in {delay:.1f}s ({attempt + 1}/{self.MAX_RETRIES})")
+                        time.sleep(delay)
+                        continue
+                    raise Exception(f"GraphQL errors: {result['errors']}")
+
+                return result['data']
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if is_mutation or attempt == self.MAX_RETRIES:
+                    self.logger.error(f"API request failed: {str(e)}")
+                    raise
+                delay = self.RETRY_DELAY * 2 ** attempt
+                self.logger.warning(f"API request failed, retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"API request failed: {str(e)}")
+                raise
+            except Exception as e:
+                self.logger.error(f"Error executing query: {str(e)}")
+                raise
+
+    def _record_cost(self, query: str, result: Dict[str, Any]) -> None:
+        """Resync the throttle and remember what this query costs for the next reservation"""
+        cost = (result.get('extensions') or {}).get('cost')
+        if not cost:
+            return
+        self.throttle.update(cost)
+        actual_cost = cost.get('actualQueryCost')
+        if actual_cost is not None:
+            self._query_costs[query] = float(actual_cost)
+            # Extractor threads share the client, and += on its own can lose updates
+            with self.throttle.lock:
+                self.cost_consumed += float(actual_cost)
+        elif cost.get('requestedQueryCost') is not None:
+            self._query_costs[query] = float(cost['requestedQueryCost'])
+
+    def _retry_after(self, response: requests.Response, attempt: int) -> float:
+        """Seconds to wait before retrying an HTTP error, honouring Retry-After"""
+        retry_after = response.headers.get('Retry-After')
         try:
-            payload = {'query': query, 'variables': variables or {}}
-            
-            response = requests.post(
-                self.endpoint,
-                json=payload,
-                headers=self.headers
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            if 'errors' in result:
-                raise Exception(f"GraphQL errors: {result['errors']}")
-                
-            return result['data']
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"API request failed: {str(e)}")
-            raise
-        except Exception as e:
-            self.logger.error(f"Error executing query: {str(e)}")
-            raise
+            return max(float(retry_after), 0.0)
+        except (TypeError, ValueError):
+            return self.RETRY_DELAY * 2 ** attempt
+
+    @staticmethod
+    def _is_throttled(result: Dict[str, Any]) -> bool:
+        return any(
+            (error.get('extensions') or {}).get('code') == 'THROTTLED'
+            for error in result.get('errors', [])
+        )
+
+    def _throttle_delay(self, result: Dict[str, Any], attempt: int) -> float:
+        """Seconds until the cost bucket has restored enough points for this query"""
+        cost = (result.get('extensions') or {}).get('cost') or {}
+        throttle_status = cost.get('throttleStatus') or {}
+        restore_rate = throttle_status.get('restoreRate')
+        if not restore_rate:
+            return self.RETRY_DELAY * 2 ** attempt
+        missing = cost.get('requestedQueryCost', 0) - throttle_status.get('currentlyAvailable', 0)
+        return max(missing, 0) / restore_rate + 0.1
 
     def get_shop_info(self) -> Dict[str, Any]:
         """Get shop information using regular GraphQL query"""
-        query = """
-        {
-            shop {
-                id
-                name
-                email
-                primaryDomain {
-                    url
-                }
-                currencyCode
-                timezoneAbbreviation
-                billingAddress {
-                    city 
-                    country
-                    zip
-                }
-            }
-        }
-        """
-        result = self.execute(query)
-        return result['shop']
\ No newline at end of file
+        result = self.execute(SHOP_INFO_QUERY)
+        return result['shop']
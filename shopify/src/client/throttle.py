@@ -0,0 +1,93 @@
+# src/client/throttle.py
+
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+class CostThrottle:
+    """
+    Client-side mirror of Shopify's leaky-bucket query cost budget.
+
+    Callers reserve the expected cost of a query before sending it and wait
+    if the bucket would run dry; every response then resyncs the bucket from
+    extensions.cost.throttleStatus. One instance is shared per shop so all
+    threads talking to the same shop draw from the same budget.
+    """
+
+    _instances: Dict[str, 'CostThrottle'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, maximum_available: float = 1000.0, restore_rate: float = 50.0):
+        self._lock = threading.Lock()
+        self.maximum_available = maximum_available
+        self.restore_rate = restore_rate
+        self._available = maximum_available
+        self._updated = time.monotonic()
+
+    @classmethod
+    def for_shop(cls, store_url: str) -> 'CostThrottle':
+        """Shared throttle for a shop"""
+        with cls._instances_lock:
+            if store_url not in cls._instances:
+                cls._instances[store_url] = cls()
+            return cls._instances[store_url]
+
+    @property
+    def lock(self) -> threading.Lock:
+        """Lock guarding the bucket, also held by clients updating cost state of their own"""
+        return self._lock
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._available
+
+    def acquire(self, cost: float) -> float:
+        """Reserve cost points, sleeping until they are available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(cost)
+            if delay is None:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, cost: float) -> float:
+        """Like acquire, but waits without blocking the event loop"""
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(cost)
+            if delay is None:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def _try_acquire(self, cost: float) -> Optional[float]:
+        """Take cost points if available, otherwise return how long until they will be"""
+        with self._lock:
+            self._refill(time.monotonic())
+            cost = min(cost, self.maximum_available)
+            if self._available >= cost:
+                self._available -= cost
+                return None
+            return (cost - self._available) / self.restore_rate
+
+    def update(self, cost_info: Dict[str, Any]) -> None:
+        """Resync the bucket from a response's extensions.cost block"""
+        throttle_status = cost_info.get('throttleStatus')
+        if not throttle_status:
+            return
+        with self._lock:
+            self.maximum_available = float(throttle_status.get('maximumAvailable', self.maximum_available))
+            self.restore_rate = float(throttle_status.get('restoreRate', self.restore_rate))
+            self._available = float(throttle_status.get('currentlyAvailable', self._available))
+            self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._available = min(
+            self.maximum_available,
+            self._available + (now - self._updated) * self.restore_rate
+        )
+        self._updated = now
@@ -0,0 +1,317 @@
+# src/extractors/async_bulk_operations.py
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from client.async_shopify_client import AsyncShopifyClient, aiohttp
+from extractors.bulk_operations import (
+    BulkOperationsExtractor, DownloadVerifier, CURRENT_OPERATION_QUERY, RUN_QUERY_MUTATION,
+    MONITOR_QUERY, TERMINAL_STATUSES
+)
+from extractors.webhooks import BulkCompletionReceiver, WEBHOOK_SUBSCRIPTION_MUTATION
+from processors.compression import open_writer, path_codec
+
+class AsyncBulkOperationsExtractor(BulkOperationsExtractor):
+    """
+    asyncio variant of BulkOperationsExtractor; polling and downloads never block the event loop.
+
+    Writing, compressing and hashing downloaded chunks, and the checkpoints taken
+    along the way, run on a thread of the extractor's own. One thread keeps the
+    chunks in order, and processing on the loop's default executor can't hold
+    up a download.
+    """
+
+    def __init__(self, client: Optional[AsyncShopifyClient] = None):
+        super().__init__(client or AsyncShopifyClient())
+        self._async_operation_slots: Optional[asyncio.Semaphore] = None
+        self._file_io: Optional[ThreadPoolExecutor] = None
+
+    async def close(self) -> None:
+        """Close the client session and release the file thread"""
+        await self.client.close()
+        if self._file_io is not None:
+            self._file_io.shutdown(wait=False)
+            self._file_io = None
+
+    async def _in_file_thread(self, fn: Callable, *args) -> Any:
+        if self._file_io is None:
+            self._file_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-download-io')
+        return await asyncio.get_running_loop().run_in_executor(self._file_io, fn, *args)
+
+    async def extract(self, query: str, file_path: str, incremental_date: Optional[datetime] = None,
+                      expected_count: Optional[int] = None) -> Dict[str, Any]:
+        """MAIN EXTRACTION METHOD"""
+        status = await self.run_operation(query, incremental_date, expected_count)
+        return await self.download_result(status, file_path)
+
+    async def run_operation(self, query: str, incremental_date: Optional[datetime] = None,
+                            expected_count: Optional[int] = None,
+                            created_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                            on_start: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Run a bulk operation until Shopify has finished it, without downloading the result"""
+        async with self._operation_slot():
+            return await self._run_operation(query, incremental_date, expected_count, created_range, on_start)
+
+    async def resume_operation(self, operation_id: str, expected_count: Optional[int] = None) -> Dict[str, Any]:
+        """Wait for an operation started by an earlier, interrupted run"""
+        async with self._operation_slot():
+            self.logger.info(f"Resuming bulk operation {operation_id}")
+            return self._final_status(await self._monitor_operation(operation_id, expected_count))
+
+    def _operation_slot(self) -> asyncio.Semaphore:
+        if self._async_operation_slots is None:
+            # Created lazily so the semaphore belongs to the running event loop
+            self._async_operation_slots = asyncio.Semaphore(self.MAX_CONCURRENT_OPERATIONS)
+        return self._async_operation_slots
+
+    async def _run_operation(self, query: str, incremental_date: Optional[datetime], expected_count: Optional[int],
+                             created_range: Optional[Tuple[Optional[str], Optional[str]]],
+                             on_start: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        try:
+            # With one operation per shop, wait for any running one first
+            if self.MAX_CONCURRENT_OPERATIONS == 1:
+                current_op = await self._check_current_operation()
+                if current_op and current_op['status'] in ['RUNNING', 'CREATED']:
+                    self.logger.warning("Another bulk operation is currently running, waiting...")
+                    status = await self._monitor_operation(current_op['id'])
+                    if status['status'] not in TERMINAL_STATUSES:
+                        raise Exception("Cannot start new operation - existing operation still running")
+
+            if incremental_date or created_range:
+                query = self._add_date_filter(query, incremental_date, created_range)
+            else:
+                query = self._remove_date_filter(query)
+
+            for attempt in range(self.MAX_RETRIES):
+                try:
+                    bulk_op = await self._start_bulk_operation(query)
+                    operation_id = bulk_op['id']
+                    self.logger.info(f"Started bulk operation {operation_id}")
+                    if on_start is not None:
+                        # Callbacks checkpoint to the state store, which blocks
+                        await self._in_file_thread(on_start, operation_id)
+
+                    status = await self._monitor_operation(operation_id, expected_count)
+                    return self._final_status(status)
+
+                except Exception as e:
+                    self.logger.error(f"Attempt {attempt + 1} failed: {str(e)}")
+                    if attempt == self.MAX_RETRIES - 1:
+                        raise
+                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
+
+        except Exception as e:
+            self.logger.error(f"Extraction failed: {str(e)}")
+            raise
+
+    async def run_shards(self, query: str, shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run one bulk operation per created_at shard, retrying failed shards on their own"""
+        statuses: Dict[int, Dict[str, Any]] = {}
+        pending = list(range(len(shards)))
+
+        for attempt in range(self.SHARD_MAX_RETRIES + 1):
+            if attempt:
+                self.logger.warning(f"Retrying {len(pending)} of {len(shards)} shards")
+            results = await asyncio.gather(
+                *(self._run_shard(query, shards, index) for index in pending), return_exceptions=True
+            )
+            failed = []
+            for index, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Shard {index + 1}/{len(shards)} failed: {str(result)}")
+                    failed.append(index)
+                else:
+                    statuses[index] = result
+            pending = failed
+            if not pending:
+                return self._sharded_status(shards, statuses)
+
+        raise Exception(f"{len(pending)} of {len(shards)} shards failed")
+
+    async def _run_shard(self, query: str, shards: List[Dict[str, Any]], index: int) -> Dict[str, Any]:
+        shard = shards[index]
+        status = await self.run_operation(query, expected_count=shard.get('expected_count'),
+                                          created_range=self._shard_range(shards, index))
+        if status['status'] != 'COMPLETED':
+            raise Exception(f"Shard ended with status: {status['status']}")
+        return status
+
+    async def oldest_created_at(self, query: str, sort_key: str) -> Optional[datetime]:
+        """Creation date of the oldest record a bulk query would export, or None if there are none"""
+        response = await self.client.execute(self._oldest_record_query(query, sort_key))
+        return self._oldest_created_at(response)
+
+    async def download_result(self, status: Dict[str, Any], file_path: str, resume_offset: int = 0,
+                              on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Download and verify the result of a finished bulk operation, checkpointed when on_progress is given.
+
+        A file_path ending in .gz or .zst is compressed as it streams in.
+        """
+        if status.get('shards'):
+            download = await self._download_shards(status['shards'], file_path)
+        elif status['status'] == 'COMPLETED' and not status.get('url'):
+            download = await self._in_file_thread(self._write_empty_result, status, file_path)
+        else:
+            url, expected_size = self._result_source(status)
+            download = await self._download_and_verify(url, file_path, expected_size, resume_offset, on_progress)
+        return self._download_summary(status, download)
+
+    async def _download_shards(self, shards: List[Dict[str, Any]], file_path: str) -> Dict[str, Any]:
+        """Download every shard and concatenate them in order"""
+        # Shards are kept uncompressed until they are merged into file_path
+        part_paths = []
+        try:
+            for index, shard in enumerate(shards):
+                part_path = f"{file_path}.shard{index:03d}"
+                part_paths.append(part_path)
+                if shard.get('url'):
+                    await self._download_and_verify(shard['url'], part_path, shard.get('fileSize'))
+                else:
+                    await self._in_file_thread(self._write_empty_result, shard, part_path)
+            return await self._in_file_thread(self._merge_parts, part_paths, file_path)
+        finally:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    async def enable_webhook(self, receiver: BulkCompletionReceiver, callback_url: str) -> None:
+        """Subscribe to bulk_operations/finish and wait on receiver instead of fixed-interval polling"""
+        if self.completion_receiver is receiver:
+            return
+        response = await self.client.execute(WEBHOOK_SUBSCRIPTION_MUTATION, {'callbackUrl': callback_url})
+        self._check_subscription(response, callback_url)
+        self.completion_receiver = receiver
+
+    async def _check_current_operation(self) -> Optional[Dict[str, Any]]:
+        """Check if there's a running bulk operation"""
+        result = await self.client.execute(CURRENT_OPERATION_QUERY)
+        return result.get('currentBulkOperation')
+
+    async def _start_bulk_operation(self, query: str) -> Dict[str, Any]:
+        """Start a bulk operation"""
+        response = await self.client.execute(RUN_QUERY_MUTATION, {'query': query})
+        return self._started_operation(response)
+
+    async def _monitor_operation(self, operation_id: str, expected_count: Optional[int] = None) -> Dict[str, Any]:
+        """Monitor bulk operation status, returning the final status with poll metrics under 'monitor'"""
+        monitor = self._new_monitor(operation_id, expected_count)
+
+        while not monitor.timed_out():
+            response = await self.client.execute(MONITOR_QUERY, {'id': operation_id})
+            current_op = response.get('node')
+
+            if not current_op:
+                raise Exception(f"Bulk operation {operation_id} not found")
+
+            if monitor.observe(current_op):
+                current_op['monitor'] = monitor.metrics()
+                return current_op
+
+            if self.completion_receiver is not None:
+                await self.completion_receiver.wait_async(operation_id, self.WEBHOOK_FALLBACK_POLL_INTERVAL)
+            else:
+                await asyncio.sleep(monitor.next_delay())
+
+        raise TimeoutError(f"Operation {operation_id} timed out")
+
+    async def _download_and_verify(self, url: str, file_path: str, expected_size: Optional[int] = None,
+                                   resume_offset: int = 0,
+                                   on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Stream the bulk operation result to disk and verify it on the fly"""
+        temp_path = f"{file_path}.tmp"
+        keep_partial = on_progress is not None
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            verifier = await self._stream_download(url, temp_path, resume_offset, on_progress, path_codec(file_path))
+
+            if self._verify_download(verifier, expected_size):
+                os.replace(temp_path, file_path)
+                self.logger.info(
+                    f"Data downloaded to {file_path} "
+                    f"({verifier.bytes_written} bytes, {verifier.line_count} lines)"
+                )
+                return verifier.summary()
+            keep_partial = False
+            raise Exception("File verification failed")
+
+        finally:
+            if not keep_partial and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def _stream_download(self, url: str, temp_path: str, resume_offset: int = 0,
+                               on_progress: Optional[Callable[[int], None]] = None,
+                               codec: Optional[str] = None) -> DownloadVerifier:
+        """Download url into temp_path chunk by chunk, resuming with HTTP Range after dropped connections"""
+        verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+        resumes = 0
+        append = False
+        if resume_offset and os.path.exists(temp_path):
+            verifier = await self._in_file_thread(self._resume_verifier, temp_path, resume_offset, codec)
+            append = True
+        checkpoint = verifier.bytes_written
+        # Result URLs are pre-signed storage links, so no Shopify headers are sent
+        timeout = aiohttp.ClientTimeout(sock_connect=10, sock_read=self.DOWNLOAD_READ_TIMEOUT)
+
+        def write(chunk: bytes) -> None:
+            nonlocal checkpoint
+            f.write(chunk)
+            verifier.update(chunk)
+            if on_progress is not None and verifier.bytes_written - checkpoint >= self.DOWNLOAD_CHECKPOINT_BYTES:
+                f.flush()
+                checkpoint = verifier.bytes_written
+                on_progress(checkpoint)
+
+        def restart() -> None:
+            f.seek(0)
+            f.truncate()
+
+        f = await self._in_file_thread(open_writer, temp_path, codec, append)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                while True:
+                    offset = verifier.bytes_written
+                    headers = {'Range': f'bytes={offset}-'} if offset else {}
+                    # The chunk being written; the next one is read from the network meanwhile
+                    pending = None
+                    try:
+                        async with session.get(url, headers=headers) as response:
+                            if offset and response.status == 416:
+                                # Nothing left to fetch, the previous attempt got every byte
+                                break
+                            response.raise_for_status()
+
+                            if offset and response.status != 206:
+                                self.logger.warning("Server ignored range request, restarting download from scratch")
+                                await self._in_file_thread(restart)
+                                verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+
+                            async for chunk in response.content.iter_chunked(self.DOWNLOAD_CHUNK_SIZE):
+                                if pending is not None:
+                                    await pending
+                                pending = asyncio.ensure_future(self._in_file_thread(write, chunk))
+                            if pending is not None:
+                                await pending
+                        break
+
+                    except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                        # Resume right after the last chunk written
+                        if pending is not None:
+                            await pending
+                        resumes += 1
+                        if resumes > self.DOWNLOAD_MAX_RESUMES:
+                            raise
+                        self.logger.warning(
+                            f"Download interrupted at byte {verifier.bytes_written}, "
+                            f"resuming ({resumes}/{self.DOWNLOAD_MAX_RESUMES}): {str(e)}"
+                        )
+                        await self._in_file_thread(f.flush)
+                        await asyncio.sleep(2 ** (resumes - 1))
+        finally:
+            await self._in_file_thread(f.close)
+
+        verifier.finish()
+        return verifier
@@ -0,0 +1,24 @@
+# src/extractors/async_shop_operations.py
+
+import asyncio
+from typing import Dict, Any, Optional
+from client.async_shopify_client import AsyncShopifyClient
+from extractors.shop_operations import ShopOperationsExtractor
+
+class AsyncShopOperationsExtractor(ShopOperationsExtractor):
+    """asyncio variant of ShopOperationsExtractor"""
+
+    def __init__(self, client: Optional[AsyncShopifyClient] = None):
+        super().__init__(client or AsyncShopifyClient())
+
+    async def extract(self, output_dir: str = '/app/data') -> Dict[str, Any]:
+        """Extract shop information"""
+        try:
+            shop_data = await self.client.get_shop_info()
+            return await asyncio.to_thread(self._save_shop_info, shop_data, output_dir)
+        except Exception as e:
+            self.logger.error(f"Failed to get shop info: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
@@ -1,39 +1,316 @@
 # src/extractors/bulk_operations.py
 
 import time
-import json
 import os
+import re
+import hashlib
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional, BinaryIO, Tuple
 from client.shopify_client import ShopifyClient
 from extractors.base import BaseExtractor
+from extractors.webhooks import BulkCompletionReceiver, WEBHOOK_SUBSCRIPTION_MUTATION
+from processors import json_codec
+from processors.compression import FrameWriter, frame_prefix_size, open_reader, open_writer, path_codec
+
+class DownloadVerifier:
+    """Tracks size, line count, checksum and boundary lines of a streamed download"""
+
+    def __init__(self, checksum: bool = True):
+        self.bytes_written = 0
+        self.line_count = 0
+        self.first_line = None
+        self.last_line = None
+        self._hash = hashlib.sha256() if checksum else None
+        self._tail = b''
+
+    def update(self, chunk: bytes) -> None:
+        """Account for the next chunk of the stream"""
+        self.bytes_written += len(chunk)
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+        last_newline = chunk.rfind(b'\n')
+        if last_newline == -1:
+            # Still inside a single line, only the tail grows
+            self._tail += chunk
+            return
+
+        self.line_count += chunk.count(b'\n')
+        if self.first_line is None:
+            self.first_line = self._tail + chunk[:chunk.find(b'\n')]
+
+        previous_newline = chunk.rfind(b'\n', 0, last_newline)
+        if previous_newline == -1:
+            self.last_line = self._tail + chunk[:last_newline]
+        else:
+            self.last_line = chunk[previous_newline + 1:last_newline]
+        self._tail = chunk[last_newline + 1:]
+
+    def finish(self) -> None:
+        """Account for a final line without a trailing newline"""
+        if self._tail:
+            self.line_count += 1
+            self.last_line = self._tail
+            if self.first_line is None:
+                self.first_line = self._tail
+            self._tail = b''
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'bytes': self.bytes_written,
+            'line_count': self.line_count,
+            'sha256': self._hash.hexdigest() if self._hash is not None else None
+        }
+
+CURRENT_OPERATION_QUERY = '''
+{
+    currentBulkOperation {
+        id
+        status
+        errorCode
+        createdAt
+        objectCount
+    }
+}
+'''
+
+RUN_QUERY_MUTATION = '''
+mutation bulkOperationRunQuery($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation {
+            id
+            status
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+'''
+
+MONITOR_QUERY = '''
+query bulkOperationStatus($id: ID!) {
+    node(id: $id) {
+        ... on BulkOperation {
+            id
+            status
+            errorCode
+            createdAt
+            completedAt
+            objectCount
+            fileSize
+            url
+            partialDataUrl
+        }
+    }
+}
+'''
+
+# Creation date of the oldest record under a query's root connection, where sharding starts;
+# sort_key is the connection's creation date sort key (see shard_sort_key in queries/entities.py)
+OLDEST_RECORD_QUERY = '''
+{{
+    {root}(first: 1, sortKey: {sort_key}) {{
+        edges {{
+            node {{
+                createdAt
+            }}
+        }}
+    }}
+}}
+'''
+
+TERMINAL_STATUSES = ['COMPLETED', 'FAILED', 'CANCELED']
+
+# API versions from 2026-01 run several bulk query operations per shop at once;
+# older versions allow one
+CONCURRENT_OPERATIONS_API_VERSION = '2026-01'
+CONCURRENT_OPERATIONS_LIMIT = 5
+
+class OperationMonitor:
+    """
+    Progress bookkeeping for one bulk operation, shared by the blocking and asyncio pollers.
+
+    Throughput is estimated from objectCount deltas between polls. When the
+    expected object count is known (from the previous run of the same entity)
+    the next poll is scheduled for the predicted completion time; otherwise the
+    interval grows with the operation's age. Both are kept within
+    [min_interval, max_interval].
+    """
+
+    RATE_SMOOTHING = 0.5  # weight of the newest sample in the moving average
+    BACKOFF_FRACTION = 0.1  # without an estimate, wait this share of the elapsed time
+
+    def __init__(self, operation_id: str, logger: logging.Logger, min_interval: float, max_interval: float,
+                 max_wait_time: float, expected_count: Optional[int] = None):
+        self.operation_id = operation_id
+        self.logger = logger
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_wait_time = max_wait_time
+        self.expected_count = expected_count or None
+        self.start_time = time.time()
+        self.last_count = 0
+        self.last_update = time.time()
+        self.polls = 0
+        self.rate: Optional[float] = None  # objects per second
+        self.eta: Optional[float] = None  # seconds until predicted completion
+        # When polling first saw the operation running and finished, splitting queue from run time
+        self.running_since: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def timed_out(self) -> bool:
+        return time.time() - self.start_time >= self.max_wait_time
+
+    def observe(self, current_op: Dict[str, Any]) -> bool:
+        """Record a polled status, returning True once the operation has finished"""
+        now = time.time()
+        self.polls += 1
+        status = current_op['status']
+        current_count = int(current_op.get('objectCount', 0))
+        if status != 'CREATED' and self.running_since is None:
+            self.running_since = now
+        if status in TERMINAL_STATUSES and self.finished_at is None:
+            self.finished_at = now
+
+        # Log progress if count has changed
+        if current_count != self.last_count:
+            sample = (current_count - self.last_count) / max(now - self.last_update, 1e-3)
+            if self.rate is None:
+                self.rate = sample
+            else:
+                self.rate = self.RATE_SMOOTHING * sample + (1 - self.RATE_SMOOTHING) * self.rate
+            self.last_count = current_count
+            self.last_update = now
+            self._estimate()
+
+            eta = f", ETA: {int(self.eta)}s" if self.eta is not None else ""
+            self.logger.info(
+                f"Operation status: {status}, "
+                f"Objects processed: {current_count}, "
+                f"Rate: {self.rate:.0f}/s{eta}, "
+                f"Time elapsed: {int(now - self.start_time)}s"
+            )
+
+        # Check for stalled operation
+        if now - self.last_update > 300:  # 5 minutes without progress
+            self.logger.warning("Operation appears stalled - no progress in 5 minutes")
+
+        return status in TERMINAL_STATUSES
+
+    def next_delay(self) -> float:
+        """Seconds to wait before the next poll"""
+        if self.eta is not None and self.eta > 0:
+            # Aim the next poll at the predicted completion time
+            delay = self.eta - (time.time() - self.last_update)
+        else:
+            delay = (time.time() - self.start_time) * self.BACKOFF_FRACTION
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'polls': self.polls,
+            'elapsed_seconds': round(time.time() - self.start_time, 3),
+            'objects_per_second': round(self.rate, 3) if self.rate is not None else None,
+            'eta_seconds': round(self.eta, 3) if self.eta is not None else None,
+            # Accurate to one poll interval
+            'queue_seconds': self._span(self.start_time, self.running_since),
+            'run_seconds': self._span(self.running_since, self.finished_at)
+        }
+
+    @staticmethod
+    def _span(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        return round(end - start, 3) if start is not None and end is not None else None
+
+    def _estimate(self) -> None:
+        """Predicted seconds to completion, if the expected size is known"""
+        if not self.expected_count or not self.rate:
+            self.eta = None
+            return
+        self.eta = max(self.expected_count - self.last_count, 0) / self.rate
 
 class BulkOperationsExtractor(BaseExtractor):
-    def __init__(self):
-        self.client = ShopifyClient()
+    def __init__(self, client: Optional[ShopifyClient] = None):
+        self.client = client or ShopifyClient()
         self.logger = logging.getLogger(__name__)
         self.MAX_RETRIES = 3
-        self.POLL_INTERVAL = 5  # seconds
+        self.POLL_MIN_INTERVAL = float(os.getenv('BULK_POLL_MIN_INTERVAL', 1))  # seconds
+        self.POLL_MAX_INTERVAL = float(os.getenv('BULK_POLL_MAX_INTERVAL', 30))  # seconds
         self.MAX_WAIT_TIME = 3600  # 1 hour
+        self.DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))  # bytes
+        self.DOWNLOAD_READ_TIMEOUT = int(os.getenv('DOWNLOAD_READ_TIMEOUT', 300))  # seconds
+        self.DOWNLOAD_MAX_RESUMES = int(os.getenv('DOWNLOAD_MAX_RESUMES', 5))
+        self.DOWNLOAD_CHECKSUM = os.getenv('DOWNLOAD_CHECKSUM', 'true').lower() == 'true'
+        # How often a checkpointed download reports the bytes safely on disk
+        self.DOWNLOAD_CHECKPOINT_BYTES = int(os.getenv('DOWNLOAD_CHECKPOINT_BYTES', 64 * 1024 * 1024))
+        # With a webhook receiver the monitor sleeps until notified, polling only as a fallback
+        self.WEBHOOK_FALLBACK_POLL_INTERVAL = int(os.getenv('WEBHOOK_FALLBACK_POLL_INTERVAL', 60))  # seconds
+        self.completion_receiver: Optional[BulkCompletionReceiver] = None
+        self.MAX_CONCURRENT_OPERATIONS = int(os.getenv(
+            'BULK_MAX_CONCURRENT_OPERATIONS', self._supported_concurrency(self.client.api_version)
+        ))
+        # Shared by every caller so shards of several entities stay within the shop's limit
+        self._operation_slots = threading.BoundedSemaphore(self.MAX_CONCURRENT_OPERATIONS)
+        # Rounds in which only the failed shards of a sharded export are run again
+        self.SHARD_MAX_RETRIES = int(os.getenv('BULK_SHARD_MAX_RETRIES', 2))
+
+    @staticmethod
+    def _supported_concurrency(api_version: str) -> int:
+        """Bulk query operations the shop accepts at once; 'unstable' gets the newest behaviour"""
+        if api_version == 'unstable' or api_version >= CONCURRENT_OPERATIONS_API_VERSION:
+            return CONCURRENT_OPERATIONS_LIMIT
+        return 1
 
-    def extract(self, query: str, file_path: str, incremental_date: Optional[datetime] = None) -> Dict[str, Any]:
+    def extract(self, query: str, file_path: str, incremental_date: Optional[datetime] = None,
+                expected_count: Optional[int] = None) -> Dict[str, Any]:
         """MAIN EXTRACTION METHOD"""
+        status = self.run_operation(query, incremental_date, expected_count)
+        return self.download_result(status, file_path)
+
+    def run_operation(self, query: str, incremental_date: Optional[datetime] = None,
+                      expected_count: Optional[int] = None,
+                      created_range: Optional[Tuple[Optional[str], Optional[str]]] = None,
+                      on_start: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Run a bulk operation until Shopify has finished it, without downloading the result.
+        expected_count (e.g. the previous run's object count) lets the poller predict completion;
+        created_range limits the export to records created in [start, end), either end open;
+        on_start is called with the operation id as soon as Shopify accepted it.
+        """
+        with self._operation_slots:
+            return self._run_operation(query, incremental_date, expected_count, created_range, on_start)
+
+    def resume_operation(self, operation_id: str, expected_count: Optional[int] = None) -> Dict[str, Any]:
+        """Wait for an operation started by an earlier, interrupted run"""
+        with self._operation_slots:
+            self.logger.info(f"Resuming bulk operation {operation_id}")
+            return self._final_status(self._monitor_operation(operation_id, expected_count))
+
+    def _run_operation(self, query: str, incremental_date: Optional[datetime], expected_count: Optional[int],
+                       created_range: Optional[Tuple[Optional[str], Optional[str]]],
+                       on_start: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         try:
-            # Check for running operations first
-            current_op = self._check_current_operation()
-            if current_op and current_op['status'] in ['RUNNING', 'CREATED']:
-                self.logger.warning("Another bulk operation is currently running, waiting...")
-                status = self._monitor_operation(current_op['id'])
-                if status['status'] not in ['COMPLETED', 'FAILED', 'CANCELED']:
-                    raise Exception("Cannot start new operation - existing operation still running")
+            # With one operation per shop, wait for any running one first
+            if self.MAX_CONCURRENT_OPERATIONS == 1:
+                current_op = self._check_current_operation()
+                if current_op and current_op['status'] in ['RUNNING', 'CREATED']:
+                    self.logger.warning("Another bulk operation is currently running, waiting...")
+                    status = self._monitor_operation(current_op['id'])
+                    if status['status'] not in TERMINAL_STATUSES:
+                        raise Exception("Cannot start new operation - existing operation still running")
 
             for attempt in range(self.MAX_RETRIES):
                 try:
-                    # Add incremental filter if date provided
-                    if incremental_date:
-                        query = self._add_date_filter(query, incremental_date)
+                    # Add incremental and shard filters if given, otherwise export everything
+                    if incremental_date or created_range:
+                        query = self._add_date_filter(query, incremental_date, created_range)
+                    else:
+                        query = self._remove_date_filter(query)
 
                     # Removed validation that was causing issues
                     # self._validate_query(query)
@@ -42,34 +319,13 @@ class BulkOperationsExtractor(BaseExtractor):
                     bulk_op = self._start_bulk_operation(query)
                     operation_id = bulk_op['id']
                     self.logger.info(f"Started bulk operation {operation_id}")
+                    if on_start is not None:
+                        on_start(operation_id)
 
                     # Monitor progress
-                    status = self._monitor_operation(operation_id)
-                    
-                    if status['status'] == 'COMPLETED':
-                        # Download and verify data
-                        self._download_and_verify(status['url'], file_path)
-                        return {
-                            'success': True,
-                            'operation_id': operation_id,
-                            'records_count': status.get('objectCount', 0),
-                            'file_size': status.get('fileSize', 0)
-                        }
-                    elif status['status'] == 'FAILED':
-                        if status.get('partialDataUrl'):
-                            self.logger.warning("Operation failed but partial data is available")
-                            self._download_and_verify(status['partialDataUrl'], file_path)
-                            return {
-                                'success': True,
-                                'operation_id': operation_id,
-                                'records_count': status.get('objectCount', 0),
-                                'file_size': status.get('fileSize', 0),
-                                'partial': True
-                            }
-                        error_code = status.get('errorCode', 'Unknown error')
-                        raise Exception(f"Operation failed: {error_code}")
-                    else:
-                        raise Exception(f"Operation ended with status: {status['status']}")
+                    status = self._monitor_operation(operation_id, expected_count)
+
+                    return self._final_status(status)
 
                 except Exception as e:
                     self.logger.error(f"Attempt {attempt + 1} failed: {str(e)}")
@@ -81,148 +337,392 @@ class BulkOperationsExtractor(BaseExtractor):
             self.logger.error(f"Extraction failed: {str(e)}")
             raise
 
+    def run_shards(self, query: str, shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run one bulk operation per created_at shard, as many at once as the shop allows.
+
+        A failed shard is run again on its own, up to SHARD_MAX_RETRIES more rounds,
+        without repeating the shards that finished. Returns a combined status whose
+        'shards' download_result merges in shard order.
+        """
+        statuses: Dict[int, Dict[str, Any]] = {}
+        pending = list(range(len(shards)))
+
+        for attempt in range(self.SHARD_MAX_RETRIES + 1):
+            if attempt:
+                self.logger.warning(f"Retrying {len(pending)} of {len(shards)} shards")
+            with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_OPERATIONS) as pool:
+                futures = {index: pool.submit(self._run_shard, query, shards, index) for index in pending}
+            failed = []
+            for index, future in futures.items():
+                try:
+                    statuses[index] = future.result()
+                except Exception as e:
+                    self.logger.error(f"Shard {index + 1}/{len(shards)} failed: {str(e)}")
+                    failed.append(index)
+            pending = failed
+            if not pending:
+                return self._sharded_status(shards, statuses)
+
+        raise Exception(f"{len(pending)} of {len(shards)} shards failed")
+
+    def _run_shard(self, query: str, shards: List[Dict[str, Any]], index: int) -> Dict[str, Any]:
+        shard = shards[index]
+        status = self.run_operation(query, expected_count=shard.get('expected_count'),
+                                    created_range=self._shard_range(shards, index))
+        if status['status'] != 'COMPLETED':
+            # Partial data of one shard would leave a hole in the middle of the export
+            raise Exception(f"Shard ended with status: {status['status']}")
+        return status
+
+    @staticmethod
+    def _shard_range(shards: List[Dict[str, Any]], index: int) -> Tuple[Optional[str], Optional[str]]:
+        """The outer shards are left open so records outside the planned span are not lost"""
+        start = shards[index]['start'] if index > 0 else None
+        end = shards[index]['end'] if index < len(shards) - 1 else None
+        return start, end
+
+    @staticmethod
+    def _sharded_status(shards: List[Dict[str, Any]], statuses: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine shard statuses into one that stands for the whole export"""
+        ordered = [{**statuses[index], 'start': shard['start'], 'end': shard['end']}
+                   for index, shard in enumerate(shards)]
+        return {
+            'id': ordered[0]['id'],
+            'status': 'COMPLETED',
+            # Changes made while the earliest shard ran may be missing from later ones
+            'createdAt': min(shard['createdAt'] for shard in ordered),
+            'objectCount': sum(int(shard.get('objectCount', 0)) for shard in ordered),
+            'fileSize': sum(int(shard.get('fileSize') or 0) for shard in ordered),
+            'shards': ordered
+        }
+
+    def oldest_created_at(self, query: str, sort_key: str) -> Optional[datetime]:
+        """Creation date of the oldest record a bulk query would export, or None if there are none"""
+        response = self.client.execute(self._oldest_record_query(query, sort_key))
+        return self._oldest_created_at(response)
+
+    @staticmethod
+    def _oldest_record_query(query: str, sort_key: str) -> str:
+        root = re.search(r'(\w+)\{INCREMENTAL_FILTER\}', query).group(1)
+        return OLDEST_RECORD_QUERY.format(root=root, sort_key=sort_key)
+
+    @staticmethod
+    def _oldest_created_at(response: Dict[str, Any]) -> Optional[datetime]:
+        edges = next(iter(response.values()))['edges']
+        if not edges:
+            return None
+        created_at = datetime.fromisoformat(edges[0]['node']['createdAt'].replace('Z', '+00:00'))
+        return created_at.replace(tzinfo=None)
+
+    def download_result(self, status: Dict[str, Any], file_path: str, sink: Optional[BinaryIO] = None,
+                        resume_offset: int = 0, on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Download and verify the result of a finished bulk operation, optionally teeing it into sink.
+
+        With on_progress the download is checkpointed: it is called with the number of
+        bytes safely on disk, and an interrupted download keeps its partial file so a
+        later call with that resume_offset continues from there.
+
+        A file_path ending in .gz or .zst is compressed as it streams in, and so is
+        what goes to sink; sizes and offsets always count uncompressed bytes.
+        """
+        codec = path_codec(file_path)
+        compressed_sink = FrameWriter(sink, codec, close_file=False) if sink is not None and codec else None
+        download = self._download(status, file_path, compressed_sink or sink, resume_offset, on_progress)
+        if compressed_sink is not None:
+            # Ends the last frame; the sink itself stays open for its owner
+            compressed_sink.close()
+        return self._download_summary(status, download)
+
+    def _download(self, status: Dict[str, Any], file_path: str, sink: Optional[BinaryIO],
+                  resume_offset: int, on_progress: Optional[Callable[[int], None]]) -> Dict[str, Any]:
+        if status.get('shards'):
+            return self._download_shards(status['shards'], file_path, sink)
+        if status['status'] == 'COMPLETED' and not status.get('url'):
+            return self._write_empty_result(status, file_path)
+        url, expected_size = self._result_source(status)
+        return self._download_and_verify(url, file_path, expected_size, sink, resume_offset, on_progress)
+
+    def _write_empty_result(self, status: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+        """Shopify returns no file when nothing matched, e.g. an incremental run without changes"""
+        self.logger.info(f"Operation {status['id']} returned no data")
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        open_writer(file_path, path_codec(file_path)).close()
+        return DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM).summary()
+
+    def _download_shards(self, shards: List[Dict[str, Any]], file_path: str,
+                         sink: Optional[BinaryIO] = None) -> Dict[str, Any]:
+        """Download every shard and concatenate them in order; parent/child groups never span shards"""
+        # Shards are kept uncompressed until they are merged into file_path
+        part_paths = []
+        try:
+            for index, shard in enumerate(shards):
+                part_path = f"{file_path}.shard{index:03d}"
+                part_paths.append(part_path)
+                if shard.get('url'):
+                    self._download_and_verify(shard['url'], part_path, shard.get('fileSize'))
+                else:
+                    self._write_empty_result(shard, part_path)
+            return self._merge_parts(part_paths, file_path, sink)
+        finally:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    def _merge_parts(self, part_paths: List[str], file_path: str, sink: Optional[BinaryIO] = None) -> Dict[str, Any]:
+        verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+        temp_path = f"{file_path}.tmp"
+        with open_writer(temp_path, path_codec(file_path)) as f:
+            for part_path in part_paths:
+                with open(part_path, 'rb') as part:
+                    for chunk in iter(lambda: part.read(self.DOWNLOAD_CHUNK_SIZE), b''):
+                        f.write(chunk)
+                        verifier.update(chunk)
+                        if sink is not None:
+                            sink.write(chunk)
+        verifier.finish()
+        os.replace(temp_path, file_path)
+        self.logger.info(f"Merged {len(part_paths)} shards into {file_path} ({verifier.line_count} lines)")
+        return verifier.summary()
+
+    @staticmethod
+    def _result_source(status: Dict[str, Any]) -> Tuple[str, Optional[int]]:
+        """URL to download and its expected size; partial data has no known size"""
+        if status['status'] == 'COMPLETED':
+            return status['url'], status.get('fileSize')
+        return status['partialDataUrl'], None
+
+    @staticmethod
+    def _download_summary(status: Dict[str, Any], download: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            'success': True,
+            'operation_id': status['id'],
+            'records_count': status.get('objectCount', 0),
+            'file_size': status.get('fileSize', 0),
+            'line_count': download['line_count'],
+            'sha256': download['sha256'],
+            'monitor': status.get('monitor')
+        }
+        if status['status'] != 'COMPLETED':
+            result['partial'] = True
+        return result
+
+    def enable_webhook(self, receiver: BulkCompletionReceiver, callback_url: str) -> None:
+        """Subscribe to bulk_operations/finish and wait on receiver instead of fixed-interval polling"""
+        if self.completion_receiver is receiver:
+            return
+        response = self.client.execute(WEBHOOK_SUBSCRIPTION_MUTATION, {'callbackUrl': callback_url})
+        self._check_subscription(response, callback_url)
+        self.completion_receiver = receiver
+
+    def _check_subscription(self, response: Dict[str, Any], callback_url: str) -> None:
+        user_errors = response['webhookSubscriptionCreate'].get('userErrors', [])
+        # Shopify refuses a second subscription for the same address, which is fine
+        user_errors = [error for error in user_errors if 'taken' not in error.get('message', '')]
+        if user_errors:
+            raise Exception(f"User errors: {user_errors}")
+        self.logger.info(f"Bulk operation completion webhooks go to {callback_url}")
+
+    def _final_status(self, status: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a finished operation whose data can be downloaded, or raise"""
+        if status['status'] == 'COMPLETED':
+            return status
+        elif status['status'] == 'FAILED':
+            if status.get('partialDataUrl'):
+                self.logger.warning("Operation failed but partial data is available")
+                return status
+            error_code = status.get('errorCode', 'Unknown error')
+            raise Exception(f"Operation failed: {error_code}")
+        else:
+            raise Exception(f"Operation ended with status: {status['status']}")
+
     def _check_current_operation(self) -> Optional[Dict[str, Any]]:
         """Check if there's a running bulk operation"""
-        query = '''
-        {
-            currentBulkOperation {
-                id
-                status
-                errorCode
-                createdAt
-                objectCount
-            }
-        }
-        '''
-        result = self.client.execute(query)
+        result = self.client.execute(CURRENT_OPERATION_QUERY)
         return result.get('currentBulkOperation')
 
     def _start_bulk_operation(self, query: str) -> Dict[str, Any]:
         """Start a bulk operation"""
-        mutation = '''
-        mutation bulkOperationRunQuery($query: String!) {
-            bulkOperationRunQuery(query: $query) {
-                bulkOperation {
-                    id
-                    status
-                }
-                userErrors {
-                    field
-                    message
-                }
-            }
-        }
-        '''
         variables = {'query': query}
-        response = self.client.execute(mutation, variables)
-        
+        response = self.client.execute(RUN_QUERY_MUTATION, variables)
+        return self._started_operation(response)
+
+    @staticmethod
+    def _started_operation(response: Dict[str, Any]) -> Dict[str, Any]:
         user_errors = response['bulkOperationRunQuery'].get('userErrors', [])
         if user_errors:
             raise Exception(f"User errors: {user_errors}")
-            
+
         return response['bulkOperationRunQuery']['bulkOperation']
 
-    def _monitor_operation(self, operation_id: str) -> Dict[str, Any]:
-        """Monitor bulk operation status"""
-        query = '''
-        {
-            currentBulkOperation {
-                id
-                status
-                errorCode
-                createdAt
-                completedAt
-                objectCount
-                fileSize
-                url
-                partialDataUrl
-            }
-        }
-        '''
-        
-        start_time = time.time()
-        last_count = 0
-        last_update = time.time()
-        
-        while time.time() - start_time < self.MAX_WAIT_TIME:
-            response = self.client.execute(query)
-            current_op = response.get('currentBulkOperation')
-            
+    def _new_monitor(self, operation_id: str, expected_count: Optional[int] = None) -> OperationMonitor:
+        return OperationMonitor(operation_id, self.logger, self.POLL_MIN_INTERVAL, self.POLL_MAX_INTERVAL,
+                                self.MAX_WAIT_TIME, expected_count)
+
+    def _monitor_operation(self, operation_id: str, expected_count: Optional[int] = None) -> Dict[str, Any]:
+        """Monitor bulk operation status, returning the final status with poll metrics under 'monitor'"""
+        monitor = self._new_monitor(operation_id, expected_count)
+
+        while not monitor.timed_out():
+            response = self.client.execute(MONITOR_QUERY, {'id': operation_id})
+            current_op = response.get('node')
+
             if not current_op:
-                raise Exception("No active bulk operation found")
-                
-            status = current_op['status']
-            current_count = int(current_op.get('objectCount', 0))
-            
-            # Log progress if count has changed
-            if current_count != last_count:
-                self.logger.info(
-                    f"Operation status: {status}, "
-                    f"Objects processed: {current_count}, "
-                    f"Time elapsed: {int(time.time() - start_time)}s"
-                )
-                last_count = current_count
-                last_update = time.time()
-            
-            # Check for stalled operation
-            if time.time() - last_update > 300:  # 5 minutes without progress
-                self.logger.warning("Operation appears stalled - no progress in 5 minutes")
-            
-            if status in ['COMPLETED', 'FAILED', 'CANCELED']:
+                raise Exception(f"Bulk operation {operation_id} not found")
+
+            if monitor.observe(current_op):
+                current_op['monitor'] = monitor.metrics()
                 return current_op
-                
-            time.sleep(self.POLL_INTERVAL)
-            
+
+            if self.completion_receiver is not None:
+                # Woken early by the webhook; the next poll then fetches the final status
+                self.completion_receiver.wait(operation_id, self.WEBHOOK_FALLBACK_POLL_INTERVAL)
+            else:
+                time.sleep(monitor.next_delay())
+
         raise TimeoutError(f"Operation {operation_id} timed out")
 
-    def _download_and_verify(self, url: str, file_path: str) -> None:
-        """Download and verify the bulk operation result"""
+    def _download_and_verify(self, url: str, file_path: str, expected_size: Optional[int] = None,
+                             sink: Optional[BinaryIO] = None, resume_offset: int = 0,
+                             on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Stream the bulk operation result to disk and verify it on the fly"""
         temp_path = f"{file_path}.tmp"
+        # A checkpointed download keeps what it got so far for the next attempt
+        keep_partial = on_progress is not None
         try:
             # Ensure directory exists
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            # Download file
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            with open(temp_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Verify file integrity
-            if self._verify_file(temp_path):
-                os.rename(temp_path, file_path)
-                self.logger.info(f"Data downloaded to {file_path}")
-            else:
-                raise Exception("File verification failed")
-                
+
+            verifier = self._stream_download(url, temp_path, sink, resume_offset, on_progress, path_codec(file_path))
+
+            # Verify file integrity from what was seen during the stream
+            if self._verify_download(verifier, expected_size):
+                os.replace(temp_path, file_path)
+                self.logger.info(
+                    f"Data downloaded to {file_path} "
+                    f"({verifier.bytes_written} bytes, {verifier.line_count} lines)"
+                )
+                return verifier.summary()
+            keep_partial = False
+            raise Exception("File verification failed")
+
         finally:
-            if os.path.exists(temp_path):
+            if not keep_partial and os.path.exists(temp_path):
                 os.remove(temp_path)
 
-    def _verify_file(self, file_path: str) -> bool:
-        """Verify the downloaded file integrity"""
+    def _stream_download(self, url: str, temp_path: str, sink: Optional[BinaryIO] = None, resume_offset: int = 0,
+                         on_progress: Optional[Callable[[int], None]] = None,
+                         codec: Optional[str] = None) -> DownloadVerifier:
+        """
+        Download url into temp_path chunk by chunk, resuming with HTTP Range after dropped connections.
+
+        With a codec the file is compressed on the way; each checkpoint ends a
+        compressed frame, so the partial file stays readable up to it.
+        """
+        verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+        resumes = 0
+        append = False
+        if resume_offset and os.path.exists(temp_path):
+            verifier = self._resume_verifier(temp_path, resume_offset, codec)
+            append = True
+        checkpoint = verifier.bytes_written
+
+        with open_writer(temp_path, codec, append) as f:
+            while True:
+                offset = verifier.bytes_written
+                headers = {'Range': f'bytes={offset}-'} if offset else {}
+                try:
+                    with requests.get(url, headers=headers, stream=True,
+                                      timeout=(10, self.DOWNLOAD_READ_TIMEOUT)) as response:
+                        if offset and response.status_code == 416:
+                            # Nothing left to fetch, the previous attempt got every byte
+                            break
+                        response.raise_for_status()
+
+                        if offset and response.status_code != 206:
+                            if sink is not None:
+                                raise Exception("Server ignored range request, cannot restart a streamed upload")
+                            self.logger.warning("Server ignored range request, restarting download from scratch")
+                            f.seek(0)
+                            f.truncate()
+                            verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+
+                        for chunk in response.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                            if chunk:
+                                f.write(chunk)
+                                verifier.update(chunk)
+                                if sink is not None:
+                                    sink.write(chunk)
+                                if on_progress is not None and verifier.bytes_written - checkpoint >= self.DOWNLOAD_CHECKPOINT_BYTES:
+                                    f.flush()
+                                    checkpoint = verifier.bytes_written
+                                    on_progress(checkpoint)
+                    break
+
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as e:
+                    resumes += 1
+                    if resumes > self.DOWNLOAD_MAX_RESUMES:
+                        raise
+                    self.logger.warning(
+                        f"Download interrupted at byte {verifier.bytes_written}, "
+                        f"resuming ({resumes}/{self.DOWNLOAD_MAX_RESUMES}): {str(e)}"
+                    )
+                    f.flush()
+                    time.sleep(2 ** (resumes - 1))
+
+        verifier.finish()
+        return verifier
+
+    def _resume_verifier(self, temp_path: str, offset: int, codec: Optional[str] = None) -> DownloadVerifier:
+        """Verifier primed with the bytes an earlier attempt left in temp_path, cut back to offset"""
+        verifier = DownloadVerifier(checksum=self.DOWNLOAD_CHECKSUM)
+        # A compressed file can only be cut after a whole frame; checkpoints always end one
+        size = offset if codec is None else frame_prefix_size(temp_path, codec, offset)
+        with open(temp_path, 'r+b') as f:
+            f.truncate(min(size, os.path.getsize(temp_path)))
+        with open_reader(temp_path, codec) as f:
+            for chunk in iter(lambda: f.read(self.DOWNLOAD_CHUNK_SIZE), b''):
+                verifier.update(chunk)
+        self.logger.info(f"Resuming download at byte {verifier.bytes_written}")
+        return verifier
+
+    def _verify_download(self, verifier: DownloadVerifier, expected_size: Optional[int] = None) -> bool:
+        """Verify the downloaded file integrity without re-reading it"""
         try:
-            with open(file_path, 'r') as f:
-                # Check first and last line can be parsed
-                first_line = next(f)
-                json.loads(first_line)
-                
-                # Seek to last line
-                f.seek(max(0, os.path.getsize(file_path) - 4096))
-                last_line = list(f)[-1]
-                json.loads(last_line)
-                
+            if expected_size is not None and int(expected_size) != verifier.bytes_written:
+                raise Exception(f"Expected {expected_size} bytes, got {verifier.bytes_written}")
+
+            # Check first and last line can be parsed
+            json_codec.loads(verifier.first_line)
+            json_codec.loads(verifier.last_line)
+
             return True
         except Exception as e:
             self.logger.error(f"File verification failed: {str(e)}")
             return False
 
     @staticmethod
-    def _add_date_filter(query: str, date: datetime) -> str:
-        """Add incremental date filter to query"""
-        date_str = date.strftime("%Y-%m-%d")
+    def _add_date_filter(query: str, date: Optional[datetime],
+                         created_range: Optional[Tuple[Optional[str], Optional[str]]] = None) -> str:
+        """Add incremental date filter, and optionally a created_at range, to query"""
+        terms = []
+        if date:
+            terms.append(f"updated_at:>='{date.strftime('%Y-%m-%dT%H:%M:%SZ')}'")
+        if created_range:
+            start, end = created_range
+            if start:
+                terms.append(f"created_at:>='{start}Z'")
+            if end:
+                terms.append(f"created_at:<'{end}Z'")
         return query.replace(
-            "{INCREMENTAL_FILTER}", 
-            f'query: "updated_at:>={date_str}"'
-        )
\ No newline at end of file
+            "{INCREMENTAL_FILTER}",
+            f'(query: "{" AND ".join(terms)}")'
+        )
+
+    @staticmethod
+    def _remove_date_filter(query: str) -> str:
+        """Drop the incremental filter placeholder for a full export"""
+        return query.replace("{INCREMENTAL_FILTER}", "")
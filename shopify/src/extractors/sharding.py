@@ -0,0 +1,75 @@
+# src/extractors/sharding.py
+
+import math
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+def plan_shards(start: datetime, end: datetime, history: Optional[List[Dict[str, Any]]] = None,
+                total_count: Optional[int] = None, target_objects: int = 1000000,
+                default_count: int = 8, max_count: int = 64) -> List[Dict[str, Any]]:
+    """
+    Split [start, end) into created_at ranges holding roughly target_objects each.
+
+    history holds the {start, end, objects} ranges of the previous sharded export
+    and gives the shape of the data over time; without it objects are assumed to be
+    spread evenly, totalling total_count if known. The extractor leaves the first
+    range open below and the last open above, so records outside [start, end) are
+    still exported.
+    """
+    buckets = _buckets(start, end, history, total_count)
+    total = sum(objects for _, _, objects in buckets)
+    if history or total_count:
+        count = math.ceil(total / target_objects) if total else 1
+    else:
+        count = default_count
+    count = max(1, min(count, max_count))
+
+    # Boundaries at equal shares of the objects, uniform within a bucket
+    boundaries = []
+    for k in range(1, count):
+        boundary = _quantile(buckets, total * k / count).replace(microsecond=0)
+        if (boundaries[-1] if boundaries else start) < boundary < end:
+            boundaries.append(boundary)
+
+    edges = [start.replace(microsecond=0), *boundaries, end.replace(microsecond=0)]
+    expected = round(total / (len(edges) - 1)) if (history or total_count) else None
+    return [
+        {'start': edges[i].isoformat(), 'end': edges[i + 1].isoformat(), 'expected_count': expected}
+        for i in range(len(edges) - 1)
+    ]
+
+def shard_history(shards: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Object counts per range of a finished sharded export, for planning the next one"""
+    return [
+        {'start': shard['start'], 'end': shard['end'], 'objects': int(shard.get('objectCount', 0))}
+        for shard in shards
+    ]
+
+def _buckets(start: datetime, end: datetime, history: Optional[List[Dict[str, Any]]],
+             total_count: Optional[int]) -> List[tuple]:
+    """(start, end, objects) ranges covering [start, end); without counts, time stands in for objects"""
+    if not history:
+        objects = total_count or (end - start).total_seconds()
+        return [(start, end, objects)]
+
+    buckets = [
+        (datetime.fromisoformat(h['start']), datetime.fromisoformat(h['end']), h['objects'])
+        for h in history
+    ]
+    buckets.sort(key=lambda bucket: bucket[0])
+
+    # Records created since the previous export arrive at the most recent rate
+    last_start, last_end, last_objects = buckets[-1]
+    if end > last_end:
+        rate = last_objects / max((last_end - last_start).total_seconds(), 1)
+        buckets.append((last_end, end, rate * (end - last_end).total_seconds()))
+    return buckets
+
+def _quantile(buckets: List[tuple], target: float) -> datetime:
+    """Point in time before which target objects were created"""
+    seen = 0
+    for bucket_start, bucket_end, objects in buckets:
+        if objects and seen + objects >= target:
+            return bucket_start + (bucket_end - bucket_start) * ((target - seen) / objects)
+        seen += objects
+    return buckets[-1][1]
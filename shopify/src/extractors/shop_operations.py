@@ -1,42 +1,25 @@
 # src/extractors/shop_operations.py
 
 import os
-import json
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 from client.shopify_client import ShopifyClient
 from extractors.base import BaseExtractor
+from processors import json_codec
+from processors.compression import codec_from_env, extension, open_writer
 
 class ShopOperationsExtractor(BaseExtractor):
-    def __init__(self):
-        self.client = ShopifyClient()
+    def __init__(self, client: Optional[ShopifyClient] = None):
+        self.client = client or ShopifyClient()
         self.logger = logging.getLogger(__name__)
 
     def extract(self, output_dir: str = '/app/data') -> Dict[str, Any]:
         """Extract shop information"""
         try:
-            # Prepare output directory
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            processed_dir = os.path.join(output_dir, 'processed', 'shop_info')
-            os.makedirs(processed_dir, exist_ok=True)
-            
             # Get shop info
             shop_data = self.client.get_shop_info()
-            
-            # Save to file
-            processed_path = os.path.join(processed_dir, f"{timestamp}.json")
-            with open(processed_path, 'w') as f:
-                json.dump(shop_data, f, indent=2)
-            
-            result = {
-                'success': True,
-                'records_count': 1,
-                'file_size': os.path.getsize(processed_path),
-                'processed_path': processed_path
-            }
-            
-            return result
+            return self._save_shop_info(shop_data, output_dir)
             
         except Exception as e:
             self.logger.error(f"Failed to get shop info: {str(e)}")
@@ -45,4 +28,25 @@ class ShopOperationsExtractor(BaseExtractor):
                 'error': str(e)
             }
             
-            return error_result
\ No newline at end of file
+            return error_result
+
+    @staticmethod
+    def _save_shop_info(shop_data: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+        """Write shop info under output_dir/processed/shop_info"""
+        # Prepare output directory
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+        processed_dir = os.path.join(output_dir, 'processed', 'shop_info')
+        os.makedirs(processed_dir, exist_ok=True)
+
+        # Save to file, compressed like the other processed files
+        codec = codec_from_env()
+        processed_path = os.path.join(processed_dir, f"{timestamp}.json{extension(codec)}")
+        with open_writer(processed_path, codec) as f:
+            f.write(json_codec.dumps_pretty(shop_data))
+
+        return {
+            'success': True,
+            'records_count': 1,
+            'file_size': os.path.getsize(processed_path),
+            'processed_path': processed_path
+        }
@@ -0,0 +1,164 @@
+# src/extractors/webhooks.py
+
+import os
+import hmac
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from processors import json_codec
+
+WEBHOOK_SUBSCRIPTION_MUTATION = '''
+mutation webhookSubscriptionCreate($callbackUrl: URL!) {
+    webhookSubscriptionCreate(
+        topic: BULK_OPERATIONS_FINISH
+        webhookSubscription: {callbackUrl: $callbackUrl, format: JSON}
+    ) {
+        webhookSubscription {
+            id
+        }
+        userErrors {
+            field
+            message
+        }
+    }
+}
+'''
+
+class BulkCompletionReceiver:
+    """
+    Lightweight local receiver for Shopify's bulk_operations/finish webhook.
+
+    Extractors block in wait() (or wait_async()) instead of sleeping between
+    polls and are woken as soon as the webhook for their operation arrives.
+    Notifications that arrive before anyone waits are kept, so the webhook
+    can't be missed by racing the waiter. Every request must carry Shopify's
+    HMAC signature, so the receiver won't start without the app's secret.
+    """
+
+    _shared: Optional['BulkCompletionReceiver'] = None
+    _shared_lock = threading.Lock()
+
+    MAX_PENDING = 1000  # undelivered notifications kept for late waiters
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 8080, secret: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self._lock = threading.Lock()
+        self._payloads: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._waiters: Dict[str, List[Callable[[], None]]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def shared(cls) -> 'BulkCompletionReceiver':
+        """Process-wide receiver configured from the environment, started on first use"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                receiver = cls(
+                    port=int(os.getenv('BULK_WEBHOOK_PORT', 8080)),
+                    secret=os.getenv('SHOPIFY_WEBHOOK_SECRET')
+                )
+                receiver.start()
+                cls._shared = receiver
+            return cls._shared
+
+    def start(self) -> None:
+        if not self.secret:
+            # Anyone who can reach the port could otherwise wake monitors with forged notifications
+            raise ValueError("SHOPIFY_WEBHOOK_SECRET must be set to receive bulk operation webhooks")
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not receiver.verify(body, self.headers.get('X-Shopify-Hmac-Sha256')):
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                try:
+                    receiver.notify(json_codec.loads(body))
+                except (ValueError, KeyError):
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                receiver.logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_port
+        threading.Thread(target=self._server.serve_forever, name='bulk-webhook', daemon=True).start()
+        self.logger.info(f"Listening for bulk operation webhooks on port {self.port}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def verify(self, body: bytes, hmac_header: Optional[str]) -> bool:
+        """Check Shopify's HMAC signature; without a configured secret every request is rejected"""
+        if not self.secret or not hmac_header:
+            return False
+        digest = hmac.new(self.secret.encode(), body, hashlib.sha256).digest()
+        return hmac.compare_digest(base64.b64encode(digest).decode(), hmac_header)
+
+    def notify(self, payload: Dict[str, Any]) -> None:
+        """Record a finished operation and wake whoever waits for it"""
+        operation_id = payload['admin_graphql_api_id']
+        self.logger.info(f"Webhook: bulk operation {operation_id} finished with status {payload.get('status')}")
+        with self._lock:
+            self._payloads[operation_id] = payload
+            while len(self._payloads) > self.MAX_PENDING:
+                self._payloads.popitem(last=False)
+            callbacks = list(self._waiters.get(operation_id, []))
+        for callback in callbacks:
+            callback()
+
+    def wait(self, operation_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until the operation's webhook arrives; None on timeout"""
+        event = threading.Event()
+        with self._lock:
+            if operation_id in self._payloads:
+                return self._payloads.pop(operation_id)
+            self._waiters.setdefault(operation_id, []).append(event.set)
+
+        event.wait(timeout)
+        with self._lock:
+            self._remove_waiter(operation_id, event.set)
+            return self._payloads.pop(operation_id, None)
+
+    async def wait_async(self, operation_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Like wait, without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(woken.set)
+
+        with self._lock:
+            if operation_id in self._payloads:
+                return self._payloads.pop(operation_id)
+            self._waiters.setdefault(operation_id, []).append(wake)
+        try:
+            await asyncio.wait_for(woken.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            self._remove_waiter(operation_id, wake)
+            return self._payloads.pop(operation_id, None)
+
+    def _remove_waiter(self, operation_id: str, callback: Callable[[], None]) -> None:
+        waiters = self._waiters.get(operation_id, [])
+        if callback in waiters:
+            waiters.remove(callback)
+        if not waiters:
+            self._waiters.pop(operation_id, None)
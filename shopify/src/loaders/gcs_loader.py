@@ -1,11 +1,17 @@
 # src/loaders/gcs_loader.py
 
 import os
+import logging
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from google.auth.credentials import AnonymousCredentials
 from google.cloud import storage
 from google.oauth2 import service_account
+from processors.compression import content_encoding
 
 class GCSLoader:
     def __init__(self):
+        self.logger = logging.getLogger(__name__)
         # get gcs bucket name from environment variables
         self.bucket_name = os.getenv('GCS_BUCKET_NAME')
         # get path to gcp service account credentials
@@ -15,20 +21,134 @@ class GCSLoader:
             raise ValueError("GCS_BUCKET_NAME is not set in the environment variables")
 
         # initialize gcs client with credentials if provided
-        if credentials_path and os.path.exists(credentials_path):
+        if os.getenv('STORAGE_EMULATOR_HOST'):
+            # local fake gcs server (e.g. fake-gcs-server), the client picks up the host itself
+            self.client = storage.Client(
+                project=os.getenv('GOOGLE_CLOUD_PROJECT', 'local'),
+                credentials=AnonymousCredentials()
+            )
+        elif credentials_path and os.path.exists(credentials_path):
             credentials = service_account.Credentials.from_service_account_file(credentials_path)
             self.client = storage.Client(credentials=credentials)
         else:
             # assumes default credentials are set up (e.g., through gcloud auth application-default login)
             self.client = storage.Client()
 
+        self.bucket = self.client.bucket(self.bucket_name)
+
+        # resumable uploads send the file in chunks of this size (must be a multiple of 256 KiB)
+        self.CHUNK_SIZE = int(os.getenv('GCS_CHUNK_SIZE', 8 * 1024 * 1024))
+        # files above this size are uploaded as parallel parts and composed server-side
+        self.COMPOSITE_THRESHOLD = int(os.getenv('GCS_COMPOSITE_THRESHOLD', 512 * 1024 * 1024))
+        self.COMPOSITE_PARTS = min(int(os.getenv('GCS_COMPOSITE_PARTS', 8)), 32)  # gcs composes at most 32
+
+        # bounded pools: one for whole files, one for the parts of composite uploads
+        self._upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv('GCS_UPLOAD_WORKERS', 4)))
+        self._part_pool = ThreadPoolExecutor(max_workers=self.COMPOSITE_PARTS)
+
     def upload_file(self, source_file_name, destination_blob_name):
         """uploads a file to the specified google cloud storage bucket"""
         try:
-            bucket = self.client.bucket(self.bucket_name)
-            blob = bucket.blob(destination_blob_name)
-            blob.upload_from_filename(source_file_name)
-            print(f"file {source_file_name} uploaded to {self.bucket_name}/{destination_blob_name}.")
+            if os.path.getsize(source_file_name) > self.COMPOSITE_THRESHOLD:
+                self._upload_composite(source_file_name, destination_blob_name)
+            else:
+                blob = self.bucket.blob(destination_blob_name, chunk_size=self.CHUNK_SIZE)
+                self._set_content_encoding(blob, source_file_name)
+                blob.upload_from_filename(source_file_name)
+            self.logger.info(f"file {source_file_name} uploaded to {self.bucket_name}/{destination_blob_name}")
         except Exception as e:
-            print(f"failed to upload {source_file_name} to GCS: {e}")
-            raise
\ No newline at end of file
+            self.logger.error(f"failed to upload {source_file_name} to GCS: {e}")
+            raise
+
+    def upload_file_async(self, source_file_name, destination_blob_name) -> Future:
+        """queues an upload on the bounded upload pool"""
+        return self._upload_pool.submit(self.upload_file, source_file_name, destination_blob_name)
+
+    @contextmanager
+    def stream_upload(self, destination_blob_name):
+        """yields a writer for a resumable upload that is fed chunk by chunk while data arrives"""
+        blob = self.bucket.blob(destination_blob_name)
+        # the caller writes the bytes compressed as the blob name says
+        self._set_content_encoding(blob, destination_blob_name)
+        writer = blob.open('wb', chunk_size=self.CHUNK_SIZE)
+        try:
+            yield writer
+        except Exception:
+            # the writer finalizes whatever it has on close, so drop the incomplete object
+            writer.close()
+            blob.delete()
+            raise
+        writer.close()
+        self.logger.info(f"stream uploaded to {self.bucket_name}/{destination_blob_name}")
+
+    def close(self):
+        """waits for queued uploads and releases the pools"""
+        self._upload_pool.shutdown(wait=True)
+        self._part_pool.shutdown(wait=True)
+
+    def _upload_composite(self, source_file_name, destination_blob_name):
+        """uploads byte ranges of a large file in parallel and composes them into one object"""
+        file_size = os.path.getsize(source_file_name)
+        part_size = -(-file_size // self.COMPOSITE_PARTS)
+        parts = [
+            (f"{destination_blob_name}.part-{index:02d}", offset, min(part_size, file_size - offset))
+            for index, offset in enumerate(range(0, file_size, part_size))
+        ]
+
+        futures = [
+            self._part_pool.submit(self._upload_part, source_file_name, name, offset, size)
+            for name, offset, size in parts
+        ]
+        wait(futures)
+
+        part_blobs = [future.result() for future in futures if not future.exception()]
+        try:
+            if len(part_blobs) != len(parts):
+                raise next(future.exception() for future in futures if future.exception())
+            # parts are plain byte ranges; only the composed object is a complete compressed file
+            destination = self.bucket.blob(destination_blob_name)
+            self._set_content_encoding(destination, source_file_name)
+            destination.compose(part_blobs)
+        finally:
+            for part_blob in part_blobs:
+                part_blob.delete()
+
+    def _upload_part(self, source_file_name, part_blob_name, offset, size):
+        blob = self.bucket.blob(part_blob_name, chunk_size=self.CHUNK_SIZE)
+        with open(source_file_name, 'rb') as f:
+            # resumable uploads insist on a stream at position 0, so each part gets a view of its own range
+            blob.upload_from_file(_FileSlice(f, offset, size), size=size)
+        return blob
+
+    @staticmethod
+    def _set_content_encoding(blob, file_name):
+        """marks .gz and .zst files with their content-encoding"""
+        encoding = content_encoding(file_name)
+        if encoding:
+            blob.content_encoding = encoding
+
+class _FileSlice:
+    """read-only view of size bytes of a file from offset, positioned as if it were a file of its own"""
+
+    def __init__(self, fileobj, offset, size):
+        self._file = fileobj
+        self._offset = offset
+        self._size = size
+        self._position = 0
+
+    def read(self, size=-1):
+        remaining = self._size - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        self._file.seek(self._offset + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self._size}[whence]
+        self._position = min(max(base + offset, 0), self._size)
+        return self._position
+
+    def tell(self):
+        return self._position
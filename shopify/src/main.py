@@ -2,41 +2,229 @@
 
 import logging
 import os
-import json
-from datetime import datetime
-from typing import Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from client.shopify_client import ShopifyClient
 from extractors.bulk_operations import BulkOperationsExtractor
 from extractors.shop_operations import ShopOperationsExtractor
+from extractors.webhooks import BulkCompletionReceiver
+from extractors.sharding import plan_shards, shard_history
+from processors import json_codec
+from processors.compression import extension
 from processors.data_processor import DataProcessor
-from queries.bulk_queries import *
+from processors.sync_state import create_state_tracker
+from processors.compaction import SnapshotCompactor
+from processors.run_manifest import RunManifest
+from processors.run_metrics import RunMetrics, sinks_from_env
+from loaders.gcs_loader import GCSLoader
+from queries.entities import ENTITIES, entity_queries, shardable
+from shop_config import shop_name
 
 class SyncManager:
-    def __init__(self):
+    def __init__(self, store_url: Optional[str] = None, access_token: Optional[str] = None,
+                 data_dir: str = 'data', executor: Optional[Executor] = None,
+                 loader: Optional[GCSLoader] = None, shop: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
-        self.extractor = BulkOperationsExtractor()
+        self.data_dir = data_dir
+        self.extractor, self.shop_extractor = self._create_extractors(store_url, access_token)
+        # Handle of the shop, the top-level prefix of everything it uploads to the bucket
+        self.shop = shop or shop_name(self.extractor.client.store_url)
         self.processor = DataProcessor()
-        self.shop_extractor = ShopOperationsExtractor()
-        
-        self.entities = {
-            'orders': GET_ORDERS_QUERY,
-            'products': GET_PRODUCTS_QUERY,
-            'customers': GET_CUSTOMERS_QUERY,
-            'collections': GET_COLLECTIONS_QUERY,
-            'product_metafields': GET_PRODUCT_METAFIELDS_QUERY
-        }
+        # Watermarks, run history, checkpoints and stats all live under one state directory
+        self.state_dir = os.path.join(data_dir, 'state')
+        self.state = create_state_tracker(self.state_dir)
+        # Checkpoints of the current run, so an interrupted sync resumes where it stopped
+        self.manifest = RunManifest(self.state)
+        # Per-stage timings of the current run, kept in the state's run history and
+        # exported to the sinks listed in METRICS_SINKS
+        self.metrics = RunMetrics()
+        self.metrics_sinks = sinks_from_env(self.state_dir, self.shop)
+        self.compactor = SnapshotCompactor(snapshot_dir=os.path.join(data_dir, 'snapshots'))
+        self.loader = loader or (GCSLoader() if os.getenv('GCS_BUCKET_NAME') else None)
+        # Tee the raw download straight into the bucket instead of uploading it afterwards
+        self.stream_raw_uploads = os.getenv('GCS_STREAM_RAW', 'false').lower() == 'true'
+
+        # Entities to sync and their bulk queries, from the registry in queries/entities.py
+        self.entities = entity_queries()
+
+        # Workers that download and process finished bulk operations; a shared
+        # executor can be passed in when several shops sync in one process
+        self.max_workers = int(os.getenv('SYNC_WORKERS', 3))
+        self.executor = executor
+
+        # Incremental runs re-read this much before the last watermark to cover clock skew
+        self.incremental_overlap = timedelta(minutes=int(os.getenv('INCREMENTAL_OVERLAP_MINUTES', 15)))
+        self.full_resync = os.getenv('FULL_RESYNC', 'false').lower() == 'true'
 
-    def sync_entity(self, entity: str, query: str) -> Dict[str, Any]:
+        # Public URL that routes to the local webhook receiver; polling is used when unset
+        self.webhook_url = os.getenv('BULK_WEBHOOK_URL')
+
+        # Full exports of these entities are split into created_at shards of about
+        # SHARD_TARGET_OBJECTS objects, sized from the previous run
+        self.sharded_entities = self._sharded_entities_from_env()
+        self.shard_target_objects = int(os.getenv('SHARD_TARGET_OBJECTS', 1000000))
+        self.shard_default_count = int(os.getenv('SHARD_DEFAULT_COUNT', 8))
+
+    @staticmethod
+    def _sharded_entities_from_env() -> set:
+        """Entities named in BULK_SHARDED_ENTITIES, refusing those whose connection can't be sorted by creation"""
+        entities = {e.strip() for e in os.getenv('BULK_SHARDED_ENTITIES', '').split(',') if e.strip()}
+        unsupported = sorted(entity for entity in entities if not shardable(entity))
+        if unsupported:
+            raise ValueError(f"BULK_SHARDED_ENTITIES: {', '.join(unsupported)} can't be sharded by created_at")
+        return entities
+
+    @staticmethod
+    def _create_extractors(store_url: Optional[str], access_token: Optional[str]):
+        client = ShopifyClient(store_url, access_token)
+        return BulkOperationsExtractor(client), ShopOperationsExtractor(client)
+
+    def sync_entity(self, entity: str, query: str, full_resync: bool = False) -> Dict[str, Any]:
         """Sync a single entity"""
+        incremental_date = self._incremental_date(entity, full_resync)
+        try:
+            status = self._run_operation(entity, query, incremental_date)
+        except Exception as e:
+            self.logger.error(f"Sync failed for {entity}", exc_info=True)
+            return self._record_result(self._failed_result(entity, str(e)), incremental_date)
+        return self._finish_entity(entity, status, incremental_date)
+
+    def _incremental_date(self, entity: str, full_resync: bool) -> Optional[datetime]:
+        """Date to export changes from, or None for a full export; a resumed run keeps its original date"""
+        checkpoint = self.manifest.entity(entity)
+        if 'incremental_date' in checkpoint:
+            return datetime.fromisoformat(checkpoint['incremental_date']) if checkpoint['incremental_date'] else None
+
+        incremental_date = None
+        watermark = self.state.get_watermark(entity)
+        if not (full_resync or self.full_resync) and watermark is not None:
+            incremental_date = watermark - self.incremental_overlap
+        self.manifest.update(entity, incremental_date=incremental_date.isoformat() if incremental_date else None)
+        return incremental_date
+
+    def _expected_count(self, entity: str, incremental_date: Optional[datetime]) -> Optional[int]:
+        """Object count of the previous run in the same mode, used to predict when an operation finishes"""
+        previous = self.state.get_entity_stats(entity)
+        if not previous.get('success') or previous.get('mode') != ('incremental' if incremental_date else 'full'):
+            return None
+        return previous.get('records_count') or None
+
+    def _record_result(self, result: Dict[str, Any], incremental_date: Optional[datetime],
+                       watermark: Optional[str] = None) -> Dict[str, Any]:
+        """Persist an entity result to the sync state"""
+        if result['status'] != 'success':
+            self.manifest.reset(result['entity'])
+        self.state.update_sync_state(result['entity'], {
+            **result['stats'],
+            'success': result['status'] == 'success',
+            'mode': 'incremental' if incremental_date else 'full',
+            'watermark': watermark
+        })
+        return result
+
+    @staticmethod
+    def _watermark(status: Dict[str, Any]) -> Optional[str]:
+        """Start time of a complete bulk operation; later changes are left for the next run"""
+        if status['status'] != 'COMPLETED' or not status.get('createdAt'):
+            return None
+        created_at = datetime.fromisoformat(status['createdAt'].replace('Z', '+00:00'))
+        return created_at.replace(tzinfo=None).isoformat()
+
+    def _finish_entity(self, entity: str, status: Dict[str, Any],
+                       incremental_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """Download, process and upload the result of a finished bulk operation"""
+        raw_file_path, processed_file_path = self._entity_paths(entity)
+        checkpoint = self.manifest.entity(entity)
+        uploads = []
+
+        try:
+            if checkpoint.get('result') and os.path.exists(raw_file_path):
+                self.logger.info(f"Using {raw_file_path} downloaded before the interruption")
+                result = checkpoint['result']
+            else:
+                with self.metrics.stage(entity, 'download') as stage:
+                    if self.loader and self.stream_raw_uploads and not checkpoint.get('download_offset'):
+                        # A streamed upload can't pick up mid-file, so resumed downloads are uploaded afterwards
+                        with self.loader.stream_upload(self._blob_name(raw_file_path)) as sink:
+                            result = self.extractor.download_result(status, raw_file_path, sink)
+                        self.manifest.update(entity, stage='downloaded', result=result, raw_uploaded=True)
+                    else:
+                        result = self.extractor.download_result(
+                            status, raw_file_path, resume_offset=checkpoint.get('download_offset', 0),
+                            on_progress=lambda offset: self.manifest.update(entity, download_offset=offset)
+                        )
+                        self.manifest.update(entity, stage='downloaded', result=result)
+                    stage['bytes'] = self._downloaded_bytes(result, checkpoint)
+
+            if self.loader and not self.manifest.entity(entity).get('raw_uploaded'):
+                # Raw upload overlaps with processing
+                uploads.append(self._upload(entity, raw_file_path, 'raw_uploaded'))
+
+            return self._complete_entity(entity, status, result, raw_file_path, processed_file_path,
+                                         incremental_date, uploads)
+        except Exception as e:
+            self.logger.error(f"Sync failed for {entity}", exc_info=True)
+            return self._record_result(self._failed_result(entity, str(e), status.get('id')), incremental_date)
+
+    @staticmethod
+    def _downloaded_bytes(result: Dict[str, Any], checkpoint: Dict[str, Any]) -> int:
+        """Bytes fetched by this download, leaving out what an interrupted run already had"""
+        return max(int(result.get('file_size') or 0) - checkpoint.get('download_offset', 0), 0)
+
+    def _entity_paths(self, entity: str):
+        """Raw and processed file paths for this run of an entity, the same ones when the run is resumed"""
+        checkpoint = self.manifest.entity(entity)
+        if checkpoint.get('raw_file_path'):
+            return checkpoint['raw_file_path'], checkpoint['processed_file_path']
+
         timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        raw_file_path = f"data/raw/{entity}/{timestamp}.jsonl"
-        processed_file_path = f"data/processed/{entity}/{timestamp}.json"
+        raw_file_path = os.path.join(
+            self.data_dir, 'raw', entity, f"{timestamp}.jsonl{extension(self.processor.compression)}"
+        )
+        processed_file_path = os.path.join(
+            self.data_dir, 'processed', entity, f"{timestamp}{self.processor.file_extension}"
+        )
+        self.manifest.update(entity, raw_file_path=raw_file_path, processed_file_path=processed_file_path)
+        return raw_file_path, processed_file_path
 
+    def _upload(self, entity: str, file_path: str, flag: str):
+        """Upload a file in the background, marking flag in the run manifest once it is in the bucket"""
+        upload = self.loader.upload_file_async(file_path, self._blob_name(file_path))
+        upload.add_done_callback(
+            lambda future: None if future.cancelled() or future.exception() else self.manifest.update(entity, **{flag: True})
+        )
+        return upload
+
+    def _complete_entity(self, entity: str, status: Dict[str, Any], result: Dict[str, Any],
+                         raw_file_path: str, processed_file_path: str,
+                         incremental_date: Optional[datetime], uploads: list) -> Dict[str, Any]:
+        """Process, compact and upload a downloaded bulk result and record the outcome"""
+        checkpoint = self.manifest.entity(entity)
         try:
-            result = self.extractor.extract(query, raw_file_path)
             if result['success']:
-                self.processor.process_jsonl_file(raw_file_path, processed_file_path, entity)
-                return {
+                output_paths = self.processor.output_paths(processed_file_path, entity)
+                if checkpoint.get('processed') and all(os.path.exists(path) for path in output_paths.values()):
+                    self.logger.info(f"Using {processed_file_path} processed before the interruption")
+                else:
+                    with self.metrics.stage(entity, 'process') as stage:
+                        stage['records'] = self.processor.process_jsonl_file(raw_file_path, processed_file_path, entity)
+                    # Snapshots are kept of nested records, which carry their children along
+                    if self.processor.output_format == 'jsonl' and not self.processor.writes_tables(entity):
+                        # A partial export can't stand in for the whole entity, so it is folded in like a delta
+                        full = incremental_date is None and not result.get('partial')
+                        with self.metrics.stage(entity, 'compact'):
+                            self.compactor.apply(entity, processed_file_path, full=full)
+                    self.manifest.update(entity, stage='processed', processed=True)
+                for table, path in output_paths.items():
+                    flag = 'processed_uploaded' if path == processed_file_path else f"processed_uploaded_{table}"
+                    if self.loader and not checkpoint.get(flag):
+                        uploads.append(self._upload(entity, path, flag))
+                # Uploads overlap with processing; this is the time spent waiting for them afterwards
+                with self.metrics.stage(entity, 'upload_wait'):
+                    for upload in uploads:
+                        upload.result()
+                outcome = self._record_result({
                     'entity': entity,
                     'status': 'success',
                     'stats': {
@@ -45,75 +233,211 @@ class SyncManager:
                         'records_count': result.get('records_count', 0),
                         'file_size': result.get('file_size', 0),
                         'error': None,
-                        'operation_id': result.get('operation_id')
+                        'operation_id': result.get('operation_id'),
+                        'monitor': result.get('monitor'),
+                        'shards': shard_history(status['shards']) if status.get('shards') else None
                     }
-                }
-            return {
-                'entity': entity,
-                'status': 'failed',
-                'stats': {
-                    'last_attempt': datetime.utcnow().isoformat(),
-                    'last_success': None,
-                    'error': 'Extraction failed without error',
-                    'operation_id': result.get('operation_id')
-                }
-            }
+                }, incremental_date, self._watermark(status))
+                self.manifest.update(entity, stage='done')
+                return outcome
+            return self._record_result(
+                self._failed_result(entity, 'Extraction failed without error', result.get('operation_id')),
+                incremental_date
+            )
         except Exception as e:
             self.logger.error(f"Sync failed for {entity}", exc_info=True)
-            return {
-                'entity': entity,
-                'status': 'failed',
-                'stats': {
-                    'last_attempt': datetime.utcnow().isoformat(),
-                    'last_success': None,
-                    'error': str(e),
-                    'operation_id': None
-                }
-            }
+            return self._record_result(self._failed_result(entity, str(e), status.get('id')), incremental_date)
 
-    def sync_all(self) -> Dict[str, Any]:
-        """Synchronize all entities"""
-        sync_stats = {}
-        
-        # Sequential processing for bulk operations
-        for entity, query in self.entities.items():
-            self.logger.info(f"Starting sync for {entity}")
-            result = self.sync_entity(entity, query)
-            sync_stats[entity] = result['stats']
-            
-        # Process shop info
-        self.logger.info("Starting sync for shop_info")
-        try:
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            result = self.shop_extractor.extract(output_dir='data')
-            sync_stats['shop_info'] = {
-                'last_attempt': datetime.utcnow().isoformat(),
-                'last_success': datetime.utcnow().isoformat(),
-                'records_count': 1,
-                'file_size': result.get('file_size', 0),
-                'error': None,
-                'operation_id': None
-            }
-        except Exception as e:
-            sync_stats['shop_info'] = {
+    def _blob_name(self, file_path: str) -> str:
+        """Bucket layout mirrors the shop's data directory, under the shop's handle"""
+        relative = os.path.relpath(file_path, self.data_dir).replace(os.sep, '/')
+        return f"{self.shop}/{relative}"
+
+    @staticmethod
+    def _failed_result(entity: str, error: str, operation_id: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'entity': entity,
+            'status': 'failed',
+            'stats': {
                 'last_attempt': datetime.utcnow().isoformat(),
                 'last_success': None,
-                'error': str(e),
-                'operation_id': None
+                'error': error,
+                'operation_id': operation_id
             }
+        }
+
+    def sync_all(self, full_resync: bool = False) -> Dict[str, Any]:
+        """Synchronize all entities, incrementally where a watermark exists"""
+        results = {}
+        if self.webhook_url:
+            self.extractor.enable_webhook(BulkCompletionReceiver.shared(), self.webhook_url)
+
+        # Bulk operations run on their own threads, as many at once as the API
+        # version allows (one on older versions, so they start back to back);
+        # download and processing of finished ones happen on the worker pool
+        if self.manifest.begin(full_resync or self.full_resync):
+            self.logger.info("Resuming the interrupted sync run")
+        self.metrics.begin(api_cost=self.extractor.client.cost_consumed)
+        pool = self.executor or ThreadPoolExecutor(max_workers=self.max_workers)
+        launcher = ThreadPoolExecutor(max_workers=self.extractor.MAX_CONCURRENT_OPERATIONS)
+        try:
+            futures = {pool.submit(self._sync_shop_info): 'shop_info'}
+
+            operations = {}
+            for entity, query in self.entities.items():
+                if self.manifest.entity(entity).get('stage') == 'done':
+                    self.logger.info(f"{entity} was synced before the interruption")
+                    results[entity] = self.state.get_entity_stats(entity)
+                    continue
+                incremental_date = self._incremental_date(entity, full_resync)
+                operations[launcher.submit(self._run_operation, entity, query, incremental_date)] = (
+                    entity, incremental_date
+                )
+
+            for operation in as_completed(operations):
+                entity, incremental_date = operations[operation]
+                try:
+                    status = operation.result()
+                except Exception as e:
+                    self.logger.error(f"Sync failed for {entity}", exc_info=True)
+                    results[entity] = self._record_result(self._failed_result(entity, str(e)), incremental_date)['stats']
+                    continue
+                futures[pool.submit(self._finish_entity, entity, status, incremental_date)] = entity
+
+            for future in as_completed(futures):
+                entity = futures[future]
+                result = future.result()
+                results[entity] = result if entity == 'shop_info' else result['stats']
+        finally:
+            launcher.shutdown(wait=True)
+            if pool is not self.executor:
+                pool.shutdown(wait=True)
+
+        return self._finish_sync(results)
+
+    def _run_operation(self, entity: str, query: str, incremental_date: Optional[datetime]) -> Dict[str, Any]:
+        """Run the bulk operation, or sharded operations, for an entity until Shopify has finished it"""
+        checkpoint = self.manifest.entity(entity)
+        if checkpoint.get('status'):
+            self.logger.info(f"Using bulk operation {checkpoint['status']['id']} finished before the interruption")
+            return checkpoint['status']
+
+        status = None
+        expected_count = self._expected_count(entity, incremental_date)
+        if checkpoint.get('operation_id'):
+            try:
+                status = self.extractor.resume_operation(checkpoint['operation_id'], expected_count)
+            except Exception as e:
+                self.logger.warning(f"Cannot resume bulk operation for {entity}, starting a new one: {str(e)}")
+
+        if status is None:
+            if incremental_date:
+                self.logger.info(f"Starting incremental sync for {entity} from {incremental_date.isoformat()}")
+            else:
+                self.logger.info(f"Starting full sync for {entity}")
+            with self.metrics.stage(entity, 'bulk_operation'):
+                shards = None
+                if self._is_sharded(entity, incremental_date):
+                    oldest = self.extractor.oldest_created_at(query, ENTITIES[entity]['shard_sort_key'])
+                    shards = self._plan_shards(entity, oldest)
+                if shards:
+                    status = self.extractor.run_shards(query, shards)
+                else:
+                    status = self.extractor.run_operation(query, incremental_date, expected_count,
+                                                          on_start=self._operation_started(entity))
+        self._record_operation_metrics(entity, status)
+        self.manifest.update(entity, stage='completed', status=status)
+        return status
+
+    def _record_operation_metrics(self, entity: str, status: Dict[str, Any]) -> None:
+        """Shopify-side time and size of a finished bulk operation, as observed by the poller"""
+        monitor = status.get('monitor') or {}
+        self.metrics.record(
+            entity, 'bulk_operation',
+            queue_seconds=monitor.get('queue_seconds'), run_seconds=monitor.get('run_seconds'),
+            polls=monitor.get('polls'), objects=int(status.get('objectCount') or 0)
+        )
+
+    def _operation_started(self, entity: str):
+        """Record a started operation so a restart waits for it instead of starting another"""
+        return lambda operation_id: self.manifest.update(entity, stage='running', operation_id=operation_id)
+
+    def _is_sharded(self, entity: str, incremental_date: Optional[datetime]) -> bool:
+        """Only full exports are sharded; incremental ones are small by nature"""
+        return entity in self.sharded_entities and incremental_date is None
+
+    def _plan_shards(self, entity: str, oldest: Optional[datetime]) -> Optional[list]:
+        """created_at ranges for a sharded export, or None when there is nothing to split"""
+        if oldest is None:
+            return None
+        previous = self.state.get_entity_stats(entity)
+        shards = plan_shards(
+            oldest, datetime.utcnow(), previous.get('shards'),
+            total_count=previous.get('records_count') if previous.get('success') else None,
+            target_objects=self.shard_target_objects, default_count=self.shard_default_count
+        )
+        self.logger.info(f"Split {entity} export into {len(shards)} created_at shards")
+        return shards
+
+    def _finish_sync(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Order, save and log the per-entity stats of a run"""
+        sync_stats = {entity: results[entity] for entity in [*self.entities, 'shop_info']}
+        self.manifest.finish()
 
         # Save sync results
         self._save_sync_stats(sync_stats)
+        self._record_metrics(self.metrics.finish(sync_stats, api_cost=self.extractor.client.cost_consumed))
         self._log_summary(sync_stats)
         
         return sync_stats
 
+    def _sync_shop_info(self) -> Dict[str, Any]:
+        """Sync shop info"""
+        self.logger.info("Starting sync for shop_info")
+        try:
+            result = self.shop_extractor.extract(output_dir=self.data_dir)
+            return self._shop_info_stats(result)
+        except Exception as e:
+            return self._shop_info_stats(error=str(e))
+
+    @staticmethod
+    def _shop_info_stats(result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> Dict[str, Any]:
+        if error is None and not result.get('success', True):
+            error = result.get('error') or 'Shop info extraction failed'
+        if error is not None:
+            return {
+                'last_attempt': datetime.utcnow().isoformat(),
+                'last_success': None,
+                'error': error,
+                'operation_id': None
+            }
+        return {
+            'last_attempt': datetime.utcnow().isoformat(),
+            'last_success': datetime.utcnow().isoformat(),
+            'records_count': 1,
+            'file_size': result.get('file_size', 0),
+            'error': None,
+            'operation_id': None
+        }
+
     def _save_sync_stats(self, stats: Dict[str, Any]) -> None:
         """Save sync stats to file"""
-        stats_file = 'data/state/sync_stats.json'
+        stats_file = os.path.join(self.state_dir, 'sync_stats.json')
         os.makedirs(os.path.dirname(stats_file), exist_ok=True)
-        with open(stats_file, 'w') as f:
-            json.dump(stats, f, indent=2)
+        with open(stats_file, 'wb') as f:
+            f.write(json_codec.dumps_pretty(stats))
+
+    def _record_metrics(self, run: Dict[str, Any]) -> None:
+        """Keep the run's metrics in the run history and hand them to every sink; neither fails the sync"""
+        try:
+            self.state.record_run({'shop': self.extractor.client.store_url, **run})
+        except Exception as e:
+            self.logger.warning(f"Could not record the run history: {str(e)}")
+        for sink in self.metrics_sinks:
+            try:
+                sink.emit(run, self.extractor.client.store_url)
+            except Exception as e:
+                self.logger.warning(f"Could not export sync metrics to {type(sink).__name__}: {str(e)}")
 
     def _log_summary(self, stats: Dict[str, Any]) -> None:
         """Log sync summary"""
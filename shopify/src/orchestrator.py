@@ -0,0 +1,171 @@
+# src/orchestrator.py
+
+import os
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from loaders.gcs_loader import GCSLoader
+from main import SyncManager
+from processors import json_codec
+from processors.sync_state import DEFAULT_STATE_DIR
+from shop_config import load_shop_configs
+
+class FairWorkPool:
+    """
+    Bounded worker pool shared by many shops.
+
+    Tasks are queued per shop and workers take them round-robin across shops,
+    so a shop with a huge backlog can't starve the others. max_per_shop caps how
+    many workers a single shop may occupy at once.
+    """
+
+    def __init__(self, max_workers: int, max_per_shop: Optional[int] = None):
+        self.max_per_shop = max_per_shop or max_workers
+        self._queues: 'OrderedDict[str, deque]' = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"fair-pool-{index}", daemon=True)
+            for index in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, shop: str, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn for a shop and return a future for its result"""
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot submit to a pool that has been shut down")
+            self._queues.setdefault(shop, deque()).append((future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def for_shop(self, shop: str) -> Executor:
+        """Executor view whose submissions are queued under shop"""
+        return _ShopExecutor(self, shop)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_task(self):
+        """Next task of the least recently served shop that is under its cap"""
+        for shop, queue in self._queues.items():
+            if queue and self._running.get(shop, 0) < self.max_per_shop:
+                self._queues.move_to_end(shop)
+                self._running[shop] = self._running.get(shop, 0) + 1
+                return (shop, *queue.popleft())
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    if self._shutdown and not any(self._queues.values()):
+                        return
+                    self._condition.wait()
+                    task = self._next_task()
+
+            shop, future, fn, args, kwargs = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                self._running[shop] -= 1
+                # A slot for this shop opened up, a waiting worker may now take its next task
+                self._condition.notify_all()
+
+class _ShopExecutor(Executor):
+    def __init__(self, pool: FairWorkPool, shop: str):
+        self._pool = pool
+        self._shop = shop
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self._pool.submit(self._shop, fn, *args, **kwargs)
+
+class MultiShopOrchestrator:
+    """
+    Syncs many shops in one process.
+
+    Every shop has its own bulk operation slot at Shopify, so each shop gets a
+    driver thread that runs its bulk operations back to back. Downloads and
+    processing from all shops share one bounded FairWorkPool. A failing shop
+    is recorded and never affects the others.
+    """
+
+    def __init__(self, shops: Optional[List[Dict[str, str]]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.shops = shops if shops is not None else load_shop_configs()
+        self.pool = FairWorkPool(
+            max_workers=int(os.getenv('SYNC_WORKERS', 3)),
+            max_per_shop=int(os.getenv('SYNC_WORKERS_PER_SHOP', 0)) or None
+        )
+        self.max_concurrent_shops = int(os.getenv('MAX_CONCURRENT_SHOPS', 0)) or len(self.shops)
+        self.loader = GCSLoader() if os.getenv('GCS_BUCKET_NAME') else None
+
+    def sync_all(self, full_resync: bool = False) -> Dict[str, Any]:
+        """Sync every shop, returning per-shop stats"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(self.max_concurrent_shops, 1)) as drivers:
+            futures = {drivers.submit(self._sync_shop, shop, full_resync): shop['name'] for shop in self.shops}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    self.logger.error(f"Sync failed for shop {name}", exc_info=True)
+                    results[name] = {'error': str(e), 'last_attempt': datetime.utcnow().isoformat()}
+
+        self._save_summary(results)
+        return results
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+
+    def _sync_shop(self, shop: Dict[str, str], full_resync: bool) -> Dict[str, Any]:
+        self.logger.info(f"Starting sync for shop {shop['name']}")
+        manager = SyncManager(
+            shop['store_url'], shop['access_token'],
+            data_dir=os.path.join('data', shop['name']),
+            executor=self.pool.for_shop(shop['name']),
+            loader=self.loader,
+            shop=shop['name']
+        )
+        return manager.sync_all(full_resync)
+
+    @staticmethod
+    def _save_summary(results: Dict[str, Any]) -> None:
+        """Save per-shop stats of the run"""
+        summary_file = os.path.join(DEFAULT_STATE_DIR, 'multi_shop_stats.json')
+        os.makedirs(os.path.dirname(summary_file), exist_ok=True)
+        with open(summary_file, 'wb') as f:
+            f.write(json_codec.dumps_pretty(results))
+
+def main():
+    """Multi-shop entry point"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    orchestrator = MultiShopOrchestrator()
+    try:
+        orchestrator.sync_all(os.getenv('FULL_RESYNC', 'false').lower() == 'true')
+    finally:
+        orchestrator.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# src/processors/compaction.py
+
+import os
+import shutil
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from processors import json_codec
+from processors.compression import EXTENSIONS, codec_from_env, extension, open_reader, open_writer, path_codec, strip_extension
+
+class SnapshotCompactor:
+    """
+    Keeps a current-state snapshot per entity keyed by Shopify GID.
+
+    Every processed file is registered as a delta segment next to the snapshot.
+    Deltas are folded into the snapshot as upserts (newest updatedAt wins) once
+    enough of them have piled up, so readers only ever scan the snapshot plus a
+    handful of recent segments. Deltas keep the compression of the processed
+    file they link to; the snapshot is written with COMPRESSION.
+    """
+
+    def __init__(self, snapshot_dir: str = 'data/snapshots'):
+        self.snapshot_dir = snapshot_dir
+        self.logger = logging.getLogger(__name__)
+        self.DELTA_THRESHOLD = int(os.getenv('COMPACTION_DELTA_THRESHOLD', 24))
+        self.compression = codec_from_env()
+
+    def apply(self, entity: str, processed_file_path: str, full: bool = False) -> None:
+        """Register a processed file as the new snapshot (full export) or as a delta"""
+        if full:
+            self._replace_snapshot(entity, processed_file_path)
+            return
+
+        deltas_dir = self._deltas_dir(entity)
+        os.makedirs(deltas_dir, exist_ok=True)
+        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
+        delta_name = f"{timestamp}.jsonl{extension(path_codec(processed_file_path))}"
+        self._link_or_copy(processed_file_path, os.path.join(deltas_dir, delta_name))
+
+        if len(self._delta_files(entity)) >= self.DELTA_THRESHOLD:
+            self.compact(entity)
+
+    def compact(self, entity: str) -> int:
+        """Fold all pending deltas into the snapshot, returning the snapshot record count"""
+        delta_files = self._delta_files(entity)
+        if not delta_files:
+            return 0
+
+        snapshot_path = self._snapshot_path(entity)
+        temp_path = f"{snapshot_path}.tmp"
+        count = 0
+        with open_writer(temp_path, self.compression) as out:
+            for line in self._iter_merged_lines(entity, delta_files):
+                out.write(line)
+                count += 1
+        os.replace(temp_path, snapshot_path)
+        self._remove_stale_snapshots(entity)
+
+        for delta_file in delta_files:
+            os.remove(delta_file)
+
+        self.logger.info(f"Compacted {len(delta_files)} deltas into {entity} snapshot ({count} records)")
+        return count
+
+    def iter_snapshot(self, entity: str) -> Iterator[Dict[str, Any]]:
+        """Yield the current state of every record, including pending deltas"""
+        for line in self._iter_merged_lines(entity, self._delta_files(entity)):
+            yield json_codec.loads(line)
+
+    def _iter_merged_lines(self, entity: str, delta_files: List[str]) -> Iterator[bytes]:
+        """Stream the snapshot with deltas upserted; only the deltas are held in memory"""
+        pending = {}
+        for delta_file in delta_files:
+            with open_reader(delta_file) as f:
+                for line in f:
+                    record = json_codec.loads(line)
+                    current = pending.get(record['id'])
+                    if current is None or not self._is_older(record, current):
+                        pending[record['id']] = record
+
+        snapshot_path = self._current_snapshot(entity)
+        if snapshot_path is not None:
+            with open_reader(snapshot_path) as f:
+                for line in f:
+                    record = json_codec.loads(line)
+                    delta = pending.pop(record['id'], None)
+                    if delta is None or self._is_older(delta, record):
+                        yield line
+                    else:
+                        yield json_codec.dumps(delta) + b'\n'
+
+        # Records first seen in the deltas
+        for record in pending.values():
+            yield json_codec.dumps(record) + b'\n'
+
+    def _replace_snapshot(self, entity: str, processed_file_path: str) -> None:
+        """A full export supersedes the snapshot and every delta before it"""
+        snapshot_path = self._snapshot_path(entity)
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        temp_path = f"{snapshot_path}.tmp"
+        if path_codec(processed_file_path) == self.compression:
+            shutil.copyfile(processed_file_path, temp_path)
+        else:
+            with open_reader(processed_file_path) as source, open_writer(temp_path, self.compression) as out:
+                shutil.copyfileobj(source, out, 1024 * 1024)
+        os.replace(temp_path, snapshot_path)
+        self._remove_stale_snapshots(entity)
+
+        for delta_file in self._delta_files(entity):
+            os.remove(delta_file)
+
+        self.logger.info(f"Replaced {entity} snapshot with full export {processed_file_path}")
+
+    @staticmethod
+    def _is_older(record: Dict[str, Any], other: Dict[str, Any]) -> bool:
+        """True if record carries an earlier updatedAt than other"""
+        updated_at = record.get('updatedAt')
+        other_updated_at = other.get('updatedAt')
+        if not updated_at or not other_updated_at:
+            return False
+        return updated_at < other_updated_at
+
+    @staticmethod
+    def _link_or_copy(source: str, destination: str) -> None:
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def _snapshot_path(self, entity: str) -> str:
+        return os.path.join(self.snapshot_dir, entity, f"current.jsonl{extension(self.compression)}")
+
+    def _snapshot_variants(self, entity: str) -> List[str]:
+        """Snapshot paths under every compression, the configured one first"""
+        base = strip_extension(self._snapshot_path(entity))
+        variants = [base] + [f"{base}{suffix}" for suffix in EXTENSIONS.values()]
+        return sorted(variants, key=lambda path: path != self._snapshot_path(entity))
+
+    def _current_snapshot(self, entity: str) -> Optional[str]:
+        """The existing snapshot, which may predate a change of COMPRESSION"""
+        return next((path for path in self._snapshot_variants(entity) if os.path.exists(path)), None)
+
+    def _remove_stale_snapshots(self, entity: str) -> None:
+        for path in self._snapshot_variants(entity)[1:]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _deltas_dir(self, entity: str) -> str:
+        return os.path.join(self.snapshot_dir, entity, 'deltas')
+
+    def _delta_files(self, entity: str) -> List[str]:
+        deltas_dir = self._deltas_dir(entity)
+        if not os.path.isdir(deltas_dir):
+            return []
+        return [
+            os.path.join(deltas_dir, name) for name in sorted(os.listdir(deltas_dir))
+            if strip_extension(name).endswith('.jsonl')
+        ]
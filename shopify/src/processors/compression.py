@@ -0,0 +1,224 @@
+# src/processors/compression.py
+
+import io
+import os
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+# Compressed files are recognised by their suffix, so readers need no configuration
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+_DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+_READ_SIZE = 1024 * 1024
+# Compressed bytes decompressed at a time; small, as JSONL often expands tenfold or more
+_INPUT_SIZE = 64 * 1024
+
+def codec_from_env() -> Optional[str]:
+    """Codec new files are written with, from COMPRESSION: none (default), gzip or zstd"""
+    codec = os.getenv('COMPRESSION', 'none')
+    if codec == 'none':
+        return None
+    if codec not in EXTENSIONS:
+        raise ValueError(f"Unsupported compression: {codec}")
+    if codec == 'zstd':
+        _require_zstandard()
+    return codec
+
+def extension(codec: Optional[str]) -> str:
+    return EXTENSIONS[codec] if codec else ''
+
+def path_codec(file_path: str) -> Optional[str]:
+    """Codec a file is compressed with, going by its name"""
+    return next((codec for codec, suffix in EXTENSIONS.items() if file_path.endswith(suffix)), None)
+
+def strip_extension(file_path: str) -> str:
+    """File name without its compression suffix, e.g. 20240101.jsonl for 20240101.jsonl.zst"""
+    return file_path[:len(file_path) - len(extension(path_codec(file_path)))]
+
+def content_encoding(file_path: str) -> Optional[str]:
+    """HTTP Content-Encoding of a file, for object storage metadata"""
+    return path_codec(file_path)
+
+def open_reader(file_path: str, codec: Optional[str] = None) -> BinaryIO:
+    """Open a file for reading lines or chunks, decompressing it on the fly if its name says so"""
+    codec = codec or path_codec(file_path)
+    if codec is None:
+        return open(file_path, 'rb')
+    return io.BufferedReader(_FrameReader(open(file_path, 'rb'), codec), _READ_SIZE)
+
+def open_writer(file_path: str, codec: Optional[str], append: bool = False) -> BinaryIO:
+    """Open a file for writing, compressed with codec (None writes it as is)"""
+    mode = 'ab' if append else 'wb'
+    if codec is None:
+        return open(file_path, mode)
+    return FrameWriter(open(file_path, mode), codec)
+
+def frame_prefix_size(file_path: str, codec: str, limit: int) -> int:
+    """
+    Compressed size of the longest run of whole frames holding at most limit bytes.
+
+    A file cut there is valid and decompresses to a prefix of the data, which is
+    how an interrupted compressed download is resumed.
+    """
+    size = 0
+    for compressed, uncompressed in _frame_boundaries(file_path, codec):
+        if uncompressed > limit:
+            break
+        size = compressed
+    return size
+
+class FrameWriter:
+    """
+    Binary writer that compresses into a file object as a series of frames.
+
+    flush() ends the current frame (a gzip member or zstd frame), so everything
+    written so far can be read back even if the process dies before close().
+    A file object it doesn't own (close_file=False) is only written to, never
+    flushed or closed, as some writers (e.g. GCS blob writers) can't flush.
+    Concatenated frames form a valid file, so compressed files can be appended
+    to and joined byte by byte.
+    """
+
+    def __init__(self, fileobj: BinaryIO, codec: str, level: Optional[int] = None, close_file: bool = True):
+        self.codec = codec
+        self.level = level if level is not None else int(os.getenv('COMPRESSION_LEVEL') or _DEFAULT_LEVELS[codec])
+        self._file = fileobj
+        self._close_file = close_file
+        self._compressor = self._new_compressor()
+        self._in_frame = False
+        self._frames = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._file.write(self._compressor.compress(data))
+            self._in_frame = True
+        return len(data)
+
+    def flush(self) -> None:
+        self._end_frame()
+        if self._close_file:
+            self._file.flush()
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Only rewinding to the start is supported, to rewrite the file from scratch"""
+        if offset or whence:
+            raise io.UnsupportedOperation("FrameWriter can only seek to the start")
+        self._compressor = self._new_compressor()
+        self._in_frame = False
+        self._frames = 0
+        return self._file.seek(0)
+
+    def truncate(self, size: Optional[int] = None) -> int:
+        return self._file.truncate(size)
+
+    def close(self) -> None:
+        # A file needs at least one frame to be valid, even without data
+        if self._in_frame or not self._frames:
+            self._end_frame(force=True)
+        if self._close_file:
+            self._file.close()
+
+    def __enter__(self) -> 'FrameWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _end_frame(self, force: bool = False) -> None:
+        if not self._in_frame and not force:
+            return
+        self._file.write(self._compressor.flush())
+        self._compressor = self._new_compressor()
+        self._in_frame = False
+        self._frames += 1
+
+    def _new_compressor(self):
+        if self.codec == 'gzip':
+            return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        _require_zstandard()
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+class _FrameReader(io.RawIOBase):
+    """Raw reader decompressing a file object frame after frame"""
+
+    def __init__(self, fileobj: BinaryIO, codec: str):
+        self.codec = codec
+        self._file = fileobj
+        self._decompressor = _new_decompressor(codec)
+        self._in_frame = False
+        self._unused = b''
+        self._pending = b''
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self._position >= len(self._pending):
+            data = self._unused or self._file.read(_INPUT_SIZE)
+            self._unused = b''
+            if not data:
+                if self._in_frame:
+                    raise EOFError(f"Compressed file ended in the middle of a {self.codec} frame")
+                return 0
+            self._in_frame = True
+            if self.codec == 'gzip':
+                # zlib can also cap the output; the rest of the input waits for the next call
+                self._pending = self._decompressor.decompress(data, _READ_SIZE)
+                self._unused = self._decompressor.unconsumed_tail
+            else:
+                self._pending = self._decompressor.decompress(data)
+            self._position = 0
+            if self._decompressor.eof:
+                self._unused = self._decompressor.unused_data
+                self._decompressor = _new_decompressor(self.codec)
+                self._in_frame = False
+
+        size = min(len(buffer), len(self._pending) - self._position)
+        buffer[:size] = self._pending[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def _frame_boundaries(file_path: str, codec: str) -> Iterator[Tuple[int, int]]:
+    """(compressed, uncompressed) offsets after each whole frame; stops at a truncated or damaged one"""
+    decompressor = _new_decompressor(codec)
+    uncompressed = 0
+    with open(file_path, 'rb') as f:
+        data = b''
+        while True:
+            if not data:
+                data = f.read(_INPUT_SIZE)
+                if not data:
+                    return
+            try:
+                uncompressed += len(decompressor.decompress(data))
+            except _decode_errors():
+                return
+            if not decompressor.eof:
+                data = b''
+                continue
+            data = decompressor.unused_data
+            yield f.tell() - len(data), uncompressed
+            decompressor = _new_decompressor(codec)
+
+def _new_decompressor(codec: str):
+    if codec == 'gzip':
+        return zlib.decompressobj(31)
+    _require_zstandard()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+def _decode_errors() -> tuple:
+    return (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError("zstandard is required for zstd compression")
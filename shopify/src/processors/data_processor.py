@@ -1,164 +1,542 @@
 # src/processors/data_processor.py
 
-import json
 import logging
+import multiprocessing
 import os
+import shutil
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from processors import json_codec
+from processors.compression import codec_from_env, extension, open_reader, open_writer, path_codec
+from processors.parquet_writer import (
+    arrow_schema, table_schema, write_parquet, concat_parquet, parse_selection, connection_node, ParquetStreamWriter
+)
+from processors.raw_index import IndexBuilder, record_starts_at
+from queries.entities import ENTITIES
+
+ByteRange = Optional[Tuple[int, int]]
+
+# A level of an entity's hierarchy: (connection fields, {GID type: (field, child level)},
+# the only child connection or None)
+_Level = Tuple[Tuple[str, ...], Dict[str, tuple], Optional[tuple]]
+# A level of an entity's tables: (table, foreign key column, ((list field, table), ...),
+# {GID type: child level}, the only child level or None)
+_TableLevel = Tuple[Optional[str], Optional[str], Tuple[Tuple[str, str], ...], Dict[str, tuple], Optional[tuple]]
+_GID_PREFIX = 'gid://shopify/'
+
+def _process_chunk(output_format: str, output_layout: str, entity: str, raw_file_path: str,
+                   byte_range: Tuple[int, int], part_path: str, build_index: bool) -> Tuple[int, Optional[array]]:
+    """
+    Process worker: reconstruct one byte range of a raw file into its own part file(s).
+
+    Returns the count and, when indexing, the index entries of the range.
+    """
+    processor = DataProcessor(output_format, output_layout)
+    index = IndexBuilder() if build_index else None
+    count = processor._process_range(raw_file_path, part_path, entity, byte_range, index)
+    return count, index.entries if index is not None else None
+
+def _compile_children(children: Dict[str, Dict[str, Any]]) -> _Level:
+    """Turn a registry hierarchy into lookup tables for the reconstruction loop"""
+    by_type = {
+        child_type: (spec['field'], _compile_children(spec.get('children', {})))
+        for child_type, spec in children.items()
+    }
+    fields = tuple(field for field, _ in by_type.values())
+    only_child = next(iter(by_type.values())) if len(by_type) == 1 else None
+    return fields, by_type, only_child
+
+def _compile_tables(spec: Dict[str, Any], table: Optional[str]) -> _TableLevel:
+    """Turn a registry hierarchy into lookup tables for the normalizing loop"""
+    children = spec.get('children', {})
+    lists = tuple(spec.get('lists', {}).items())
+    if (children or lists) and not spec.get('key'):
+        raise ValueError(f"Registry level of table {table} needs a 'key' for its children")
+    by_type = {
+        child_type: _compile_tables(child, child['table'])
+        for child_type, child in children.items()
+    }
+    only_child = next(iter(by_type.values())) if len(by_type) == 1 else None
+    return table, spec.get('key'), lists, by_type, only_child
+
+def table_columns(entity: str) -> Dict[str, Tuple[Dict[str, Optional[dict]], List[str]]]:
+    """
+    Tables of an entity in the normalized layout, as {table: (field selection, foreign keys)}.
+
+    Every table in the registry is included; its fields are those the bulk
+    query selects, none if the query leaves its connection out. Connections
+    and split out lists are left out of their parent's fields.
+    """
+    spec = ENTITIES[entity]
+    (root_connection,) = parse_selection(spec['query']).values()
+    tables: Dict[str, Tuple[Dict[str, Optional[dict]], List[str]]] = {}
+
+    def add(table: Optional[str], selection: Dict[str, Optional[dict]], keys: List[str]) -> None:
+        if table is None:
+            return
+        fields, foreign_keys = tables.setdefault(table, ({}, []))
+        for name, sub_selection in selection.items():
+            fields.setdefault(name, sub_selection)
+        foreign_keys.extend(key for key in keys if key not in foreign_keys)
+
+    def walk(level: Dict[str, Any], table: Optional[str], selection: Dict[str, Optional[dict]], keys: List[str]) -> None:
+        children = level.get('children', {})
+        lists = level.get('lists', {})
+        split = {child['field'] for child in children.values()} | set(lists)
+        add(table, {name: sub for name, sub in selection.items() if name not in split}, keys)
+
+        inner_keys = keys + [level['key']] if level.get('key') else keys
+        for field, list_table in lists.items():
+            add(list_table, selection.get(field) or {}, inner_keys)
+        for child in children.values():
+            node = connection_node(selection.get(child['field']) or {})
+            walk(child, child['table'], node or {}, inner_keys)
+
+    walk(spec, spec.get('table', entity), connection_node(root_connection), [])
+    return tables
+
+def _gid_type(gid: str) -> Optional[str]:
+    """Type of a GID, e.g. LineItem for gid://shopify/LineItem/123"""
+    if not gid.startswith(_GID_PREFIX):
+        return None
+    end = gid.find('/', len(_GID_PREFIX))
+    return gid[len(_GID_PREFIX):end] if end != -1 else None
 
 class DataProcessor:
-    def __init__(self):
+    # Process pools by size, shared by every processor so concurrent syncs split
+    # PROCESS_WORKERS processes between them instead of each starting its own
+    _process_pools: Dict[int, ProcessPoolExecutor] = {}
+    _process_pools_lock = threading.Lock()
+
+    def __init__(self, output_format: Optional[str] = None, output_layout: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
+        self.output_format = output_format or os.getenv('OUTPUT_FORMAT', 'jsonl')
+        # nested: one file of records with their children embedded; normalized: one file
+        # per table (see the registry), children linked to their parents by foreign keys
+        self.output_layout = output_layout or os.getenv('OUTPUT_LAYOUT', 'nested')
+        self.PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'zstd')
+        self.PARQUET_BATCH_SIZE = int(os.getenv('PARQUET_BATCH_SIZE', 10000))  # rows per row group
+        # Raw files above PARALLEL_MIN_BYTES are split at top-level records and processed on
+        # PROCESS_WORKERS processes (0 means one per core), shared by all syncs in the process
+        self.PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', 0)) or os.cpu_count() or 1
+        self.PARALLEL_MIN_BYTES = int(os.getenv('PARALLEL_MIN_BYTES', 64 * 1024 * 1024))
+        # JSONL output is compressed with COMPRESSION (gzip or zstd); Parquet compresses its own pages
+        self.compression = codec_from_env()
+        # Write a <raw>.idx next to each raw file for lookups by GID (see RawIndexReader)
+        self.BUILD_RAW_INDEX = os.getenv('RAW_INDEX', 'false').lower() == 'true'
 
-    def process_jsonl_file(self, raw_file_path: str, processed_file_path: str, entity: str):
-        """Process JSONL files based on entity type."""
-        process_method = getattr(self, f'process_{entity}', None)
-        if callable(process_method):
-            process_method(raw_file_path, processed_file_path)
-        else:
+        if self.output_format not in ('jsonl', 'parquet'):
+            raise ValueError(f"Unsupported output format: {self.output_format}")
+        if self.output_layout not in ('nested', 'normalized'):
+            raise ValueError(f"Unsupported output layout: {self.output_layout}")
+
+    @property
+    def file_extension(self) -> str:
+        if self.output_format == 'jsonl':
+            return f".jsonl{extension(self.compression)}"
+        return f".{self.output_format}"
+
+    def output_paths(self, processed_file_path: str, entity: str) -> Dict[str, str]:
+        """
+        Files processing an entity writes, by table.
+
+        The nested layout, like entities without children, writes processed_file_path
+        itself; the normalized one writes each table to a directory of that name next
+        to it, e.g. processed/orders/order_line_items/<timestamp>.jsonl.
+        """
+        if not self.writes_tables(entity):
+            return {entity: processed_file_path}
+        directory, file_name = os.path.split(processed_file_path)
+        return {table: os.path.join(directory, table, file_name) for table in table_columns(entity)}
+
+    def writes_tables(self, entity: str) -> bool:
+        """Whether an entity is split into several tables rather than written to one file"""
+        return self.output_layout == 'normalized' and bool(ENTITIES[entity].get('children'))
+
+    def process_jsonl_file(self, raw_file_path: str, processed_file_path: str, entity: str) -> Optional[int]:
+        """Process JSONL files based on entity type, returning how many records were written."""
+        if entity not in ENTITIES:
             self.logger.error(f"No processing method for entity: {entity}")
+            return None
 
-    def process_orders(self, raw_file_path: str, processed_file_path: str):
-        """Process orders data, including nested lineItems and refunds."""
-        processed_data = []
-        orders_map = {}
-        line_items_map = {}
-        refunds_map = {}
-        refund_line_items_map = {}
-        transactions_map = {}
+        # The processing pass notes where each top-level record starts, so the index
+        # costs no extra read of the raw file
+        index = None
+        if self.BUILD_RAW_INDEX and path_codec(raw_file_path):
+            self.logger.warning(f"Not indexing {raw_file_path}, compressed raw files can't be read by offset")
+        elif self.BUILD_RAW_INDEX:
+            index = IndexBuilder()
 
-        with open(raw_file_path, 'r') as raw_file:
-            for line in raw_file:
-                record = json.loads(line)
-
-                if '__parentId' not in record:
-                    # This is an order
-                    order_id = record['id']
-                    record['lineItems'] = []
-                    record['refunds'] = []
-                    orders_map[order_id] = record
-                    processed_data.append(record)
-                else:
-                    parent_id = record['__parentId']
-                    if parent_id in orders_map:
-                        # Could be a lineItem or a refund
-                        if 'variant' in record:
-                            # It's a lineItem
-                            orders_map[parent_id]['lineItems'].append(record)
-                            line_items_map[record['id']] = record
-                        elif 'refundLineItems' in record or 'transactions' in record:
-                            # It's a refund
-                            record['refundLineItems'] = []
-                            record['transactions'] = []
-                            orders_map[parent_id]['refunds'].append(record)
-                            refunds_map[record['id']] = record
-                        else:
-                            self.logger.warning(f"Unrecognized record under order {parent_id}: {record}")
-                    elif parent_id in refunds_map:
-                        # Could be a refundLineItem or a transaction
-                        if 'lineItem' in record:
-                            # It's a refundLineItem
-                            refunds_map[parent_id]['refundLineItems'].append(record)
-                            refund_line_items_map[record['id']] = record
-                        elif 'amountSet' in record:
-                            # It's a transaction
-                            refunds_map[parent_id]['transactions'].append(record)
-                            transactions_map[record['id']] = record
-                        else:
-                            self.logger.warning(f"Unrecognized record under refund {parent_id}: {record}")
-                    else:
-                        self.logger.warning(f"Unrecognized parent ID: {parent_id}")
+        if self._should_parallelize(raw_file_path, entity):
+            count = self.process_parallel(raw_file_path, processed_file_path, entity, index)
+        else:
+            count = self.process_entity(raw_file_path, processed_file_path, entity, index)
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
+        if index is not None:
+            indexed = index.write(raw_file_path)
+            self.logger.info(f"Indexed {indexed} {entity} in {raw_file_path}")
+        return count
 
-        with open(processed_file_path, 'w') as processed_file:
-            json.dump(processed_data, processed_file, indent=2)
+    def process_entity(self, raw_file_path: str, processed_file_path: str, entity: str,
+                       index: Optional[IndexBuilder] = None) -> int:
+        """Reconstruct a registered entity with its children, or split it into tables, in one pass."""
+        count = self._process_range(raw_file_path, processed_file_path, entity, index=index)
+        self.logger.info(f"Successfully processed {count} {entity}{' rows' if self.writes_tables(entity) else ''}")
+        return count
 
-        self.logger.info(f"Successfully processed {len(processed_data)} orders with line items and refunds")
+    def _process_range(self, raw_file_path: str, processed_file_path: str, entity: str,
+                       byte_range: ByteRange = None, index: Optional[IndexBuilder] = None) -> int:
+        if self.writes_tables(entity):
+            return self._write_tables(self.iter_rows(entity, raw_file_path, byte_range, index),
+                                      self.output_paths(processed_file_path, entity), entity)
+        if not ENTITIES[entity].get('children') and self.output_format == 'jsonl' and byte_range is None:
+            # Flat records need no reshaping, so the raw lines are copied without parsing them
+            return self._copy_lines(raw_file_path, processed_file_path, index)
+        return self._write(self.iter_entity(entity, raw_file_path, byte_range, index), processed_file_path, entity)
 
-    def process_products(self, raw_file_path: str, processed_file_path: str):
-        """Process products data, including nested variants and inventory levels."""
-        processed_data = []
-        products_map = {}
-        variants_map = {}
+    def process_parallel(self, raw_file_path: str, processed_file_path: str, entity: str,
+                         index: Optional[IndexBuilder] = None) -> int:
+        """
+        Process a large raw file on several cores.
 
-        with open(raw_file_path, 'r') as raw_file:
-            for line in raw_file:
-                record = json.loads(line)
-
-                if '__parentId' not in record:
-                    # This is a product
-                    product_id = record['id']
-                    record['variants'] = []
-                    products_map[product_id] = record
-                    processed_data.append(record)
-                else:
-                    parent_id = record['__parentId']
-                    if parent_id in products_map:
-                        # This is a variant
-                        variant_id = record['id']
-                        record['inventoryLevels'] = []
-                        products_map[parent_id]['variants'].append(record)
-                        variants_map[variant_id] = record
-                    elif parent_id in variants_map:
-                        # This is an inventoryLevel for a variant
-                        variants_map[parent_id]['inventoryLevels'].append(record)
-                    else:
-                        self.logger.warning(f"Unrecognized parent ID: {parent_id}")
+        The file is cut at top-level record boundaries, so every chunk holds whole
+        parent/child groups. Chunks are reconstructed in the shared process pool into part
+        files (one per table in the normalized layout), which are then concatenated
+        in order.
+        """
+        bounds = self._split_points(raw_file_path, self.PROCESS_WORKERS * 4)
+        ranges = list(zip(bounds, bounds[1:]))
+        part_paths = [f"{processed_file_path}.part{index:04d}" for index in range(len(ranges))]
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
+        pool = self._process_pool(self.PROCESS_WORKERS)
+        try:
+            try:
+                chunks = list(pool.map(
+                    _process_chunk,
+                    [self.output_format] * len(ranges), [self.output_layout] * len(ranges), [entity] * len(ranges),
+                    [raw_file_path] * len(ranges), ranges, part_paths, [index is not None] * len(ranges)
+                ))
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); later files get a fresh pool
+                self._discard_process_pool(self.PROCESS_WORKERS, pool)
+                raise
+            for table, path in self.output_paths(processed_file_path, entity).items():
+                self._concat_parts([self.output_paths(part_path, entity)[table] for part_path in part_paths], path)
+        finally:
+            for part_path in part_paths:
+                for path in self.output_paths(part_path, entity).values():
+                    if os.path.exists(path):
+                        os.remove(path)
 
-        with open(processed_file_path, 'w') as processed_file:
-            json.dump(processed_data, processed_file, indent=2)
+        count = sum(chunk_count for chunk_count, _ in chunks)
+        if index is not None:
+            # Chunks are in file order, so their entries join into the index of the whole file
+            for _, entries in chunks:
+                index.extend(entries)
+        self.logger.info(f"Successfully processed {count} {entity}{' rows' if self.writes_tables(entity) else ''} "
+                         f"in {len(ranges)} chunks on {self.PROCESS_WORKERS} processes")
+        return count
 
-        self.logger.info(f"Successfully processed {len(processed_data)} products with variants and inventory levels")
+    @classmethod
+    def _process_pool(cls, workers: int) -> ProcessPoolExecutor:
+        """Process pool of this size shared by every processor, started on first use"""
+        with cls._process_pools_lock:
+            if workers not in cls._process_pools:
+                # spawn, since the caller is usually a thread of a multi-threaded sync
+                context = multiprocessing.get_context('spawn')
+                cls._process_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            return cls._process_pools[workers]
 
-    def process_customers(self, raw_file_path: str, processed_file_path: str):
-        """Process customers data."""
-        processed_data = []
-        with open(raw_file_path, 'r') as raw_file:
-            for line in raw_file:
-                record = json.loads(line)
-                processed_data.append(record)
-        # Ensure directory exists
+    @classmethod
+    def _discard_process_pool(cls, workers: int, pool: ProcessPoolExecutor) -> None:
+        with cls._process_pools_lock:
+            if cls._process_pools.get(workers) is pool:
+                del cls._process_pools[workers]
+        pool.shutdown(wait=False)
+
+    def _should_parallelize(self, raw_file_path: str, entity: str) -> bool:
+        if self.PROCESS_WORKERS < 2 or os.path.getsize(raw_file_path) < self.PARALLEL_MIN_BYTES:
+            return False
+        # Chunks are cut at byte offsets, which a compressed stream can't seek to
+        if path_codec(raw_file_path):
+            return False
+        # Flat JSONL output is a plain copy, bound by the disk rather than the CPU
+        return self.output_format != 'jsonl' or bool(ENTITIES[entity].get('children'))
+
+    @staticmethod
+    def _split_points(raw_file_path: str, parts: int) -> List[int]:
+        """Byte offsets that cut the file into about `parts` chunks, each starting at a top-level record"""
+        size = os.path.getsize(raw_file_path)
+        targets = [size * k // parts for k in range(1, parts)]
+        # A file processed before has an index of its record starts; no need to read it
+        indexed = record_starts_at(raw_file_path, targets)
+        if indexed is not None:
+            return [0, *sorted({start for start in indexed if 0 < start < size}), size]
+
+        points = [0]
+        with open(raw_file_path, 'rb') as raw_file:
+            for k in range(1, parts):
+                target = max(size * k // parts, points[-1] + 1)
+                # Step back one byte so a line starting right at the target is considered
+                raw_file.seek(target - 1)
+                raw_file.readline()
+                while True:
+                    position = raw_file.tell()
+                    line = raw_file.readline()
+                    if not line or b'"__parentId"' not in line:
+                        break
+                if line and points[-1] < position < size:
+                    points.append(position)
+        points.append(size)
+        return points
+
+    def _concat_parts(self, part_paths: List[str], processed_file_path: str) -> None:
+        if self.output_format == 'parquet':
+            concat_parquet(part_paths, processed_file_path, compression=self.PARQUET_COMPRESSION)
+            return
         os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
-        with open(processed_file_path, 'w') as processed_file:
-            json.dump(processed_data, processed_file, indent=2)
-        self.logger.info(f"Successfully processed {len(processed_data)} customers")
-
-    def process_collections(self, raw_file_path: str, processed_file_path: str):
-        """Process collections data."""
-        processed_data = []
-        with open(raw_file_path, 'r') as raw_file:
-            for line in raw_file:
-                record = json.loads(line)
-                processed_data.append(record)
-        # Ensure directory exists
+        # Compressed parts are whole frames, so they join byte by byte too
+        with open(processed_file_path, 'wb') as processed_file:
+            for part_path in part_paths:
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, processed_file)
+
+    def iter_entity(self, entity: str, raw_file_path: str, byte_range: ByteRange = None,
+                    index: Optional[IndexBuilder] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Processed records of an entity, optionally from one byte range of the raw file.
+
+        A range must start at a top-level record, such as a split point or an index entry.
+        """
+        lines = self._iter_lines(raw_file_path, byte_range)
+        return self.reconstruct(entity, lines, index, byte_range[0] if byte_range else 0)
+
+    def reconstruct(self, entity: str, lines: Iterator[bytes], index: Optional[IndexBuilder] = None,
+                    start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Processed records of an entity from raw JSONL lines, e.g. a range read through an index.
+
+        With an index, where each top-level record starts is added to it, counting
+        from start, the offset of the first line.
+        """
+        children = ENTITIES[entity].get('children')
+        if children:
+            return self._iter_grouped(lines, _compile_children(children), index, start)
+        if index is None:
+            return (json_codec.loads(line) for line in lines)
+        return self._iter_flat(lines, index, start)
+
+    @staticmethod
+    def _iter_flat(lines: Iterator[bytes], index: IndexBuilder, position: int) -> Iterator[Dict[str, Any]]:
+        for line in lines:
+            record = json_codec.loads(line)
+            index.add(record['id'], position)
+            position += len(line)
+            yield record
+        index.finish(position)
+
+    def _iter_grouped(self, lines: Iterator[bytes], hierarchy: '_Level', index: Optional[IndexBuilder] = None,
+                      position: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Rebuild top-level records from bulk JSONL one at a time.
+
+        Bulk output always emits children right after their parent, so a top-level
+        record is complete as soon as the next one starts. Only the current record
+        and its descendants are kept in memory. Each child goes to the connection
+        its GID type is registered under.
+        """
+        root_fields = hierarchy[0]
+        root = None
+        group = {}
+
+        for line in lines:
+            record = json_codec.loads(line)
+            parent_id = record.get('__parentId')
+            line_start = position
+            position += len(line)
+
+            if parent_id is None:
+                if index is not None:
+                    index.add(record['id'], line_start)
+                if root is not None:
+                    yield root
+                for field in root_fields:
+                    record[field] = []
+                root = record
+                group = {record['id']: (record, hierarchy)}
+                continue
+
+            entry = group.get(parent_id)
+            if entry is None:
+                self.logger.warning(f"Unrecognized parent ID: {parent_id}")
+                continue
+            parent, (_, by_type, only_child) = entry
+
+            record_id = record.get('id')
+            child = by_type.get(_gid_type(record_id)) if record_id else only_child
+            if child is None:
+                self.logger.warning(f"Unrecognized record under {parent['id']}: {record}")
+                continue
+
+            field, level = child
+            parent[field].append(record)
+            for child_field in level[0]:
+                record[child_field] = []
+            if record_id:
+                group[record_id] = (record, level)
+
+        if index is not None:
+            index.finish(position)
+        if root is not None:
+            yield root
+
+    def iter_rows(self, entity: str, raw_file_path: str, byte_range: ByteRange = None,
+                  index: Optional[IndexBuilder] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        (table, row) pairs of an entity in the normalized layout, optionally from one byte range.
+
+        Rows are emitted as their lines are read, so nothing is buffered: only the
+        ids of the current top-level record and its descendants are kept, to give
+        each row the foreign keys of its ancestors (e.g. order_id and refund_id).
+        """
+        spec = ENTITIES[entity]
+        hierarchy = _compile_tables(spec, spec.get('table', entity))
+        group: Dict[str, Tuple[_TableLevel, Dict[str, str]]] = {}
+        position = byte_range[0] if byte_range else 0
+
+        for line in self._iter_lines(raw_file_path, byte_range):
+            record = json_codec.loads(line)
+            parent_id = record.pop('__parentId', None)
+            record_id = record.get('id')
+            line_start = position
+            position += len(line)
+
+            if parent_id is None:
+                if index is not None:
+                    index.add(record_id, line_start)
+                level, keys = hierarchy, {}
+                group = {}
+            else:
+                entry = group.get(parent_id)
+                if entry is None:
+                    self.logger.warning(f"Unrecognized parent ID: {parent_id}")
+                    continue
+                (_, _, _, by_type, only_child), keys = entry
+                level = by_type.get(_gid_type(record_id)) if record_id else only_child
+                if level is None:
+                    self.logger.warning(f"Unrecognized record under {parent_id}: {record}")
+                    continue
+
+            table, key, lists, by_type, _ = level
+            inner_keys = {**keys, key: record_id} if key else keys
+            for field, list_table in lists:
+                for item in record.pop(field, None) or ():
+                    yield list_table, {**item, **inner_keys}
+            if table is not None:
+                yield table, {**record, **keys} if keys else record
+            if by_type and record_id:
+                group[record_id] = (level, inner_keys)
+
+        if index is not None:
+            index.finish(position)
+
+    @staticmethod
+    def _iter_lines(raw_file_path: str, byte_range: ByteRange = None) -> Iterator[bytes]:
+        """Lines of the raw file, or of the [start, end) byte range that begins at a line start."""
+        with open_reader(raw_file_path) as raw_file:
+            if byte_range is None:
+                yield from raw_file
+                return
+            start, end = byte_range
+            raw_file.seek(start)
+            position = start
+            while position < end:
+                line = raw_file.readline()
+                if not line:
+                    break
+                position += len(line)
+                yield line
+
+    def _copy_lines(self, raw_file_path: str, processed_file_path: str, index: Optional[IndexBuilder] = None) -> int:
+        """Copy JSONL lines through unchanged, returning how many were copied."""
         os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
-        with open(processed_file_path, 'w') as processed_file:
-            json.dump(processed_data, processed_file, indent=2)
-        self.logger.info(f"Successfully processed {len(processed_data)} collections")
-
-    def process_product_metafields(self, raw_file_path: str, processed_file_path: str):
-        """Process product metafields data."""
-        processed_data = []
-        products_map = {}
-        with open(raw_file_path, 'r') as raw_file:
+
+        count = 0
+        position = 0
+        with open_reader(raw_file_path) as raw_file, open_writer(processed_file_path, self.compression) as processed_file:
             for line in raw_file:
-                record = json.loads(line)
-                if '__parentId' not in record:
-                    # This is a product
-                    product_id = record['id']
-                    record['metafields'] = []
-                    products_map[product_id] = record
-                    processed_data.append(record)
+                line_start = position
+                position += len(line)
+                if not line.strip():
+                    continue
+                if index is not None:
+                    # Only the id is needed; the line itself is still copied as it is
+                    index.add(json_codec.loads(line)['id'], line_start)
+                processed_file.write(line if line.endswith(b'\n') else line + b'\n')
+                count += 1
+        if index is not None:
+            index.finish(position)
+        return count
+
+    def _write(self, records: Iterator[Dict[str, Any]], processed_file_path: str, entity: str) -> int:
+        """Write records in the configured output format, returning how many were written."""
+        if self.output_format == 'parquet':
+            schema = arrow_schema(ENTITIES[entity]['query'])
+            return write_parquet(records, processed_file_path, schema,
+                                 compression=self.PARQUET_COMPRESSION, batch_size=self.PARQUET_BATCH_SIZE)
+        return self._write_jsonl(records, processed_file_path)
+
+    def _write_tables(self, rows: Iterator[Tuple[str, Dict[str, Any]]], paths: Dict[str, str], entity: str) -> int:
+        """Stream rows into one file per table, returning how many rows were written in all."""
+        columns = table_columns(entity)
+        writers = {}
+        try:
+            # Every table gets a file, even an empty one, so each run has the full set
+            for table, path in paths.items():
+                if self.output_format == 'parquet':
+                    writers[table] = ParquetStreamWriter(
+                        path, table_schema(*columns[table]),
+                        compression=self.PARQUET_COMPRESSION, batch_size=self.PARQUET_BATCH_SIZE
+                    )
                 else:
-                    # This is a metafield
-                    parent_id = record['__parentId']
-                    if parent_id in products_map:
-                        products_map[parent_id]['metafields'].append(record)
+                    writers[table] = _JsonlWriter(path, self.compression)
+            for table, row in rows:
+                writers[table].write(row)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        self.logger.info(f"Wrote {entity} tables: " + ', '.join(f"{table}={writer.count}" for table, writer in writers.items()))
+        return sum(writer.count for writer in writers.values())
+
+    def _write_jsonl(self, records: Iterator[Dict[str, Any]], processed_file_path: str) -> int:
+        """Write records as JSONL as they are produced, returning how many were written."""
         # Ensure directory exists
         os.makedirs(os.path.dirname(processed_file_path), exist_ok=True)
-        with open(processed_file_path, 'w') as processed_file:
-            json.dump(processed_data, processed_file, indent=2)
-        self.logger.info(f"Successfully processed {len(processed_data)} products with metafields")
\ No newline at end of file
+
+        count = 0
+        with open_writer(processed_file_path, self.compression) as processed_file:
+            for record in records:
+                processed_file.write(json_codec.dumps(record))
+                processed_file.write(b'\n')
+                count += 1
+        return count
+
+class _JsonlWriter:
+    """JSONL file that records are added to one at a time"""
+
+    def __init__(self, file_path: str, codec: Optional[str] = None):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self.count = 0
+        self._file = open_writer(file_path, codec)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json_codec.dumps(record))
+        self._file.write(b'\n')
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,65 @@
+# src/processors/json_codec.py
+
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # fast backend is optional
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # fast backend is optional
+    simdjson = None
+
+# JSON_BACKEND picks the parser: auto prefers orjson, then simdjson, then the standard library
+_BACKENDS = ('orjson', 'simdjson', 'json')
+
+def _select_backend(name: str) -> str:
+    available = {'orjson': orjson is not None, 'simdjson': simdjson is not None, 'json': True}
+    if name == 'auto':
+        return next(backend for backend in _BACKENDS if available[backend])
+    if name not in available:
+        raise ValueError(f"Unsupported JSON backend: {name}")
+    if not available[name]:
+        raise ImportError(f"{name} is required for JSON_BACKEND={name}")
+    return name
+
+BACKEND = _select_backend(os.getenv('JSON_BACKEND', 'auto'))
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse one JSON document; bytes are accepted so files can be read without decoding"""
+    if BACKEND == 'orjson':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects a few inputs the standard library accepts, e.g. NaN
+            return json.loads(data)
+    if BACKEND == 'simdjson':
+        return simdjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    """Serialize compactly to UTF-8 bytes, ready to write to a binary file"""
+    if orjson is not None and BACKEND != 'json':
+        try:
+            return orjson.dumps(obj, default=str)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which only the standard library handles
+            pass
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+def dumps_pretty(obj: Any) -> bytes:
+    """Serialize with two-space indentation for state and stats files people read"""
+    if orjson is not None and BACKEND != 'json':
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+
+def load_file(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
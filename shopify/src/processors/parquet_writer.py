@@ -0,0 +1,156 @@
+# src/processors/parquet_writer.py
+
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet output is optional
+    pa = None
+    pq = None
+
+# GraphQL selections carry no types, so scalars default to string unless listed here
+_SCALAR_TYPES = {
+    'quantity': 'int64',
+    'refundableQuantity': 'int64',
+    'currentQuantity': 'int64',
+    'inventoryQuantity': 'int64',
+    'sellableOnlineQuantity': 'int64',
+    'totalInventory': 'int64',
+    'productsCount': 'int64',
+    'position': 'int64',
+    'tracksInventory': 'bool_',
+    'tracked': 'bool_',
+}
+
+# Fields that are plain GraphQL lists rather than connections
+_LIST_FIELDS = {'transactions', 'addresses', 'selectedOptions', 'options', 'values'}
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[A-Za-z_][A-Za-z0-9_]*|[{}()]|\S')
+
+def parse_selection(query: str) -> Dict[str, Optional[dict]]:
+    """Parse a GraphQL query into nested {field: sub-selection or None} dicts"""
+    tokens = _TOKEN.findall(query.replace('{INCREMENTAL_FILTER}', ''))
+    pos = 0
+
+    def parse_block() -> Dict[str, Optional[dict]]:
+        nonlocal pos
+        pos += 1  # opening brace
+        fields = {}
+        while tokens[pos] != '}':
+            name = tokens[pos]
+            pos += 1
+            if tokens[pos] == '(':
+                # Arguments don't shape the output, skip them
+                depth = 0
+                while True:
+                    depth += {'(': 1, ')': -1}.get(tokens[pos], 0)
+                    pos += 1
+                    if depth == 0:
+                        break
+            if tokens[pos] == '{':
+                fields[name] = parse_block()
+            else:
+                fields[name] = None
+        pos += 1  # closing brace
+        return fields
+
+    return parse_block()
+
+def arrow_schema(query: str) -> 'pa.Schema':
+    """Build the schema of processed records for a bulk query"""
+    _require_pyarrow()
+    (root_connection,) = parse_selection(query).values()
+    return pa.schema(_arrow_fields(connection_node(root_connection)))
+
+def table_schema(selection: Dict[str, Optional[dict]], foreign_keys: List[str]) -> 'pa.Schema':
+    """Schema of a normalized table: the selected fields plus string foreign key columns"""
+    _require_pyarrow()
+    return pa.schema(_arrow_fields(selection) + [pa.field(key, pa.string()) for key in foreign_keys])
+
+def write_parquet(records: Iterator[Dict[str, Any]], file_path: str, schema: 'pa.Schema',
+                  compression: str = 'zstd', batch_size: int = 10000) -> int:
+    """Write records in row groups of batch_size as they are produced, returning the count"""
+    with ParquetStreamWriter(file_path, schema, compression, batch_size) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+class ParquetStreamWriter:
+    """Parquet file that records are added to one at a time, flushed in row groups of batch_size"""
+
+    def __init__(self, file_path: str, schema: 'pa.Schema', compression: str = 'zstd', batch_size: int = 10000):
+        _require_pyarrow()
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        self.schema = schema
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._writer = pq.ParquetWriter(file_path, schema, compression=compression)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._batch.append(record)
+        self.count += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def close(self) -> None:
+        if self._batch:
+            self._flush()
+        self._writer.close()
+
+    def _flush(self) -> None:
+        self._writer.write_table(pa.Table.from_pylist(self._batch, schema=self.schema))
+        self._batch = []
+
+    def __enter__(self) -> 'ParquetStreamWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def concat_parquet(part_paths: List[str], file_path: str, compression: str = 'zstd') -> None:
+    """Concatenate parquet files of the same schema row group by row group, without decoding rows"""
+    _require_pyarrow()
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    writer = None
+    try:
+        for part_path in part_paths:
+            part = pq.ParquetFile(part_path)
+            if writer is None:
+                writer = pq.ParquetWriter(file_path, part.schema_arrow, compression=compression)
+            for index in range(part.num_row_groups):
+                writer.write_table(part.read_row_group(index))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def connection_node(selection: Dict[str, Optional[dict]]) -> Optional[Dict[str, Optional[dict]]]:
+    """Selection of the node inside a connection, or None if this is not a connection"""
+    edges = selection.get('edges')
+    if edges and edges.get('node'):
+        return edges['node']
+    return selection.get('nodes')
+
+def _arrow_fields(selection: Dict[str, Optional[dict]]) -> List['pa.Field']:
+    return [pa.field(name, _arrow_type(name, sub_selection)) for name, sub_selection in selection.items()]
+
+def _arrow_type(name: str, sub_selection: Optional[dict]) -> 'pa.DataType':
+    if sub_selection is None:
+        scalar = getattr(pa, _SCALAR_TYPES.get(name, 'string'))()
+        return pa.list_(scalar) if name in _LIST_FIELDS else scalar
+
+    # Connections are reconstructed as arrays of their nodes
+    node = connection_node(sub_selection)
+    if node is not None:
+        return pa.list_(pa.struct(_arrow_fields(node)))
+
+    struct = pa.struct(_arrow_fields(sub_selection))
+    return pa.list_(struct) if name in _LIST_FIELDS else struct
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("pyarrow is required for parquet output")
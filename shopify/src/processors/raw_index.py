@@ -0,0 +1,178 @@
+# src/processors/raw_index.py
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from processors.compression import path_codec
+
+# Index layout: a 32 byte header (magic, slot count, record count, reserved) followed by an
+# open-addressing hash table of (numeric id, start, end) slots, then the start of every record
+# in file order. Both files are memory mapped, so a lookup touches a couple of pages no matter
+# how large the export is, and so does finding the record nearest to an offset.
+INDEX_SUFFIX = '.idx'
+_MAGIC = b'SHPIDX02'
+_HEADER = struct.Struct('<8sQQQ')
+_SLOT = struct.Struct('<QQQ')
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+def index_path(raw_file_path: str) -> str:
+    return f"{raw_file_path}{INDEX_SUFFIX}"
+
+class IndexBuilder:
+    """
+    Byte ranges of top-level records, collected by a processing pass as it reads them.
+
+    Bulk output keeps a record's children right after it, so each top-level record
+    owns the bytes up to the next one: the pass only reports where records start,
+    and finish() closes the last range. Entries of disjoint ranges, e.g. from the
+    chunks of a parallel pass, are merged with extend().
+    """
+
+    def __init__(self):
+        self.entries = array('Q')
+        self._open: Optional[Tuple[int, int]] = None
+
+    def add(self, gid: str, start: int) -> None:
+        self.finish(start)
+        self._open = (_numeric_id(gid), start)
+
+    def finish(self, end: int) -> None:
+        if self._open is not None:
+            self.entries.extend((*self._open, end))
+            self._open = None
+
+    def extend(self, entries: array) -> None:
+        self.entries.extend(entries)
+
+    def write(self, raw_file_path: str) -> int:
+        """Write the index of raw_file_path, returning the number of records indexed"""
+        if path_codec(raw_file_path):
+            raise ValueError(f"Byte offsets can't be indexed in a compressed file: {raw_file_path}")
+        entries = self.entries
+        count = len(entries) // 3
+        capacity = 8
+        while capacity < count * 2:
+            capacity *= 2
+
+        temp_path = f"{index_path(raw_file_path)}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, capacity, count, 0))
+            f.truncate(_HEADER.size + capacity * _SLOT.size)
+            f.seek(0, os.SEEK_END)
+            # Ranges are added in file order, so their starts are already sorted
+            f.write(entries[1::3].tobytes())
+        with open(temp_path, 'r+b') as f, mmap.mmap(f.fileno(), 0) as table:
+            for i in range(0, len(entries), 3):
+                slot = _find_slot(table, capacity, entries[i])
+                _SLOT.pack_into(table, _HEADER.size + slot * _SLOT.size, entries[i], entries[i + 1], entries[i + 2])
+        os.replace(temp_path, index_path(raw_file_path))
+        return count
+
+def record_starts_at(raw_file_path: str, offsets: List[int]) -> Optional[List[int]]:
+    """
+    Start of the first top-level record at or after each offset (the file size past the
+    last one), from the index of raw_file_path; None when it has no up to date index.
+    """
+    path = index_path(raw_file_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(raw_file_path):
+        return None
+    size = os.path.getsize(raw_file_path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as table:
+        magic, capacity, count, _ = _HEADER.unpack_from(table, 0)
+        if magic != _MAGIC:
+            return None
+        section = _HEADER.size + capacity * _SLOT.size
+        with memoryview(table)[section:section + count * 8].cast('Q') as starts:
+            positions = [bisect_left(starts, offset) for offset in offsets]
+            return [starts[i] if i < count else size for i in positions]
+
+class RawIndexReader:
+    """
+    Random access to a raw bulk file by top-level GID through its index.
+
+    lines() returns the raw JSONL of a record and its children; get() returns the
+    record reconstructed the same way processing does.
+    """
+
+    def __init__(self, raw_file_path: str, entity: str, processor=None):
+        if processor is None:
+            from processors.data_processor import DataProcessor
+            processor = DataProcessor()
+        self.raw_file_path = raw_file_path
+        self.entity = entity
+        self.processor = processor
+
+        self._raw_file = open(raw_file_path, 'rb')
+        self._index_file = open(index_path(raw_file_path), 'rb')
+        self._raw = mmap.mmap(self._raw_file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if os.path.getsize(raw_file_path) else b''
+        self._table = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._capacity, self.count, _ = _HEADER.unpack_from(self._table, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a raw file index: {index_path(raw_file_path)}")
+
+    def offsets(self, gid: str) -> Optional[Tuple[int, int]]:
+        """[start, end) byte range of a top-level record and its children, or None"""
+        key = _numeric_id(gid)
+        slot = _find_slot(self._table, self._capacity, key)
+        stored, start, end = _SLOT.unpack_from(self._table, _HEADER.size + slot * _SLOT.size)
+        if stored != key:
+            return None
+        return start, end
+
+    def lines(self, gid: str) -> Optional[bytes]:
+        """Raw JSONL of a top-level record and its children"""
+        offsets = self.offsets(gid)
+        if offsets is None:
+            return None
+        start, end = offsets
+        return self._raw[start:end]
+
+    def get(self, gid: str) -> Optional[Dict[str, Any]]:
+        """A top-level record with its children attached, as it appears in processed output"""
+        offsets = self.offsets(gid)
+        if offsets is None:
+            return None
+        start, end = offsets
+        # The record is rebuilt from its slice of the mapped file, no read of the raw file needed
+        lines = (line + b'\n' for line in self._raw[start:end].split(b'\n') if line)
+        record = next(self.processor.reconstruct(self.entity, lines), None)
+        # Numeric ids are unique per type only, so make sure this is the record asked for
+        return record if record is not None and record['id'] == gid else None
+
+    def iter_records(self, gids) -> Iterator[Dict[str, Any]]:
+        """Reconstruct only the given records, e.g. to reprocess a handful of orders"""
+        for gid in gids:
+            record = self.get(gid)
+            if record is not None:
+                yield record
+
+    def close(self) -> None:
+        if isinstance(self._raw, mmap.mmap):
+            self._raw.close()
+        self._table.close()
+        self._raw_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _numeric_id(gid: str) -> int:
+    """Numeric part of a GID such as gid://shopify/Order/123; query strings are ignored"""
+    return int(gid.rsplit('/', 1)[-1].split('?', 1)[0])
+
+def _find_slot(table, capacity: int, key: int) -> int:
+    """Slot holding key, or the empty slot where it belongs (linear probing)"""
+    mask = capacity - 1
+    slot = ((key * _HASH_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> 32 & mask
+    while True:
+        stored = struct.unpack_from('<Q', table, _HEADER.size + slot * _SLOT.size)[0]
+        if stored == 0 or stored == key:
+            return slot
+        slot = (slot + 1) & mask
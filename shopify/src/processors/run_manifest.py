@@ -0,0 +1,95 @@
+# src/processors/run_manifest.py
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+class RunManifest:
+    """
+    Durable record of how far the current sync run got with each entity.
+
+    A restarted container picks the run up where it stopped: bulk operations
+    that already finished are not started again (Shopify keeps their results for
+    a week), downloads continue from the last checkpointed byte, and files that
+    were processed or uploaded are not redone. The manifest is kept as a
+    checkpoint in the state store and removed when the run finishes, failed
+    entities included; only a run that was cut off is resumed.
+    """
+
+    CHECKPOINT = 'run_manifest'
+
+    def __init__(self, store, max_age: Optional[timedelta] = None):
+        self.store = store
+        # Older runs are abandoned; their result URLs are about to expire
+        self.max_age = max_age or timedelta(hours=int(os.getenv('RUN_MANIFEST_MAX_AGE_HOURS', 144)))
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, Any]] = None
+
+    def begin(self, full_resync: bool = False) -> bool:
+        """Start a run, resuming the interrupted one if it is recent and of the same kind"""
+        with self._lock:
+            previous = self._read_manifest()
+            if previous and self._resumable(previous, full_resync):
+                self._manifest = previous
+                return True
+            self._manifest = {
+                'started_at': datetime.utcnow().isoformat(),
+                'full_resync': full_resync,
+                'entities': {}
+            }
+            self._write_manifest(self._manifest)
+            return False
+
+    def entity(self, entity: str) -> Dict[str, Any]:
+        """Checkpoint of an entity in the current run; empty when it has not started or no run is active"""
+        with self._lock:
+            if self._manifest is None:
+                return {}
+            return dict(self._manifest['entities'].get(entity, {}))
+
+    def update(self, entity: str, **fields: Any) -> None:
+        """Merge fields into an entity's checkpoint and persist it"""
+        with self._lock:
+            if self._manifest is None:
+                return
+            self._manifest['entities'].setdefault(entity, {}).update(fields)
+            self._write_manifest(self._manifest)
+
+    def reset(self, entity: str) -> None:
+        """
+        Drop an entity's progress after it failed, keeping only its export window.
+
+        Its bulk operation, result and download offset are likely what failed or
+        about to expire, so a resumed run extracts the entity afresh.
+        """
+        with self._lock:
+            if self._manifest is None or entity not in self._manifest['entities']:
+                return
+            checkpoint = self._manifest['entities'][entity]
+            self._manifest['entities'][entity] = {
+                'stage': 'failed',
+                **{key: checkpoint[key] for key in ('incremental_date',) if key in checkpoint}
+            }
+            self._write_manifest(self._manifest)
+
+    def finish(self) -> None:
+        """End the run; failed entities are retried by the next run from their watermark"""
+        with self._lock:
+            if self._manifest is None:
+                return
+            self.store.delete_checkpoint(self.CHECKPOINT)
+            self._manifest = None
+
+    def _resumable(self, manifest: Dict[str, Any], full_resync: bool) -> bool:
+        started_at = datetime.fromisoformat(manifest['started_at'])
+        return manifest.get('full_resync') == full_resync and datetime.utcnow() - started_at < self.max_age
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            return self.store.load_checkpoint(self.CHECKPOINT)
+        except Exception:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        # The store replaces checkpoints atomically, so a crash never leaves a half-written manifest
+        self.store.save_checkpoint(self.CHECKPOINT, manifest)
@@ -0,0 +1,224 @@
+# src/processors/run_metrics.py
+
+import logging
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import requests
+from processors import json_codec
+
+class RunMetrics:
+    """
+    Stage timers and counters of one sync run.
+
+    Each entity goes through stages (bulk operation, download, process, compact,
+    upload); a stage records its wall time, what it moved (bytes, records) and the
+    process's peak memory while it ran, sampled every sample_interval seconds.
+    Memory is per process, so stages that overlap share their peaks.
+    """
+
+    def __init__(self, sample_interval: Optional[float] = None):
+        self.sample_interval = sample_interval or float(os.getenv('METRICS_SAMPLE_INTERVAL', 0.5))
+        self._lock = threading.Lock()
+        self._entities: Dict[str, Dict[str, Any]] = {}
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._started: Optional[float] = None
+        self._started_at: Optional[str] = None
+        self._api_cost_at_start = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def begin(self, api_cost: float = 0.0) -> None:
+        """
+        Start a run, dropping the measurements of the previous one.
+
+        api_cost is the client's running total of query cost, so that finish()
+        can report what this run consumed.
+        """
+        with self._lock:
+            self._entities = {}
+            self._started = time.time()
+            self._started_at = datetime.utcnow().isoformat()
+            self._api_cost_at_start = api_cost
+        if self._sampler is None or not self._sampler.is_alive():
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name='metrics-sampler', daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def stage(self, entity: str, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a stage; the caller adds counters such as bytes or records to the yielded dict"""
+        counters: Dict[str, Any] = {}
+        rss = current_rss()
+        tracked = {'peak': rss}
+        with self._lock:
+            self._active[id(tracked)] = tracked
+        started = time.time()
+        try:
+            yield counters
+        finally:
+            seconds = time.time() - started
+            with self._lock:
+                del self._active[id(tracked)]
+                peak = max(tracked['peak'], current_rss())
+            stage = {'seconds': round(seconds, 3), **counters, 'peak_rss_bytes': peak}
+            for counter in ('bytes', 'records'):
+                if counters.get(counter) is not None:
+                    stage[f"{counter}_per_second"] = round(counters[counter] / max(seconds, 1e-3), 1)
+            self.record(entity, name, **stage)
+
+    def record(self, entity: str, name: str, **values: Any) -> None:
+        """Set measurements of a stage directly, e.g. ones reported by Shopify"""
+        with self._lock:
+            stages = self._entities.setdefault(entity, {})
+            stages.setdefault(name, {}).update({k: v for k, v in values.items() if v is not None})
+
+    def finish(self, results: Dict[str, Any], api_cost: Optional[float] = None) -> Dict[str, Any]:
+        """Summary of the run with every entity's stages and final stats; api_cost is the client's total now"""
+        self._stop.set()
+        with self._lock:
+            finished = time.time()
+            entities = {}
+            for entity, stats in results.items():
+                records_count = stats.get('records_count')
+                entities[entity] = {
+                    'success': not stats.get('error'),
+                    # Shopify reports object counts as strings
+                    'records_count': int(records_count) if records_count is not None else None,
+                    'stages': self._entities.get(entity, {})
+                }
+            return {
+                'started_at': self._started_at,
+                'finished_at': datetime.utcnow().isoformat(),
+                'seconds': round(finished - self._started, 3) if self._started else None,
+                'api_cost': api_cost - self._api_cost_at_start if api_cost is not None else None,
+                'peak_rss_bytes': peak_rss(),
+                'entities': entities
+            }
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            rss = current_rss()
+            with self._lock:
+                for tracked in self._active.values():
+                    tracked['peak'] = max(tracked['peak'], rss)
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes; the lifetime peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class JsonLogSink:
+    """Log each run as one structured JSON line"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+
+    def emit(self, run: Dict[str, Any], shop: str) -> None:
+        self.logger.info(json_codec.dumps({'event': 'sync_metrics', 'shop': shop, **run}).decode('utf-8'))
+
+class OpenMetricsFileSink:
+    """Write the latest run in OpenMetrics text format, e.g. for node_exporter's textfile collector"""
+
+    def __init__(self, metrics_file: str):
+        self.metrics_file = metrics_file
+
+    def emit(self, run: Dict[str, Any], shop: str) -> None:
+        os.makedirs(os.path.dirname(self.metrics_file) or '.', exist_ok=True)
+        # Swap the file in whole so a scrape never sees half of it
+        temp_file = f"{self.metrics_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(render_openmetrics(run, shop))
+        os.replace(temp_file, self.metrics_file)
+
+class PushGatewaySink:
+    """Push the latest run to a Prometheus Pushgateway, grouped by shop"""
+
+    def __init__(self, url: str, job: str = 'shopify_sync', timeout: float = 10):
+        self.url = url.rstrip('/')
+        self.job = job
+        self.timeout = timeout
+
+    def emit(self, run: Dict[str, Any], shop: str) -> None:
+        # The Pushgateway reads the classic text format, which is OpenMetrics without the EOF marker
+        body = render_openmetrics(run, shop, eof=False)
+        response = requests.put(
+            f"{self.url}/metrics/job/{self.job}/shop/{shop}", data=body.encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4'}, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+def sinks_from_env(state_dir: str, shop: str) -> List[Any]:
+    """The sinks listed in METRICS_SINKS (openmetrics, pushgateway, json_log)"""
+    sinks: List[Any] = []
+    for name in (s.strip() for s in os.getenv('METRICS_SINKS', '').split(',') if s.strip()):
+        if name == 'openmetrics':
+            metrics_file = os.getenv('METRICS_OPENMETRICS_FILE')
+            if metrics_file:
+                # Every shop writes its latest run, so a file shared by several shops gets one per shop
+                root, ext = os.path.splitext(metrics_file)
+                metrics_file = f"{root}_{shop}{ext}"
+            sinks.append(OpenMetricsFileSink(metrics_file or os.path.join(state_dir, 'sync_metrics.prom')))
+        elif name == 'pushgateway':
+            url = os.getenv('METRICS_PUSHGATEWAY_URL')
+            if not url:
+                raise ValueError("METRICS_PUSHGATEWAY_URL must be set for the pushgateway metrics sink")
+            sinks.append(PushGatewaySink(url, os.getenv('METRICS_PUSHGATEWAY_JOB', 'shopify_sync')))
+        elif name == 'json_log':
+            sinks.append(JsonLogSink())
+        else:
+            raise ValueError(f"Unsupported metrics sink: {name}")
+    return sinks
+
+_METRIC_PREFIX = 'shopify_sync'
+_UNSAFE_NAME = re.compile(r'[^a-zA-Z0-9_]')
+
+def render_openmetrics(run: Dict[str, Any], shop: str, eof: bool = True) -> str:
+    """Gauges of a run: run totals per shop, and every numeric stage measurement per entity and stage"""
+    families: Dict[str, List[tuple]] = {}
+
+    def add(name: str, labels: Dict[str, str], value: Any) -> None:
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            families.setdefault(f"{_METRIC_PREFIX}_{_UNSAFE_NAME.sub('_', name)}", []).append((labels, value))
+
+    shop_labels = {'shop': shop}
+    add('run_seconds', shop_labels, run.get('seconds'))
+    add('run_api_cost', shop_labels, run.get('api_cost'))
+    add('run_peak_rss_bytes', shop_labels, run.get('peak_rss_bytes'))
+    for entity, entity_run in run.get('entities', {}).items():
+        entity_labels = {**shop_labels, 'entity': entity}
+        add('entity_success', entity_labels, entity_run.get('success'))
+        add('entity_records', entity_labels, entity_run.get('records_count'))
+        for stage, measurements in entity_run.get('stages', {}).items():
+            for name, value in measurements.items():
+                add(f"stage_{name}", {**entity_labels, 'stage': stage}, value)
+
+    lines = []
+    for family, samples in families.items():
+        lines.append(f"# TYPE {family} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+            lines.append(f"{family}{{{label_text}}} {value}")
+    if eof:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,213 @@
+# src/processors/sqlite_state.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterator, List
+from processors import json_codec
+from processors.sync_state import DEFAULT_STATE_DIR, entity_state
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entity_state (
+    entity TEXT PRIMARY KEY,
+    last_attempt TEXT,
+    last_success TEXT,
+    records_count INTEGER,
+    file_size INTEGER,
+    error TEXT,
+    operation_id TEXT,
+    mode TEXT,
+    watermark TEXT,
+    shards TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT,
+    finished_at TEXT,
+    seconds REAL,
+    api_cost REAL,
+    run TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE TABLE IF NOT EXISTS run_entities (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    entity TEXT NOT NULL,
+    success INTEGER,
+    records_count INTEGER,
+    stages TEXT,
+    PRIMARY KEY (run_id, entity)
+);
+CREATE INDEX IF NOT EXISTS run_entities_entity ON run_entities (entity, run_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+_STATE_COLUMNS = ('last_attempt', 'last_success', 'records_count', 'file_size', 'error',
+                  'operation_id', 'mode', 'watermark', 'shards')
+
+class SQLiteStateTracker:
+    """
+    Sync state in one SQLite database in WAL mode, with the SyncStateTracker interface.
+
+    Each update is a single transaction touching one row, so entities syncing in
+    parallel (threads or processes) never overwrite each other and readers are
+    never blocked by a writer. Besides per-entity state it keeps the history of
+    runs, indexed by time and entity, and the checkpoints of interrupted runs.
+    On first use it imports sync_state.json and run checkpoint files left by
+    the JSON store.
+    """
+
+    def __init__(self, state_dir: str = DEFAULT_STATE_DIR):
+        self.state_dir = state_dir
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.db_file = os.path.join(self.state_dir, 'sync_state.db')
+        self.BUSY_TIMEOUT = float(os.getenv('STATE_BUSY_TIMEOUT', 30))  # seconds to wait for a write lock
+        # sqlite3 connections can't be shared between threads, so each thread opens its own
+        self._local = threading.local()
+
+        is_new = not os.path.exists(self.db_file)
+        # executescript commits on its own; every statement is idempotent
+        self._connection().executescript(_SCHEMA)
+        if is_new:
+            self._import_json_state()
+
+    def get_last_sync(self, entity: str) -> Optional[datetime]:
+        """Get the last successful sync timestamp for an entity"""
+        last_success = self.get_entity_stats(entity).get('last_success')
+        return datetime.fromisoformat(last_success) if last_success else None
+
+    def get_watermark(self, entity: str) -> Optional[datetime]:
+        """Get the updated_at watermark up to which an entity is known to be synced"""
+        watermark = self.get_entity_stats(entity).get('watermark')
+        return datetime.fromisoformat(watermark) if watermark else None
+
+    def get_entity_stats(self, entity: str) -> Dict[str, Any]:
+        """State of one entity, empty if it was never synced"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(_STATE_COLUMNS)} FROM entity_state WHERE entity = ?", (entity,)
+        ).fetchone()
+        return self._state_from_row(row) if row else {}
+
+    def update_sync_state(self, entity: str, status: Dict[str, Any]) -> None:
+        """Update sync state with results"""
+        with self._transaction() as db:
+            row = db.execute(
+                f"SELECT {', '.join(_STATE_COLUMNS)} FROM entity_state WHERE entity = ?", (entity,)
+            ).fetchone()
+            self._write_entity(db, entity, entity_state(status, self._state_from_row(row) if row else {}))
+
+    def get_sync_stats(self) -> Dict[str, Any]:
+        """Get sync statistics for all entities"""
+        rows = self._connection().execute(
+            f"SELECT entity, {', '.join(_STATE_COLUMNS)} FROM entity_state ORDER BY entity"
+        ).fetchall()
+        return {row[0]: self._state_from_row(row[1:]) for row in rows}
+
+    def record_run(self, run: Dict[str, Any]) -> None:
+        """Add a finished run's metrics to the history"""
+        with self._transaction() as db:
+            run_id = db.execute(
+                "INSERT INTO runs (started_at, finished_at, seconds, api_cost, run) VALUES (?, ?, ?, ?, ?)",
+                (run.get('started_at'), run.get('finished_at'), run.get('seconds'), run.get('api_cost'),
+                 json_codec.dumps(run).decode('utf-8'))
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO run_entities (run_id, entity, success, records_count, stages) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (run_id, entity, entity_run.get('success'), entity_run.get('records_count'),
+                     json_codec.dumps(entity_run.get('stages', {})).decode('utf-8'))
+                    for entity, entity_run in run.get('entities', {}).items()
+                ]
+            )
+
+    def get_run_history(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """The most recent runs, newest first"""
+        rows = self._connection().execute("SELECT run FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [json_codec.loads(row[0]) for row in rows]
+
+    def get_entity_history(self, entity: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Stage metrics of an entity over its most recent runs, newest first"""
+        rows = self._connection().execute(
+            """
+            SELECT runs.started_at, run_entities.success, run_entities.records_count, run_entities.stages
+            FROM run_entities JOIN runs ON runs.id = run_entities.run_id
+            WHERE run_entities.entity = ? ORDER BY run_entities.run_id DESC LIMIT ?
+            """, (entity, limit)
+        ).fetchall()
+        return [
+            {'started_at': started_at, 'success': bool(success), 'records_count': records_count,
+             'stages': json_codec.loads(stages) if stages else {}}
+            for started_at, success, records_count, stages in rows
+        ]
+
+    def load_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute("SELECT data FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return json_codec.loads(row[0]) if row else None
+
+    def save_checkpoint(self, name: str, data: Dict[str, Any]) -> None:
+        with self._transaction() as db:
+            self._write_checkpoint(db, name, data)
+
+    def delete_checkpoint(self, name: str) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'connection', None)
+        if db is None:
+            # Autocommit; writes open their own transactions in _transaction
+            db = sqlite3.connect(self.db_file, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            # WAL stays consistent after a crash; a power loss may only drop the latest commits
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = db
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction, taking the write lock up front so read-modify-write is atomic"""
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    @staticmethod
+    def _state_from_row(row: tuple) -> Dict[str, Any]:
+        state = dict(zip(_STATE_COLUMNS, row))
+        state['shards'] = json_codec.loads(state['shards']) if state['shards'] else None
+        return state
+
+    @staticmethod
+    def _write_entity(db: sqlite3.Connection, entity: str, state: Dict[str, Any]) -> None:
+        values = {**state, 'shards': json_codec.dumps(state['shards']).decode('utf-8') if state.get('shards') else None}
+        db.execute(
+            f"INSERT OR REPLACE INTO entity_state (entity, {', '.join(_STATE_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in _STATE_COLUMNS)})",
+            (entity, *(values.get(column) for column in _STATE_COLUMNS))
+        )
+
+    @staticmethod
+    def _write_checkpoint(db: sqlite3.Connection, name: str, data: Dict[str, Any]) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO checkpoints (name, data, updated_at) VALUES (?, ?, ?)",
+            (name, json_codec.dumps(data).decode('utf-8'), datetime.utcnow().isoformat())
+        )
+
+    def _import_json_state(self) -> None:
+        """Carry over state written by the JSON store, so switching backends keeps watermarks"""
+        state_file = os.path.join(self.state_dir, 'sync_state.json')
+        manifest_file = os.path.join(self.state_dir, 'run_manifest.json')
+        with self._transaction() as db:
+            if os.path.exists(state_file):
+                for entity, state in json_codec.load_file(state_file).items():
+                    self._write_entity(db, entity, state)
+            if os.path.exists(manifest_file):
+                self._write_checkpoint(db, 'run_manifest', json_codec.load_file(manifest_file))
@@ -1,52 +1,126 @@
 # src/processors/sync_state.py
 import os
-import json
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, List
 from datetime import datetime
+from processors import json_codec
+
+DEFAULT_STATE_DIR = os.path.join('data', 'state')
+
+def create_state_tracker(state_dir: str = DEFAULT_STATE_DIR):
+    """State store picked by STATE_BACKEND: sqlite (default) or json"""
+    backend = os.getenv('STATE_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        from processors.sqlite_state import SQLiteStateTracker
+        return SQLiteStateTracker(state_dir)
+    if backend == 'json':
+        return SyncStateTracker(state_dir)
+    raise ValueError(f"Unsupported state backend: {backend}")
+
+def entity_state(status: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Any]:
+    """New state of an entity after a sync attempt"""
+    return {
+        'last_attempt': datetime.utcnow().isoformat(),
+        'last_success': datetime.utcnow().isoformat() if status['success'] else None,
+        'records_count': status.get('records_count', 0),
+        'file_size': status.get('file_size', 0),
+        'error': status.get('error'),
+        'operation_id': status.get('operation_id'),
+        'mode': status.get('mode'),
+        # Only a complete successful export moves the watermark forward
+        'watermark': status.get('watermark') or previous.get('watermark'),
+        # Object counts per created_at range of the last sharded export, for planning the next
+        'shards': status.get('shards') or previous.get('shards')
+    }
 
 class SyncStateTracker:
-    def __init__(self):
-        self.state_dir = '/app/data/state'
+    """
+    Sync state in JSON files: sync_state.json per entity, sync_history.jsonl per run
+    and one file per checkpoint. Every read parses the whole file, so the SQLite
+    store is preferred; this one stays for inspecting state by hand.
+    """
+
+    def __init__(self, state_dir: str = DEFAULT_STATE_DIR):
+        self.state_dir = state_dir
         os.makedirs(self.state_dir, exist_ok=True)
         self.state_file = os.path.join(self.state_dir, 'sync_state.json')
+        self.history_file = os.path.join(self.state_dir, 'sync_history.jsonl')
+        self._lock = threading.Lock()
         self._ensure_state_file()
 
     def _ensure_state_file(self):
         if not os.path.exists(self.state_file):
-            with open(self.state_file, 'w') as f:
-                json.dump({}, f)
+            with open(self.state_file, 'wb') as f:
+                f.write(json_codec.dumps({}))
 
     def _read_state(self) -> Dict:
         try:
-            with open(self.state_file, 'r') as f:
-                return json.load(f)
+            return json_codec.load_file(self.state_file)
         except Exception:
             return {}
 
     def _write_state(self, state: Dict):
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f, indent=2, default=str)
+        self._write_json(self.state_file, state)
+
+    @staticmethod
+    def _write_json(path: str, data: Any) -> None:
+        # Write to a temp file and swap it in so readers never see a half-written file
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(json_codec.dumps_pretty(data))
+        os.replace(temp_file, path)
 
     def get_last_sync(self, entity: str) -> Optional[datetime]:
         """Get the last successful sync timestamp for an entity"""
-        state = self._read_state()
-        if entity in state and state[entity].get('last_success'):
-            return datetime.fromisoformat(state[entity]['last_success'])
-        return None
+        last_success = self.get_entity_stats(entity).get('last_success')
+        return datetime.fromisoformat(last_success) if last_success else None
+
+    def get_watermark(self, entity: str) -> Optional[datetime]:
+        """Get the updated_at watermark up to which an entity is known to be synced"""
+        watermark = self.get_entity_stats(entity).get('watermark')
+        return datetime.fromisoformat(watermark) if watermark else None
+
+    def get_entity_stats(self, entity: str) -> Dict[str, Any]:
+        """State of one entity, empty if it was never synced"""
+        return self._read_state().get(entity, {})
 
     def update_sync_state(self, entity: str, status: Dict[str, Any]) -> None:
         """Update sync state with results"""
-        state = self._read_state()
-        state[entity] = {
-            'last_attempt': datetime.utcnow().isoformat(),
-            'last_success': datetime.utcnow().isoformat() if status['success'] else None,
-            'records_count': status.get('records_count', 0),
-            'file_size': status.get('file_size', 0),
-            'error': status.get('error'),
-            'operation_id': status.get('operation_id')
-        }
-        self._write_state(state)
+        with self._lock:
+            state = self._read_state()
+            state[entity] = entity_state(status, state.get(entity, {}))
+            self._write_state(state)
 
     def get_sync_stats(self) -> Dict[str, Any]:
         """Get sync statistics for all entities"""
-        return self._read_state()
\ No newline at end of file
+        return self._read_state()
+
+    def record_run(self, run: Dict[str, Any]) -> None:
+        """Append a finished run's metrics to the history"""
+        with self._lock:
+            with open(self.history_file, 'ab') as f:
+                f.write(json_codec.dumps(run) + b'\n')
+
+    def get_run_history(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """The most recent runs, newest first"""
+        if not os.path.exists(self.history_file):
+            return []
+        with open(self.history_file, 'rb') as f:
+            lines = f.readlines()[-limit:]
+        return [json_codec.loads(line) for line in reversed(lines) if line.strip()]
+
+    def load_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json_codec.load_file(self._checkpoint_file(name))
+        except Exception:
+            return None
+
+    def save_checkpoint(self, name: str, data: Dict[str, Any]) -> None:
+        self._write_json(self._checkpoint_file(name), data)
+
+    def delete_checkpoint(self, name: str) -> None:
+        if os.path.exists(self._checkpoint_file(name)):
+            os.remove(self._checkpoint_file(name))
+
+    def _checkpoint_file(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.json")
@@ -1,11 +1,12 @@
 GET_ORDERS_QUERY = """
 {
-  orders {
+  orders{INCREMENTAL_FILTER} {
     edges {
       node {
         id
         name
         createdAt
+        updatedAt
         processedAt
         currencyCode
         email
@@ -111,7 +112,7 @@ GET_ORDERS_QUERY = """
 
 GET_PRODUCTS_QUERY = """
 {
-  products {
+  products{INCREMENTAL_FILTER} {
     edges {
       node {
         id
@@ -168,7 +169,7 @@ GET_PRODUCTS_QUERY = """
 
 GET_CUSTOMERS_QUERY = """
 {
-  customers {
+  customers{INCREMENTAL_FILTER} {
     edges {
       node {
         id
@@ -214,7 +215,7 @@ GET_CUSTOMERS_QUERY = """
 
 GET_COLLECTIONS_QUERY = """
 {
-  collections {
+  collections{INCREMENTAL_FILTER} {
     edges {
       node {
         id
@@ -231,11 +232,12 @@ GET_COLLECTIONS_QUERY = """
 
 GET_PRODUCT_METAFIELDS_QUERY = """
 {
-  products {
+  products{INCREMENTAL_FILTER} {
     edges {
       node {
         id
         title
+        updatedAt
         metafields {
           edges {
             node {
@@ -250,4 +252,4 @@ GET_PRODUCT_METAFIELDS_QUERY = """
     }
   }
 }
-"""
\ No newline at end of file
+"""
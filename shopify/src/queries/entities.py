@@ -0,0 +1,87 @@
+# src/queries/entities.py
+
+from queries.bulk_queries import (
+    GET_ORDERS_QUERY, GET_PRODUCTS_QUERY, GET_CUSTOMERS_QUERY,
+    GET_COLLECTIONS_QUERY, GET_PRODUCT_METAFIELDS_QUERY
+)
+
+# Every synced entity, in sync order.
+#
+#   query     bulk query exporting it
+#   children  connections flattened by the bulk export, keyed by the GID type of the
+#             child ids (gid://shopify/<Type>/...). Each child is appended to `field` on
+#             its parent and may have children of its own. Children selected without an
+#             id go to the parent's only child connection.
+#
+# Entities without children are written out as exported.
+#
+#   shard_sort_key  sort key ordering the root connection by creation date, which
+#                   sharded exports start from; entities without one can't be sharded
+#
+# For the normalized output layout, each level also names its table:
+#
+#   table     table its rows go to; the entity name by default for the top level, and
+#             None to leave the top-level records out
+#   key       foreign key column holding this record's id in the rows of its children
+#             and lists (required on levels that have either)
+#   lists     plain list fields whose items are split out into rows of their own table
+ENTITIES = {
+    'orders': {
+        'query': GET_ORDERS_QUERY,
+        'shard_sort_key': 'CREATED_AT',
+        'key': 'order_id',
+        'lists': {'transactions': 'order_transactions'},
+        'children': {
+            'LineItem': {'field': 'lineItems', 'table': 'order_line_items'},
+            'Refund': {
+                'field': 'refunds',
+                'table': 'order_refunds',
+                'key': 'refund_id',
+                'children': {
+                    'RefundLineItem': {'field': 'refundLineItems', 'table': 'order_refund_line_items'},
+                    'OrderTransaction': {'field': 'transactions', 'table': 'order_transactions'}
+                }
+            }
+        }
+    },
+    'products': {
+        'query': GET_PRODUCTS_QUERY,
+        'shard_sort_key': 'CREATED_AT',
+        'key': 'product_id',
+        'children': {
+            'ProductVariant': {
+                'field': 'variants',
+                'table': 'product_variants',
+                'key': 'variant_id',
+                'children': {
+                    'InventoryLevel': {'field': 'inventoryLevels', 'table': 'inventory_levels'}
+                }
+            }
+        }
+    },
+    'customers': {
+        'query': GET_CUSTOMERS_QUERY,
+        'shard_sort_key': 'CREATED_AT'
+    },
+    'collections': {
+        'query': GET_COLLECTIONS_QUERY
+    },
+    'product_metafields': {
+        'query': GET_PRODUCT_METAFIELDS_QUERY,
+        'shard_sort_key': 'CREATED_AT',
+        # The products themselves are already in the products table
+        'table': None,
+        'key': 'product_id',
+        'children': {
+            'Metafield': {'field': 'metafields', 'table': 'product_metafields'}
+        }
+    }
+}
+
+def shardable(entity: str) -> bool:
+    """Whether full exports of an entity can be split into created_at shards"""
+    return bool(ENTITIES.get(entity, {}).get('shard_sort_key'))
+
+def entity_queries() -> dict:
+    """Bulk query of every registered entity, in sync order"""
+    return {entity: spec['query'] for entity, spec in ENTITIES.items()}
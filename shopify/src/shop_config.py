@@ -0,0 +1,35 @@
+# src/shop_config.py
+
+import os
+import json
+import re
+from typing import Dict, List
+
+def load_shop_configs() -> List[Dict[str, str]]:
+    """
+    Shops to sync: the JSON list in SHOPIFY_SHOPS_FILE if set, otherwise the single
+    shop from SHOPIFY_STORE_URL / SHOPIFY_ACCESS_TOKEN.
+
+    Each entry has 'store_url' and 'access_token' and an optional 'name' used for
+    the shop's data directory (defaults to the store handle).
+    """
+    shops_file = os.getenv('SHOPIFY_SHOPS_FILE')
+    if shops_file:
+        with open(shops_file, 'r') as f:
+            shops = json.load(f)
+    else:
+        shops = [{
+            'store_url': os.getenv('SHOPIFY_STORE_URL'),
+            'access_token': os.getenv('SHOPIFY_ACCESS_TOKEN')
+        }]
+
+    for shop in shops:
+        if not shop.get('store_url') or not shop.get('access_token'):
+            raise ValueError("Every shop needs a store_url and an access_token")
+        shop.setdefault('name', shop_name(shop['store_url']))
+    return shops
+
+def shop_name(store_url: str) -> str:
+    """Filesystem-safe handle of a shop, e.g. 'my-store' for my-store.myshopify.com"""
+    handle = store_url.split('.myshopify.com')[0]
+    return re.sub(r'[^A-Za-z0-9_-]', '_', handle)
@@ -0,0 +1,10 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Modules import each other from src/, as they do when the entry points run there;
+# the Shopify stand-in and synthetic data come from benchmarks/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
@@ -0,0 +1,152 @@
+# tests/fake_gcs.py
+
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+_CONTENT_RANGE = re.compile(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)')
+
+class FakeGCS:
+    """
+    Local stand-in for the parts of the Cloud Storage JSON API GCSLoader uses.
+
+    Accepts multipart and resumable uploads, compose and delete, and keeps
+    objects in memory. Point the client at it with STORAGE_EMULATOR_HOST.
+    """
+
+    def __init__(self, host: str = '127.0.0.1'):
+        self.objects: Dict[str, bytes] = {}
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._session_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, 0), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeGCS':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeGCS':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def store(self, bucket: str, metadata: Dict[str, Any], data: bytes) -> Dict[str, Any]:
+        name = metadata['name']
+        with self._lock:
+            self.objects[name] = data
+            self.metadata[name] = metadata
+        return self.resource(bucket, name)
+
+    def resource(self, bucket: str, name: str) -> Dict[str, Any]:
+        return {**self.metadata[name], 'bucket': bucket, 'name': name, 'size': str(len(self.objects[name]))}
+
+    def start_session(self, bucket: str, metadata: Dict[str, Any]) -> str:
+        with self._lock:
+            session_id = str(next(self._session_ids))
+            self._sessions[session_id] = {'bucket': bucket, 'metadata': metadata, 'data': bytearray()}
+        return f"{self.base_url}/upload/session/{session_id}"
+
+    def session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(session_id)
+
+def _handler(fake: FakeGCS):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            upload_type = parse_qs(url.query).get('uploadType', [None])[0]
+            body = self._body()
+            upload = re.fullmatch(r'/upload/storage/v1/b/([^/]+)/o', url.path)
+            compose = re.fullmatch(r'/storage/v1/b/([^/]+)/o/([^/]+)/compose', url.path)
+            if upload and upload_type == 'multipart':
+                metadata, data = _parse_multipart(self.headers['Content-Type'], body)
+                self._send_json(fake.store(upload.group(1), metadata, data))
+            elif upload and upload_type == 'resumable':
+                location = fake.start_session(upload.group(1), json.loads(body or b'{}'))
+                self._send(200, b'', {'Location': location})
+            elif compose:
+                bucket, name = compose.group(1), unquote(compose.group(2))
+                request = json.loads(body)
+                missing = [s['name'] for s in request['sourceObjects'] if s['name'] not in fake.objects]
+                if missing:
+                    self._send_json({'error': {'code': 404, 'message': f"No such object: {missing[0]}"}}, 404)
+                    return
+                data = b''.join(fake.objects[source['name']] for source in request['sourceObjects'])
+                self._send_json(fake.store(bucket, {**request.get('destination', {}), 'name': name}, data))
+            else:
+                self.send_error(404)
+
+        def do_PUT(self):
+            match = re.fullmatch(r'/upload/session/(\d+)', urlparse(self.path).path)
+            session = fake.session(match.group(1)) if match else None
+            if session is None:
+                self.send_error(404)
+                return
+            body = self._body()
+            start, _, total = _CONTENT_RANGE.fullmatch(self.headers.get('Content-Range', '')).groups()
+            if start is not None:
+                if int(start) != len(session['data']):
+                    self._send_json({'error': {'code': 400, 'message': 'Chunk out of order'}}, 400)
+                    return
+                session['data'] += body
+            if total != '*' and len(session['data']) == int(total):
+                self._send_json(fake.store(session['bucket'], session['metadata'], bytes(session['data'])))
+            else:
+                headers = {'Range': f"bytes=0-{len(session['data']) - 1}"} if session['data'] else {}
+                self._send(308, b'', headers)
+
+        def do_DELETE(self):
+            match = re.fullmatch(r'/storage/v1/b/([^/]+)/o/([^/]+)', urlparse(self.path).path)
+            name = unquote(match.group(2)) if match else None
+            if name not in fake.objects:
+                self.send_error(404)
+                return
+            with fake._lock:
+                del fake.objects[name]
+                del fake.metadata[name]
+            self._send(204, b'')
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        def _send_json(self, obj: Dict[str, Any], code: int = 200) -> None:
+            self._send(code, json.dumps(obj).encode(), {'Content-Type': 'application/json'})
+
+        def _send(self, code: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+            self.send_response(code)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def _parse_multipart(content_type: str, body: bytes):
+    """Metadata and media of a multipart/related upload"""
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+    parts = [part for part in body.split(b'--' + boundary) if part.strip() not in (b'', b'--')]
+    metadata, media = (part.split(b'\r\n\r\n', 1)[1] for part in parts[:2])
+    return json.loads(metadata), media[:-2] if media.endswith(b'\r\n') else media
@@ -0,0 +1,45 @@
+# tests/test_data_processor.py
+
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from synthetic import generate
+from processors import data_processor
+from processors.data_processor import DataProcessor
+
+def test_concurrent_syncs_share_one_process_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROCESS_WORKERS', '2')
+    monkeypatch.setenv('PARALLEL_MIN_BYTES', '1')
+    monkeypatch.setattr(DataProcessor, '_process_pools', {})
+    pools = []
+
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            pools.append(self)
+
+    monkeypatch.setattr(data_processor, 'ProcessPoolExecutor', RecordingPool)
+
+    shops = [f"shop-{index}" for index in range(3)]
+    for shop in shops:
+        generate('orders', str(tmp_path / f"{shop}.jsonl"), 1000)
+    expected = len(list(DataProcessor('jsonl', 'nested').iter_entity('orders', str(tmp_path / 'shop-0.jsonl'))))
+    counts = {}
+
+    def sync(shop):
+        counts[shop] = DataProcessor('jsonl', 'nested').process_jsonl_file(
+            str(tmp_path / f"{shop}.jsonl"), str(tmp_path / f"{shop}_processed.jsonl"), 'orders'
+        )
+
+    threads = [threading.Thread(target=sync, args=(shop,)) for shop in shops]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert counts == {shop: expected for shop in shops}
+        assert len(pools) == 1
+        assert pools[0]._max_workers == 2
+    finally:
+        for pool in pools:
+            pool.shutdown()
@@ -0,0 +1,36 @@
+# tests/test_raw_index.py
+
+import os
+import pytest
+from synthetic import generate
+from processors.data_processor import DataProcessor
+from processors.raw_index import RawIndexReader, index_path
+
+@pytest.fixture
+def raw_orders(tmp_path, monkeypatch):
+    monkeypatch.setenv('RAW_INDEX', 'true')
+    monkeypatch.delenv('COMPRESSION', raising=False)
+    raw_file_path = str(tmp_path / 'raw' / 'orders.jsonl')
+    os.makedirs(os.path.dirname(raw_file_path))
+    generate('orders', raw_file_path, 2000)
+    return raw_file_path
+
+@pytest.mark.parametrize('workers', ['1', '4'])
+def test_processing_indexes_every_record(raw_orders, tmp_path, monkeypatch, workers):
+    monkeypatch.setenv('PROCESS_WORKERS', workers)
+    monkeypatch.setenv('PARALLEL_MIN_BYTES', '1')
+    processor = DataProcessor('jsonl', 'nested')
+    processor.process_jsonl_file(raw_orders, str(tmp_path / 'processed' / 'orders.jsonl'), 'orders')
+
+    records = list(processor.iter_entity('orders', raw_orders))
+    with RawIndexReader(raw_orders, 'orders', processor) as reader:
+        assert reader.count == len(records)
+        for record in records[::37]:
+            assert reader.get(record['id']) == record
+        assert reader.get('gid://shopify/Order/999999999') is None
+
+def test_split_points_come_from_the_index(raw_orders, tmp_path):
+    scanned = DataProcessor._split_points(raw_orders, 8)
+    DataProcessor('jsonl', 'nested').process_jsonl_file(raw_orders, str(tmp_path / 'orders.jsonl'), 'orders')
+    assert os.path.exists(index_path(raw_orders))
+    assert DataProcessor._split_points(raw_orders, 8) == scanned
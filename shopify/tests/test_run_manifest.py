@@ -0,0 +1,96 @@
+# tests/test_run_manifest.py
+
+import os
+import pytest
+from mock_shopify import MockShopify
+from synthetic import generate
+from main import SyncManager
+from queries.entities import ENTITIES
+
+ENTITY_NAMES = ['orders', 'products']
+
+class Interrupted(BaseException):
+    """Stands in for the container being stopped partway through a run"""
+
+@pytest.fixture
+def shopify(tmp_path, monkeypatch):
+    monkeypatch.setenv('BULK_POLL_MIN_INTERVAL', '0.05')
+    monkeypatch.setenv('STATE_BACKEND', 'sqlite')
+    monkeypatch.delenv('GCS_BUCKET_NAME', raising=False)
+    monkeypatch.delenv('BULK_WEBHOOK_URL', raising=False)
+    with MockShopify() as mock:
+        for entity in ENTITY_NAMES:
+            source = str(tmp_path / f"{entity}.jsonl")
+            generate(entity, source, 200)
+            mock.add_result(ENTITIES[entity]['query'], source)
+        yield mock
+
+def _manager(shopify, tmp_path):
+    manager = SyncManager('test-shop.local', 'token', data_dir=str(tmp_path / 'data'))
+    manager.extractor.client.endpoint = shopify.endpoint
+    manager.entities = {entity: ENTITIES[entity]['query'] for entity in ENTITY_NAMES}
+    return manager
+
+def _fail_download_of(manager, entity):
+    download_result = manager.extractor.download_result
+
+    def download(status, raw_file_path, *args, **kwargs):
+        if os.sep + entity + os.sep in raw_file_path:
+            raise ConnectionError("result URL expired")
+        return download_result(status, raw_file_path, *args, **kwargs)
+
+    manager.extractor.download_result = download
+
+def _interrupt_processing_of(manager, entity):
+    process = manager.processor.process_jsonl_file
+
+    def process_jsonl_file(raw_file_path, processed_file_path, name):
+        if name == entity:
+            raise Interrupted()
+        return process(raw_file_path, processed_file_path, name)
+
+    manager.processor.process_jsonl_file = process_jsonl_file
+
+def test_finished_run_with_a_failed_entity_is_not_resumed(shopify, tmp_path):
+    manager = _manager(shopify, tmp_path)
+    _fail_download_of(manager, 'products')
+    stats = manager.sync_all()
+    assert stats['orders']['error'] is None
+    assert stats['products']['error'] == "result URL expired"
+    assert manager.state.load_checkpoint('run_manifest') is None
+
+    # The next run syncs orders incrementally and extracts products again
+    started = shopify.started_operations
+    stats = _manager(shopify, tmp_path).sync_all()
+    assert shopify.started_operations == started + 2
+    assert stats['orders']['error'] is None and stats['products']['error'] is None
+
+def test_interrupted_run_resumes_finished_work(shopify, tmp_path):
+    manager = _manager(shopify, tmp_path)
+    _interrupt_processing_of(manager, 'products')
+    with pytest.raises(Interrupted):
+        manager.sync_all()
+    assert manager.state.load_checkpoint('run_manifest') is not None
+
+    # Orders are done and products reuse their finished operation and download
+    started = shopify.started_operations
+    stats = _manager(shopify, tmp_path).sync_all()
+    assert shopify.started_operations == started
+    assert stats['orders']['error'] is None and stats['products']['error'] is None
+    assert int(stats['products']['records_count']) > 0
+
+def test_failed_entity_of_an_interrupted_run_is_extracted_again(shopify, tmp_path):
+    manager = _manager(shopify, tmp_path)
+    _fail_download_of(manager, 'products')
+    _interrupt_processing_of(manager, 'orders')
+    with pytest.raises(Interrupted):
+        manager.sync_all()
+    checkpoint = manager.state.load_checkpoint('run_manifest')['entities']['products']
+    assert checkpoint['stage'] == 'failed'
+    assert not {'status', 'result', 'download_offset', 'operation_id'} & set(checkpoint)
+
+    # Orders pick up their finished operation; products get a new one
+    started = shopify.started_operations
+    stats = _manager(shopify, tmp_path).sync_all()
+    assert shopify.started_operations == started + 1
+    assert stats['orders']['error'] is None and stats['products']['error'] is None
@@ -0,0 +1,25 @@
+# tests/test_sharding.py
+
+import pytest
+from extractors.bulk_operations import BulkOperationsExtractor
+from main import SyncManager
+from queries.entities import ENTITIES
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.delenv('GCS_BUCKET_NAME', raising=False)
+
+def test_entities_without_a_creation_sort_key_are_rejected(monkeypatch, tmp_path):
+    monkeypatch.setenv('BULK_SHARDED_ENTITIES', 'orders,collections')
+    with pytest.raises(ValueError, match='collections'):
+        SyncManager('my-store.myshopify.com', 'token', data_dir=str(tmp_path))
+
+def test_sharded_entities_are_read_from_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv('BULK_SHARDED_ENTITIES', 'orders, products')
+    manager = SyncManager('my-store.myshopify.com', 'token', data_dir=str(tmp_path))
+    assert manager.sharded_entities == {'orders', 'products'}
+
+def test_oldest_record_query_uses_the_entity_sort_key():
+    spec = ENTITIES['product_metafields']
+    query = BulkOperationsExtractor._oldest_record_query(spec['query'], spec['shard_sort_key'])
+    assert 'products(first: 1, sortKey: CREATED_AT)' in query
@@ -0,0 +1,48 @@
+# tests/test_shopify_client.py
+
+import sys
+import threading
+import pytest
+import requests
+from urllib3.connection import HTTPConnection
+from client.shopify_client import ShopifyClient
+
+def _cost(actual):
+    return {'extensions': {'cost': {'actualQueryCost': actual, 'requestedQueryCost': actual}}}
+
+@pytest.fixture
+def frequent_thread_switches():
+    # Switching threads often makes lost updates show up within a short test
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def test_cost_consumed_counts_every_query_across_threads(frequent_thread_switches):
+    client = ShopifyClient('cost-test.myshopify.com', 'token')
+    threads_count, queries = 8, 5000
+
+    def record():
+        for _ in range(queries):
+            client._record_cost('{ shop { id } }', _cost(1))
+
+    threads = [threading.Thread(target=record) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.cost_consumed == threads_count * queries
+
+def test_connection_errors_are_retried_once_per_attempt(monkeypatch):
+    monkeypatch.setenv('MAX_RETRIES', '2')
+    monkeypatch.setenv('RETRY_DELAY', '0')
+    # Nothing listens on port 1, so every connection is refused
+    client = ShopifyClient('127.0.0.1:1', 'token')
+    client.endpoint = 'http://127.0.0.1:1/graphql.json'
+    connections = []
+    new_conn = HTTPConnection._new_conn
+    monkeypatch.setattr(HTTPConnection, '_new_conn', lambda self: connections.append(self) or new_conn(self))
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.execute('{ shop { id } }')
+    assert len(connections) == 3
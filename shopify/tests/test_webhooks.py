@@ -0,0 +1,49 @@
+# tests/test_webhooks.py
+
+import base64
+import hashlib
+import hmac
+import json
+import pytest
+import requests
+from extractors.webhooks import BulkCompletionReceiver
+
+SECRET = 'test-secret'
+OPERATION_ID = 'gid://shopify/BulkOperation/1'
+
+@pytest.fixture
+def receiver():
+    receiver = BulkCompletionReceiver(host='127.0.0.1', port=0, secret=SECRET)
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+def _signature(body: bytes, secret: str = SECRET) -> str:
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+def _post(receiver, body: bytes, signature=None) -> int:
+    headers = {'X-Shopify-Hmac-Sha256': signature} if signature else {}
+    return requests.post(f"http://127.0.0.1:{receiver.port}/", data=body, headers=headers, timeout=5).status_code
+
+def _payload() -> bytes:
+    return json.dumps({'admin_graphql_api_id': OPERATION_ID, 'status': 'completed'}).encode()
+
+def test_signed_webhook_wakes_the_waiter(receiver):
+    body = _payload()
+    assert _post(receiver, body, _signature(body)) == 200
+    assert receiver.wait(OPERATION_ID, timeout=1)['status'] == 'completed'
+
+@pytest.mark.parametrize('signature', [None, _signature(_payload(), 'other-secret'), 'not-a-signature'])
+def test_unsigned_or_forged_webhook_is_rejected(receiver, signature):
+    assert _post(receiver, _payload(), signature) == 401
+    assert receiver.wait(OPERATION_ID, timeout=0.1) is None
+
+def test_tampered_body_is_rejected(receiver):
+    body = _payload()
+    assert _post(receiver, body.replace(b'completed', b'failed'), _signature(body)) == 401
+
+def test_receiver_refuses_to_start_without_a_secret():
+    receiver = BulkCompletionReceiver(host='127.0.0.1', port=0, secret=None)
+    with pytest.raises(ValueError):
+        receiver.start()
+    assert not receiver.verify(_payload(), _signature(_payload()))